@@ -0,0 +1,46 @@
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+
+def time_calls(fn: Callable[[], Any], n: int, warmup: int = 100) -> Dict[str, float]:
+    """Per-call latency stats in microseconds (mean / p50 / p99) plus ops/s."""
+    for _ in range(warmup):
+        fn()
+    samples: List[int] = []
+    clock = time.perf_counter_ns
+    t_start = clock()
+    for _ in range(n):
+        t0 = clock()
+        fn()
+        samples.append(clock() - t0)
+    total_s = (clock() - t_start) / 1e9
+    samples.sort()
+    return {
+        "n": n,
+        "mean_us": round(sum(samples) / n / 1000, 3),
+        "p50_us": round(samples[n // 2] / 1000, 3),
+        "p99_us": round(samples[min(n - 1, int(n * 0.99))] / 1000, 3),
+        "ops_per_s": round(n / total_s, 1),
+    }
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        rev = "unknown"
+    return {
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "git_rev": rev,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
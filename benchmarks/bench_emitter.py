@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict
+
+from gateway_sdk.emitter import AsyncJsonlEmitter, JsonlEmitter, RowBinaryEmitter, ShardedEmitter
+
+SAMPLE_EVENT: Dict[str, Any] = {
+    "timestamp": "2025-12-01 12:00:00.123",
+    "request_id": "5f0c1e7e-8d4b-4f6c-9a51-3f0c1c2b9e11",
+    "attempt": 1,
+    "tenant_id": "tenant_a",
+    "user_id": "user_1",
+    "feature": "search_rerank",
+    "endpoint": "/v1/chat",
+    "prompt_template_id": "6509bbcb13a2abb8",
+    "provider": "openai",
+    "model": "gpt-4o-mini",
+    "region": "us",
+    "prompt_tokens": 1200,
+    "completion_tokens": 300,
+    "total_tokens": 1500,
+    "latency_ms": 850,
+    "ttft_ms": 850,
+    "tokens_per_s": 352.941,
+    "status": "ok",
+    "retry_count": 0,
+    "cache_hit": 0,
+    "price_version": "2025-12-01",
+    "unit_price_prompt": 0.15,
+    "unit_price_completion": 0.6,
+    "computed_cost": 0.36,
+    "prompt_chars": 5400,
+    "completion_chars": 1300,
+}
+
+EMITTERS = {
+    "jsonl_sync": lambda p: JsonlEmitter(p),
+    "jsonl_async": lambda p: AsyncJsonlEmitter(p),
+    "rowbinary_sync": lambda p: RowBinaryEmitter(p),
+    "rowbinary_async": lambda p: AsyncJsonlEmitter(p, fmt="rowbinary"),
+    "jsonl_sharded": lambda p: ShardedEmitter(p),  # p is used as the segment directory
+}
+
+
+def _output_bytes(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+    return os.path.getsize(path)
+
+
+def bench_threads(make, path: str, threads: int, total: int) -> Dict[str, float]:
+    emitter = make(path)
+    per_thread = total // threads
+    start = threading.Barrier(threads + 1)
+
+    def worker() -> None:
+        start.wait()
+        for _ in range(per_thread):
+            emitter.emit(SAMPLE_EVENT)
+
+    ts = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in ts:
+        t.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in ts:
+        t.join()
+    caller_s = time.perf_counter() - t0
+    emitter.close()  # includes draining the async queue
+    total_s = time.perf_counter() - t0
+    n = per_thread * threads
+    return {
+        "events": n,
+        "caller_events_per_s": round(n / caller_s, 1),
+        "durable_events_per_s": round(n / total_s, 1),
+        "bytes_per_event": round(_output_bytes(path) / n, 1),
+    }
+
+
+def run(thread_counts=(1, 4, 16, 64), total: int = 64000) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as d:
+        for name, make in EMITTERS.items():
+            for threads in thread_counts:
+                path = os.path.join(d, f"{name}_{threads}.out")
+                out[f"{name}_t{threads}"] = bench_threads(make, path, threads, total)
+    return out
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,106 @@
+import json
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+
+from gateway_sdk import metrics, rowbinary
+from gateway_sdk.event import build_event, compute_cost
+from gateway_sdk.pricing import Price, PriceBook
+
+from benchmarks._util import time_calls
+
+PRICE_BOOK = PriceBook([
+    Price(
+        provider="openai", model="gpt-4o-mini", region="us",
+        effective_from=datetime(2025, 1, 1, tzinfo=timezone.utc),
+        price_per_1k_prompt=0.15, price_per_1k_completion=0.60, price_version="bench",
+    )
+])
+RESULT = {"text": "x" * 200, "prompt_tokens": 120, "completion_tokens": 48, "total_tokens": 168}
+
+
+def _ctx() -> Dict[str, Any]:
+    return {
+        "provider": "openai", "model": "gpt-4o-mini", "region": "us", "ts": datetime.now(timezone.utc),
+        "request_id": "5f0c6a52-8f0e-4a8c-9d43-2b1e0f6c7a11", "attempt": 1, "retry_count": 0, "cache_hit": False,
+        "tenant_id": "t1", "user_id": "u42", "feature": "chat", "endpoint": "/v1/chat",
+        "template_id": "9b2d5c", "prompt_chars": 480,
+    }
+
+
+def legacy_event(ctx: Dict[str, Any], result: Dict[str, Any], status: str, latency_ms: int) -> Dict[str, Any]:
+    # the previous per-call dict (gateway._build_event before the shared UsageEvent), without metrics
+    pt, ct = result["prompt_tokens"], result["completion_tokens"]
+    price = PRICE_BOOK.resolve(ctx["provider"], ctx["model"], ctx["region"], ctx["ts"])
+    unit_p, unit_c, tier = price.unit_prices("standard")
+    return {
+        "timestamp": ctx["ts"].strftime("%Y-%m-%d %H:%M:%S.%f")[:23],
+        "request_id": ctx["request_id"], "attempt": int(ctx["attempt"]),
+        "tenant_id": ctx["tenant_id"], "user_id": ctx["user_id"], "feature": ctx["feature"],
+        "endpoint": ctx["endpoint"], "prompt_template_id": ctx["template_id"],
+        "provider": ctx["provider"], "model": ctx["model"], "region": ctx["region"],
+        "prompt_tokens": pt, "completion_tokens": ct, "total_tokens": pt + ct,
+        "latency_ms": latency_ms, "ttft_ms": latency_ms,
+        "tokens_per_s": round(ct * 1000.0 / latency_ms, 3), "status": status,
+        "retry_count": int(ctx["retry_count"]), "cache_hit": 0,
+        "price_version": price.price_version, "price_tier": tier,
+        "unit_price_prompt": float(unit_p), "unit_price_completion": float(unit_c),
+        "computed_cost": float(compute_cost(pt, ct, unit_p, unit_c)),
+        "prompt_chars": ctx["prompt_chars"], "completion_chars": len(result["text"]), "replica": "",
+        "token_source": "provider",
+    }
+
+
+def legacy_jsonl(event: Dict[str, Any]) -> bytes:
+    return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def bytes_per_event(make: Callable[[], Any], n: int = 20000) -> float:
+    """Retained bytes per event while n of them are alive (e.g. queued in AsyncJsonlEmitter)."""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    keep = [make() for _ in range(n)]
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del keep
+    return round(used / n, 1)
+
+
+def run(n: int = 20000) -> Dict[str, Any]:
+    # build_event also records call metrics; switch them off so both sides do the same work
+    was_enabled = metrics.REGISTRY.enabled
+    metrics.disable()
+    try:
+        return _run(n)
+    finally:
+        metrics.REGISTRY.enabled = was_enabled
+
+
+def _run(n: int) -> Dict[str, Any]:
+    ctx = _ctx()
+
+    def new_legacy():
+        return legacy_event(ctx, RESULT, "ok", 840)
+
+    def new_event():
+        return build_event(PRICE_BOOK, ctx, RESULT, "ok", 840)
+
+    # to_jsonl() == json.dumps bytes is covered by tests/test_event.py
+    return {
+        "dict": {
+            "build": time_calls(new_legacy, n),
+            "build_jsonl": time_calls(lambda: legacy_jsonl(new_legacy()), n),
+            "build_rowbinary": time_calls(lambda: rowbinary.encode_record(new_legacy()), n),
+            "bytes_per_event": bytes_per_event(new_legacy),
+        },
+        "usage_event": {
+            "build": time_calls(new_event, n),
+            "build_jsonl": time_calls(lambda: new_event().to_jsonl(), n),
+            "build_rowbinary": time_calls(lambda: rowbinary.encode_record(new_event()), n),
+            "bytes_per_event": bytes_per_event(new_event),
+        },
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
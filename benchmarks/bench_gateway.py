@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+from typing import Any, Dict
+
+from gateway_sdk import metrics
+from gateway_sdk.gateway import GatewayConfig, LLMGateway
+from gateway_sdk.instrument import LLMInstrumentor
+
+from benchmarks._util import time_calls
+from benchmarks.stubs import NullEmitter, StubAdapter, stub_llm_client
+
+PRICE_BOOK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pricing", "price_book.yaml")
+
+MESSAGES = [
+    {"role": "system", "content": "You are a helpful assistant. " * 40},
+    {"role": "user", "content": "Rerank these documents for the query. " * 20},
+]
+
+
+def run(n: int = 20000) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as d:
+        # NullEmitter isolates SDK overhead; "jsonl" keeps the real sync file emitter in the loop
+        for emitter_name in ("null", "jsonl"):
+            gw = LLMGateway(GatewayConfig(price_book_path=PRICE_BOOK, events_jsonl_path=os.path.join(d, "gw.jsonl")))
+            gw._openai = StubAdapter()
+            if emitter_name == "null":
+                gw.emitter = NullEmitter()
+            out[f"gateway_chat_{emitter_name}"] = time_calls(
+                lambda: gw.chat(
+                    provider="openai", model="gpt-4o-mini", messages=MESSAGES,
+                    tenant_id="tenant_a", user_id="user_1", feature="search_rerank", endpoint="/v1/chat",
+                ),
+                n,
+            )
+            gw.close()
+
+            pb = gw.price_book
+            emitter = NullEmitter() if emitter_name == "null" else gw._build_emitter(gw.cfg)
+            inst = LLMInstrumentor(pb, emitter, provider_default="openai", region_default="us")
+            prompt = LLMGateway._messages_to_prompt(MESSAGES)
+            out[f"instrumentor_call_{emitter_name}"] = time_calls(
+                lambda: inst.call(
+                    stub_llm_client,
+                    tenant_id="tenant_a", user_id="user_1", feature="search_rerank", endpoint="/v1/chat",
+                    prompt=prompt, model="gpt-4o-mini", prompt_tokens=200, completion_tokens=50,
+                ),
+                n,
+            )
+            emitter.close()
+
+        # same call with SDK metrics switched off, to track the instrumentation cost itself
+        gw = LLMGateway(GatewayConfig(price_book_path=PRICE_BOOK, events_jsonl_path=os.path.join(d, "gw.jsonl")))
+        gw._openai = StubAdapter()
+        gw.emitter = NullEmitter()
+        was_enabled = metrics.REGISTRY.enabled
+        metrics.disable()
+        try:
+            out["gateway_chat_null_metrics_off"] = time_calls(
+                lambda: gw.chat(
+                    provider="openai", model="gpt-4o-mini", messages=MESSAGES,
+                    tenant_id="tenant_a", user_id="user_1", feature="search_rerank", endpoint="/v1/chat",
+                ),
+                n,
+            )
+        finally:
+            metrics.REGISTRY.enabled = was_enabled
+    return out
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,75 @@
+import contextlib
+import gzip
+import http.server
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict
+
+from benchmarks.bench_emitter import SAMPLE_EVENT
+
+
+class _FakeClickHouse(http.server.BaseHTTPRequestHandler):
+    """Accepts INSERT POSTs like ClickHouse's HTTP interface: gunzips and counts the bytes."""
+
+    received_bytes = 0
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        type(self).received_bytes += len(body)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+def run(rows: int = 200_000, chunk_mb: float = 8) -> Dict[str, Any]:
+    srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _FakeClickHouse)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    # ingest_jsonl reads its settings from the environment at import time
+    os.environ["CLICKHOUSE_URL"] = f"http://127.0.0.1:{srv.server_port}"
+    os.environ.setdefault("CLICKHOUSE_USER", "bench")
+    os.environ.setdefault("CLICKHOUSE_PASSWORD", "bench")
+    from ingest import ingest_jsonl
+    from gateway_sdk import rowbinary
+
+    out: Dict[str, Any] = {}
+    try:
+        with tempfile.TemporaryDirectory() as d:
+            jsonl_path = os.path.join(d, "events.jsonl")
+            line = json.dumps(SAMPLE_EVENT, ensure_ascii=False) + "\n"
+            with open(jsonl_path, "w", encoding="utf-8") as f:
+                f.write(line * rows)
+            rb_path = os.path.join(d, "events.rb")
+            rowbinary.jsonl_to_rowbinary(jsonl_path, rb_path)
+
+            session = ingest_jsonl.make_session()
+            chunk_bytes = int(chunk_mb * 1024 * 1024)
+            for name, path, fn in (
+                ("jsonl", jsonl_path, ingest_jsonl.ingest_file),
+                ("rowbinary", rb_path, ingest_jsonl.ingest_rowbinary_file),
+            ):
+                t0 = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):  # per-chunk progress lines
+                    n, raw_bytes = fn(session, path, chunk_bytes)
+                dt = time.perf_counter() - t0
+                out[name] = {
+                    "rows": n,
+                    "file_mb": round(os.path.getsize(path) / 1e6, 2),
+                    "rows_per_s": round(n / dt, 1),
+                    "mb_per_s": round(raw_bytes / 1e6 / dt, 2),
+                }
+    finally:
+        srv.shutdown()
+    return out
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
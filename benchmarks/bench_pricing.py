@@ -0,0 +1,61 @@
+import itertools
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict
+
+from gateway_sdk.pricing import Price, PriceBook
+
+from benchmarks._util import time_calls
+
+BASE_TS = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def make_price_book(n_rows: int, n_keys: int = 50) -> PriceBook:
+    # 模擬 price book 長大：固定幾組 (provider, model, region)，每組不斷新增更晚的 effective_from
+    prices = []
+    for i in range(n_rows):
+        k = i % n_keys
+        prices.append(
+            Price(
+                provider="openai",
+                model=f"model-{k}",
+                region="us",
+                effective_from=BASE_TS + timedelta(hours=i // n_keys),
+                price_per_1k_prompt=0.15,
+                price_per_1k_completion=0.60,
+                price_version="bench",
+            )
+        )
+    random.shuffle(prices)
+    return PriceBook(prices)
+
+
+def bench_resolve_many(pb: PriceBook, n_keys: int, n_lookups: int = 20000) -> float:
+    now = datetime.now(timezone.utc)
+    items = [("openai", f"model-{i % n_keys}", "us", now) for i in range(n_lookups)]
+    t0 = time.perf_counter()
+    pb.resolve_many(items)
+    return round((time.perf_counter() - t0) / n_lookups * 1e6, 3)
+
+
+def run(sizes=(10, 100, 1_000, 10_000, 100_000), n_keys: int = 10) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    now = datetime.now(timezone.utc)
+    for n_rows in sizes:
+        t0 = time.perf_counter()
+        pb = make_price_book(n_rows, n_keys=n_keys)
+        build_ms = (time.perf_counter() - t0) * 1000
+        next_model = itertools.cycle([f"model-{k}" for k in range(n_keys)]).__next__
+        resolve = time_calls(lambda: pb.resolve("openai", next_model(), "us", now), 20000)
+        out[str(n_rows)] = {
+            "build_ms": round(build_ms, 2),
+            "resolve": resolve,
+            "resolve_many_us_per_item": bench_resolve_many(pb, n_keys),
+        }
+    return out
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,238 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.mock_openai import MockConfig, MockOpenAIServer
+from benchmarks.synth_events import DEFAULT_FEATURES
+from gateway_sdk import metrics
+from gateway_sdk.gateway import GatewayConfig, LLMGateway
+from gateway_sdk.retry import RetryPolicy
+
+# Drive LLMGateway.achat / achat_stream end to end at a target QPS (open loop: arrivals don't
+# wait for earlier calls), against the local mock server by default or any OpenAI-compatible
+# base URL. Reports achieved QPS, caller-side latency percentiles and the SDK stage metrics.
+
+MODELS = {
+    "vllm": ("gpt-oss-20b-local", "onprem"),
+    "openai": ("gpt-4o-mini", "us"),
+}
+
+
+def _messages(rng: random.Random) -> Dict[str, Any]:
+    f = rng.choices(DEFAULT_FEATURES, weights=[x.weight for x in DEFAULT_FEATURES])[0]
+    # same system prompt per (feature, template), user part varies like real traffic
+    system = f"You are the {f.name} assistant (template {rng.randrange(f.templates)}). " + "Follow the policy. " * 40
+    user = f"Request #{rng.randrange(1_000_000)}: " + "context " * int(rng.lognormvariate(4.5, 0.6))
+    return {
+        "feature": f.name,
+        "endpoint": f.endpoint,
+        "messages": [{"role": "system", "content": system}, {"role": "user", "content": user}],
+    }
+
+
+def _pct(sorted_ms: List[float], q: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    return round(sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * q))], 2)
+
+
+async def drive(
+    gw: LLMGateway,
+    *,
+    provider: str,
+    qps: float,
+    duration_s: float,
+    max_in_flight: int = 10_000,
+    stream: bool = False,
+    poisson: bool = True,
+    tenants: int = 200,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    model, region = MODELS[provider]
+    rng = random.Random(seed)
+    total = int(qps * duration_s)
+    slots = asyncio.Semaphore(max_in_flight)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    shed = 0
+
+    async def one(i: int) -> None:
+        req = _messages(rng)
+        kw = dict(
+            provider=provider, model=model, messages=req["messages"],
+            tenant_id=f"tenant_{int(rng.paretovariate(1.1)) % tenants:04d}", user_id=f"user_{i % 1000}",
+            feature=req["feature"], endpoint=req["endpoint"], region=region, max_tokens=256,
+        )
+        t0 = time.perf_counter()
+        try:
+            if stream:
+                async for _ in gw.achat_stream(**kw):
+                    pass
+            else:
+                await gw.achat(**kw)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+        except Exception as e:
+            name = type(e).__name__
+            errors[name] = errors.get(name, 0) + 1
+        finally:
+            slots.release()
+
+    tasks = set()
+    t_start = time.perf_counter()
+    t_next = 0.0
+    for i in range(total):
+        t_next += rng.expovariate(qps) if poisson else 1.0 / qps
+        delay = t_start + t_next - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if slots.locked():
+            shed += 1  # open loop: past max_in_flight the call is counted, not queued
+            continue
+        await slots.acquire()
+        task = asyncio.ensure_future(one(i))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    sent_s = time.perf_counter() - t_start
+    if tasks:
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t_start
+
+    latencies.sort()
+    return {
+        "provider": provider,
+        "stream": stream,
+        "target_qps": qps,
+        "offered_qps": round(total / sent_s, 1) if sent_s > 0 else 0.0,
+        "completed_qps": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "calls": total,
+        "ok": len(latencies),
+        "errors": errors,
+        "shed": shed,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "p50": _pct(latencies, 0.50),
+            "p95": _pct(latencies, 0.95),
+            "p99": _pct(latencies, 0.99),
+        },
+    }
+
+
+def _stage_means_us() -> Dict[str, float]:
+    out = {}
+    for row in metrics.snapshot().get("gateway_sdk_stage_seconds", []):
+        if row["count"]:
+            out[row["labels"]["stage"]] = round(row["mean"] * 1e6, 2)
+    return out
+
+
+def run(
+    provider: str = "vllm",
+    qps: float = 200.0,
+    duration_s: float = 10.0,
+    *,
+    base_urls: Optional[List[str]] = None,
+    mock: Optional[MockConfig] = None,
+    mock_replicas: int = 1,
+    stream: bool = False,
+    max_in_flight: int = 10_000,
+    emitter_mode: str = "async",
+    events_dir: Optional[str] = None,
+    retry: Optional[RetryPolicy] = None,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    if provider not in MODELS:
+        raise ValueError(f"provider must be one of {sorted(MODELS)}")
+    servers: List[MockOpenAIServer] = []
+    if not base_urls:
+        servers = [MockOpenAIServer(mock or MockConfig(), seed=seed + i).start() for i in range(mock_replicas)]
+        base_urls = [s.base_url for s in servers]
+    # adapters read these lazily on first use
+    if provider == "vllm":
+        os.environ["VLLM_BASE_URLS"] = ",".join(base_urls)
+    else:
+        os.environ["OPENAI_BASE_URL"] = base_urls[0]
+        os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        d = events_dir or tmp
+        gw = LLMGateway(GatewayConfig(
+            price_book_path=os.getenv("PRICE_BOOK_PATH", "pricing/price_book.yaml"),
+            events_jsonl_path=os.path.join(d, "events.jsonl"),
+            emitter_mode=emitter_mode,
+            async_max_concurrency=max_in_flight,
+            retry=retry,
+        ))
+        metrics.REGISTRY.reset()
+        try:
+            out = asyncio.run(drive(
+                gw, provider=provider, qps=qps, duration_s=duration_s,
+                max_in_flight=max_in_flight, stream=stream, seed=seed,
+            ))
+        finally:
+            gw.close()
+            for s in servers:
+                s.stop()
+        path = os.path.join(d, "events.jsonl")
+        if os.path.exists(path):
+            # per status: with retries / hedging the extra attempts and their cost show up here
+            by_status: Dict[str, Dict[str, float]] = {}
+            with open(path, "rb") as f:
+                for line in f:
+                    e = json.loads(line)
+                    s = by_status.setdefault(e["status"], {"events": 0, "cost": 0.0})
+                    s["events"] += 1
+                    s["cost"] += e["computed_cost"]
+            out["events_written"] = sum(int(s["events"]) for s in by_status.values())
+            out["events_by_status"] = {k: {"events": v["events"], "cost": round(v["cost"], 6)} for k, v in by_status.items()}
+        out["sdk_stage_mean_us"] = _stage_means_us()
+        extra = {r["labels"]["kind"]: r["value"] for r in metrics.snapshot().get("gateway_sdk_extra_attempts_total", [])}
+        if extra:
+            out["extra_attempts"] = extra
+        if servers:
+            out["mock"] = [s.stats() for s in servers]
+        if provider == "vllm":
+            out["replicas"] = gw._get_adapter("vllm").stats()
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Load-test LLMGateway at a target QPS (offline by default)")
+    ap.add_argument("--provider", choices=sorted(MODELS), default="vllm")
+    ap.add_argument("--qps", type=float, default=200.0)
+    ap.add_argument("--duration-s", type=float, default=10.0)
+    ap.add_argument("--stream", action="store_true")
+    ap.add_argument("--max-in-flight", type=int, default=10_000)
+    ap.add_argument("--emitter-mode", default="async", choices=("sync", "async", "sharded"))
+    ap.add_argument("--events-dir", default=None, help="keep the emitted events here (default: temp dir)")
+    ap.add_argument("--base-url", action="append", default=None, help="real server(s) instead of the mock (repeatable)")
+    ap.add_argument("--mock-replicas", type=int, default=1)
+    ap.add_argument("--mock-ttft-ms", type=float, default=MockConfig.ttft_ms)
+    ap.add_argument("--mock-tokens-per-s", type=float, default=MockConfig.tokens_per_s)
+    ap.add_argument("--mock-completion-tokens", type=int, default=MockConfig.completion_tokens)
+    ap.add_argument("--mock-error-rate", type=float, default=MockConfig.error_rate)
+    ap.add_argument("--max-attempts", type=int, default=1, help="gateway retries (RetryPolicy.max_attempts)")
+    ap.add_argument("--hedge", action="store_true", help="hedge achat() after the observed p95 latency")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    mock = MockConfig(
+        ttft_ms=args.mock_ttft_ms,
+        tokens_per_s=args.mock_tokens_per_s,
+        completion_tokens=args.mock_completion_tokens,
+        error_rate=args.mock_error_rate,
+    )
+    print(json.dumps(run(
+        args.provider, args.qps, args.duration_s,
+        base_urls=args.base_url, mock=mock, mock_replicas=args.mock_replicas, stream=args.stream,
+        max_in_flight=args.max_in_flight, emitter_mode=args.emitter_mode, events_dir=args.events_dir,
+        retry=RetryPolicy(max_attempts=args.max_attempts, hedge=args.hedge), seed=args.seed,
+    ), indent=2))
+
+
+if __name__ == "__main__":
+    main()
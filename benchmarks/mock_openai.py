@@ -0,0 +1,288 @@
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Local OpenAI-compatible server for load tests (no GPU, no API key, no network).
+#
+#   POST /v1/chat/completions   non-streaming and stream=True (SSE, honours stream_options.include_usage)
+#   GET  /v1/models, /health, /stats
+#
+# Each call waits ttft + completion_tokens / tokens_per_s (log-normal jitter), so the
+# gateway sees realistic latency / TTFT; usage is prompt chars / chars_per_token.
+# One asyncio loop with keep-alive HTTP/1.1: thousands of concurrent calls are just sleeps.
+
+
+@dataclass(frozen=True)
+class MockConfig:
+    ttft_ms: float = 50.0
+    tokens_per_s: float = 500.0  # 0 = whole completion at ttft
+    completion_tokens: int = 64  # median; max_tokens in the request caps it
+    jitter_sigma: float = 0.2  # log-normal spread of ttft / speed / completion length
+    error_rate: float = 0.0  # share of calls answered with HTTP 500
+    chars_per_token: float = 4.0
+    stream_interval_ms: float = 20.0  # SSE deltas are batched per interval, not one write per token
+    model: str = "mock-model"
+
+
+class MockOpenAIServer:
+    """
+    Runs on its own thread / event loop:
+
+        srv = MockOpenAIServer(MockConfig(ttft_ms=80)).start()
+        os.environ["VLLM_BASE_URL"] = srv.base_url   # http://127.0.0.1:<port>/v1
+        ...
+        srv.stop()
+    """
+
+    def __init__(self, cfg: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0, seed: int = 0):
+        self.cfg = cfg or MockConfig()
+        self.host = host
+        self.port = port
+        self._rng = random.Random(seed)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completion_tokens = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self._run, name=f"mock-openai-{self.port}", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _run(self) -> None:
+        loop = self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._server = loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        loop.run_forever()
+        loop.close()
+
+    async def _shutdown(self) -> None:
+        # keep-alive connections have handlers parked in readline(): cancel them before stopping
+        self._server.close()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        asyncio.get_running_loop().stop()
+
+    def stop(self) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), loop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "completion_tokens": self.completion_tokens,
+        }
+
+    # ---- HTTP ----
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                try:
+                    method, path, _ = line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    return
+                headers: Dict[str, str] = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                n = int(headers.get("content-length", 0) or 0)
+                body = await reader.readexactly(n) if n else b""
+
+                path = path.split("?", 1)[0]
+                if method == "POST" and path.endswith("/chat/completions"):
+                    await self._chat(body, writer)
+                elif method == "GET" and path.endswith("/models"):
+                    self._json(writer, 200, {"object": "list", "data": [{"id": self.cfg.model, "object": "model", "owned_by": "mock"}]})
+                elif method == "GET" and path == "/health":
+                    self._json(writer, 200, {"ok": True})
+                elif method == "GET" and path == "/stats":
+                    self._json(writer, 200, self.stats())
+                else:
+                    self._json(writer, 404, {"error": {"message": f"no route {method} {path}", "type": "not_found"}})
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            return
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _json(writer: asyncio.StreamWriter, status: int, obj: Dict[str, Any]) -> None:
+        body = json.dumps(obj).encode("utf-8")
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}.get(status, "")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+        )
+
+    def _plan(self, req: Dict[str, Any]) -> Tuple[int, int, float, float]:
+        # (prompt_tokens, completion_tokens, ttft_s, seconds per token)
+        cfg, rng = self.cfg, self._rng
+        chars = sum(len(str(m.get("content", ""))) for m in req.get("messages", []))
+        pt = max(1, int(chars / cfg.chars_per_token))
+        ct = max(1, int(cfg.completion_tokens * rng.lognormvariate(0.0, cfg.jitter_sigma)))
+        limit = req.get("max_completion_tokens") or req.get("max_tokens")
+        if limit:
+            ct = min(ct, int(limit))
+        ttft = cfg.ttft_ms / 1000.0 * rng.lognormvariate(0.0, cfg.jitter_sigma)
+        per_token = 1.0 / (cfg.tokens_per_s * rng.lognormvariate(0.0, cfg.jitter_sigma)) if cfg.tokens_per_s > 0 else 0.0
+        return pt, ct, ttft, per_token
+
+    async def _chat(self, body: bytes, writer: asyncio.StreamWriter) -> None:
+        try:
+            req = json.loads(body or b"{}")
+        except ValueError:
+            self._json(writer, 400, {"error": {"message": "invalid JSON body", "type": "invalid_request_error"}})
+            return
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            pt, ct, ttft, per_token = self._plan(req)
+            if self._rng.random() < self.cfg.error_rate:
+                await asyncio.sleep(ttft)
+                self.errors += 1
+                self._json(writer, 500, {"error": {"message": "mock: injected failure", "type": "server_error"}})
+                return
+            model = req.get("model") or self.cfg.model
+            cid = "chatcmpl-" + uuid.uuid4().hex
+            created = int(time.time())
+            if req.get("stream"):
+                include_usage = bool((req.get("stream_options") or {}).get("include_usage"))
+                await self._stream(writer, cid, created, model, pt, ct, ttft, per_token, include_usage)
+            else:
+                await asyncio.sleep(ttft + ct * per_token)
+                self._json(writer, 200, {
+                    "id": cid,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": _text(ct)},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": pt, "completion_tokens": ct, "total_tokens": pt + ct},
+                })
+            self.completion_tokens += ct
+        finally:
+            self.in_flight -= 1
+
+    async def _stream(
+        self,
+        writer: asyncio.StreamWriter,
+        cid: str,
+        created: int,
+        model: str,
+        pt: int,
+        ct: int,
+        ttft: float,
+        per_token: float,
+        include_usage: bool,
+    ) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+
+        def event(obj: Any) -> None:
+            data = b"data: " + (obj if isinstance(obj, bytes) else json.dumps(obj).encode("utf-8")) + b"\n\n"
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+        def chunk(choices: List[Dict[str, Any]], **extra: Any) -> Dict[str, Any]:
+            return {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model, "choices": choices, **extra}
+
+        await asyncio.sleep(ttft)
+        event(chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]))
+        interval = self.cfg.stream_interval_ms / 1000.0
+        per_tick = max(1, int(interval / per_token)) if per_token > 0 else ct
+        sent = 0
+        while sent < ct:
+            k = min(per_tick, ct - sent)
+            event(chunk([{"index": 0, "delta": {"content": _text(k)}, "finish_reason": None}]))
+            sent += k
+            await writer.drain()
+            if sent < ct:
+                await asyncio.sleep(k * per_token)
+        event(chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if include_usage:
+            event(chunk([], usage={"prompt_tokens": pt, "completion_tokens": ct, "total_tokens": pt + ct}))
+        event(b"[DONE]")
+        writer.write(b"0\r\n\r\n")
+
+
+def _text(tokens: int) -> str:
+    # ~1 token per word
+    return "lorem " * tokens
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Local OpenAI-compatible mock server (load tests)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--replicas", type=int, default=1, help="servers on port, port+1, ... (VLLM_BASE_URLS)")
+    ap.add_argument("--ttft-ms", type=float, default=MockConfig.ttft_ms)
+    ap.add_argument("--tokens-per-s", type=float, default=MockConfig.tokens_per_s)
+    ap.add_argument("--completion-tokens", type=int, default=MockConfig.completion_tokens)
+    ap.add_argument("--jitter-sigma", type=float, default=MockConfig.jitter_sigma)
+    ap.add_argument("--error-rate", type=float, default=MockConfig.error_rate)
+    args = ap.parse_args()
+
+    cfg = MockConfig(
+        ttft_ms=args.ttft_ms,
+        tokens_per_s=args.tokens_per_s,
+        completion_tokens=args.completion_tokens,
+        jitter_sigma=args.jitter_sigma,
+        error_rate=args.error_rate,
+    )
+    servers = [MockOpenAIServer(cfg, args.host, args.port + i, seed=i).start() for i in range(args.replicas)]
+    print("VLLM_BASE_URLS=" + ",".join(s.base_url for s in servers), flush=True)
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps([s.stats() for s in servers]), flush=True)
+    except KeyboardInterrupt:
+        for s in servers:
+            s.stop()
+
+
+if __name__ == "__main__":
+    main()
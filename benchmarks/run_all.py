@@ -0,0 +1,73 @@
+import argparse
+import json
+from typing import Any, Dict, Iterator, Tuple
+
+from benchmarks import bench_emitter, bench_event, bench_gateway, bench_ingest, bench_pricing
+from benchmarks._util import environment
+
+SUITES = {
+    "gateway": bench_gateway.run,
+    "pricing": bench_pricing.run,
+    "emitter": bench_emitter.run,
+    "event": bench_event.run,
+    "ingest": bench_ingest.run,
+}
+
+# metric name -> True if higher is better
+_DIRECTION = {
+    "mean_us": False, "p50_us": False, "p99_us": False, "build_ms": False, "bytes_per_event": False, "resolve_many_us_per_item": False,
+    "ops_per_s": True, "caller_events_per_s": True, "durable_events_per_s": True, "rows_per_s": True, "mb_per_s": True,
+}
+
+
+def _flatten(d: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, float]]:
+    for k, v in d.items():
+        if isinstance(v, dict):
+            yield from _flatten(v, f"{prefix}{k}.")
+        elif isinstance(v, (int, float)) and k in _DIRECTION:
+            yield f"{prefix}{k}", float(v)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> int:
+    """Print metrics that got worse by more than `tolerance` (fraction); returns the count."""
+    base = dict(_flatten(baseline["results"]))
+    regressions = 0
+    for name, value in _flatten(current["results"]):
+        old = base.get(name)
+        if not old:
+            continue
+        higher_is_better = _DIRECTION[name.rsplit(".", 1)[-1]]
+        change = (value - old) / old
+        worse = -change if higher_is_better else change
+        if worse > tolerance:
+            regressions += 1
+            print(f"REGRESSION {name}: {old:g} -> {value:g} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run SDK benchmarks and write machine-readable JSON.")
+    ap.add_argument("--suite", action="append", choices=sorted(SUITES), help="default: all")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--baseline", help="previous results JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    args = ap.parse_args()
+
+    results = {}
+    for name in args.suite or list(SUITES):
+        print(f"running {name} ...")
+        results[name] = SUITES[name]()
+    report = {"env": environment(), "results": results}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(baseline, report, args.tolerance):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
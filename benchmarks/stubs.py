@@ -0,0 +1,35 @@
+from typing import Any, Dict, List
+
+
+class StubAdapter:
+    """Adapter stand-in with no network: measures what the SDK adds around a model call."""
+
+    def __init__(self, prompt_tokens: int = 200, completion_tokens: int = 50, text: str = "ok"):
+        self._result = {
+            "text": text,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "raw": None,
+        }
+
+    def chat(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Dict[str, Any]:
+        return dict(self._result)
+
+    async def achat(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Dict[str, Any]:
+        return dict(self._result)
+
+
+class NullEmitter:
+    def emit(self, event: Dict[str, Any]) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def stub_llm_client(prompt: str, model: str, **kwargs: Any) -> Dict[str, Any]:
+    return {"text": "ok"}
@@ -0,0 +1,342 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from gateway_sdk import rowbinary
+from gateway_sdk.pricing import PriceBook
+from gateway_sdk.repricing import PriceArrays
+
+# Vectorized synthetic usage events for load-testing ingest / ClickHouse / the dashboards.
+#
+# Every column of a batch is drawn with NumPy at once (tenants Zipf-distributed, log-normal
+# token counts per feature, retries as failed attempts of the same request_id, cache hits
+# at cost 0) and priced with PriceArrays, so only the final line formatting is per row.
+# Events have the same fields as the gateway's.
+
+
+@dataclass(frozen=True)
+class FeatureProfile:
+    name: str
+    endpoint: str
+    weight: float
+    prompt_tokens_median: int
+    completion_tokens_median: int
+    cache_hit_rate: float = 0.0
+    fail_rate: float = 0.02  # per attempt; a failed attempt is retried (up to max_attempts)
+    templates: int = 5
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    provider: str
+    model: str
+    region: str
+    weight: float
+    tokens_per_s: float = 60.0
+    ttft_ms: float = 300.0
+
+
+DEFAULT_FEATURES: Tuple[FeatureProfile, ...] = (
+    FeatureProfile("chat_support", "/v1/chat", 0.40, 1200, 250, cache_hit_rate=0.05),
+    FeatureProfile("search_rerank", "/v1/rerank", 0.25, 2500, 40, cache_hit_rate=0.30),
+    FeatureProfile("summarize", "/v1/summarize", 0.15, 6000, 400, cache_hit_rate=0.02, templates=3),
+    FeatureProfile("code_assist", "/v1/chat", 0.10, 3000, 700, fail_rate=0.04),
+    FeatureProfile("extract", "/v1/extract", 0.10, 1800, 120, cache_hit_rate=0.10, templates=20),
+)
+
+# keys of pricing/price_book.yaml
+DEFAULT_MODELS: Tuple[ModelProfile, ...] = (
+    ModelProfile("openai", "gpt-4o-mini", "us", 0.6, tokens_per_s=80.0, ttft_ms=350.0),
+    ModelProfile("vllm", "gpt-oss-20b-local", "onprem", 0.3, tokens_per_s=120.0, ttft_ms=120.0),
+    ModelProfile("gemini", "gemini-3-flash-preview", "global", 0.1, tokens_per_s=150.0, ttft_ms=250.0),
+)
+
+
+@dataclass(frozen=True)
+class SynthConfig:
+    start: str = "2025-12-01T00:00:00"  # UTC
+    days: float = 7.0
+    tenants: int = 200
+    tenant_zipf_a: float = 1.1  # a few tenants carry most of the traffic
+    users_per_tenant: int = 50
+    token_sigma: float = 0.6  # log-normal spread of prompt / completion tokens
+    max_attempts: int = 3
+    features: Tuple[FeatureProfile, ...] = DEFAULT_FEATURES
+    models: Tuple[ModelProfile, ...] = DEFAULT_MODELS
+
+
+def _weights(items: Sequence[Any]) -> np.ndarray:
+    w = np.asarray([x.weight for x in items], dtype=np.float64)
+    return w / w.sum()
+
+
+_HEX = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+_UUID_POS = np.asarray([i for i in range(36) if i not in (8, 13, 18, 23)])
+
+
+def _hex_ids(rng: np.random.Generator, n: int) -> List[str]:
+    # uuid4-shaped ids, built as one (n, 36) byte array instead of n uuid.uuid4() calls
+    b = np.frombuffer(rng.bytes(16 * n), dtype=np.uint8).reshape(n, 16)
+    nibbles = np.stack((b >> 4, b & 15), axis=-1).reshape(n, 32)
+    out = np.full((n, 36), ord("-"), dtype=np.uint8)
+    out[:, _UUID_POS] = _HEX[nibbles]
+    out[:, 14] = ord("4")
+    out[:, 19] = _HEX[8 | (nibbles[:, 16] & 3)]
+    return out.view("S36").ravel().astype(str).tolist()
+
+
+class SyntheticEvents:
+    """
+    Batches of realistic usage events; batch k covers the k-th slice of [start, start + days).
+
+        gen = SyntheticEvents(SynthConfig(days=1), PriceBook.load("pricing/price_book.yaml"))
+        for cols in gen.batches(rows=1_000_000, batch_rows=100_000):
+            ...   # dict of column -> list, see columns()
+    """
+
+    def __init__(self, cfg: SynthConfig, price_book: PriceBook, seed: int = 0):
+        self.cfg = cfg
+        self.rng = np.random.default_rng(seed)
+        self.prices = PriceArrays(price_book)
+        self._start_ms = int(np.datetime64(cfg.start, "ms").astype(np.int64))
+        self._span_ms = int(cfg.days * 86_400_000)
+
+        ranks = np.arange(1, cfg.tenants + 1, dtype=np.float64)
+        p = ranks ** -cfg.tenant_zipf_a
+        self._tenant_p = p / p.sum()
+        self._tenant_names = np.asarray([f"tenant_{i:04d}" for i in range(cfg.tenants)], dtype=object)
+
+        f = cfg.features
+        self._feature_p = _weights(f)
+        self._feature_names = np.asarray([x.name for x in f], dtype=object)
+        self._endpoints = np.asarray([x.endpoint for x in f], dtype=object)
+        self._pt_median = np.asarray([x.prompt_tokens_median for x in f], dtype=np.float64)
+        self._ct_median = np.asarray([x.completion_tokens_median for x in f], dtype=np.float64)
+        self._cache_rate = np.asarray([x.cache_hit_rate for x in f], dtype=np.float64)
+        self._fail_rate = np.asarray([x.fail_rate for x in f], dtype=np.float64)
+        self._n_templates = np.asarray([x.templates for x in f], dtype=np.int64)
+        # stable 16-hex template ids per (feature, template #)
+        self._template_base = np.cumsum(np.concatenate(([0], self._n_templates[:-1])))
+        self._template_ids = np.asarray(
+            [hashlib.blake2b(f"{x.name}/{t}".encode(), digest_size=8).hexdigest() for x in f for t in range(x.templates)],
+            dtype=object,
+        )
+
+        m = cfg.models
+        self._model_p = _weights(m)
+        self._providers = np.asarray([x.provider for x in m], dtype=object)
+        self._models = np.asarray([x.model for x in m], dtype=object)
+        self._regions = np.asarray([x.region for x in m], dtype=object)
+        self._tps = np.asarray([x.tokens_per_s for x in m], dtype=np.float64)
+        self._ttft = np.asarray([x.ttft_ms for x in m], dtype=np.float64)
+        self._key_ids = np.asarray([self.prices.key_id(x.provider, x.model, x.region) for x in m], dtype=np.int64)
+
+    def _requests(self, n: int, t_lo: int, t_hi: int) -> Dict[str, np.ndarray]:
+        cfg, rng = self.cfg, self.rng
+        feat = rng.choice(len(self._feature_p), size=n, p=self._feature_p)
+        fail = self._fail_rate[feat]
+        # attempts = 1 + consecutive failures, capped; the last attempt fails only at the cap
+        attempts = np.minimum(rng.geometric(1.0 - fail), cfg.max_attempts)
+        final_error = (attempts == cfg.max_attempts) & (rng.random(n) < fail)
+        cache_hit = (attempts == 1) & (rng.random(n) < self._cache_rate[feat])
+        tenant = rng.choice(cfg.tenants, size=n, p=self._tenant_p)
+        return {
+            "ts": np.sort(rng.integers(t_lo, t_hi, size=n)),
+            "feature": feat,
+            "tenant": tenant,
+            "user": rng.integers(0, cfg.users_per_tenant, size=n),
+            "model": rng.choice(len(self._model_p), size=n, p=self._model_p),
+            "template": self._template_base[feat] + rng.integers(0, self._n_templates[feat]),
+            "attempts": attempts,
+            "final_error": final_error,
+            "cache_hit": cache_hit,
+        }
+
+    def columns(self, n_requests: int, t_lo: int, t_hi: int) -> Dict[str, List[Any]]:
+        """One batch as event columns (lists, one entry per attempt); ~n_requests * 1.0x rows."""
+        cfg, rng = self.cfg, self.rng
+        r = self._requests(n_requests, t_lo, t_hi)
+        attempts = r["attempts"]
+        n = int(attempts.sum())
+        req = np.repeat(np.arange(n_requests), attempts)
+        # attempt number within its request: 1..attempts
+        first = np.cumsum(attempts) - attempts
+        attempt = np.arange(n) - np.repeat(first, attempts) + 1
+        last = attempt == attempts[req]
+        error = ~last | r["final_error"][req]
+        cache_hit = r["cache_hit"][req]
+
+        feat = r["feature"][req]
+        model = r["model"][req]
+        sigma = cfg.token_sigma
+        pt = np.maximum(1, rng.lognormal(np.log(self._pt_median[feat]), sigma)).astype(np.int64)
+        ct = np.maximum(1, rng.lognormal(np.log(self._ct_median[feat]), sigma)).astype(np.int64)
+        ct = np.where(error, 0, ct)
+
+        ttft = self._ttft[model] * rng.lognormal(0.0, 0.3, size=n)
+        latency = ttft + ct * 1000.0 / (self._tps[model] * rng.lognormal(0.0, 0.2, size=n))
+        # errors fail fast-ish (timeouts / 5xx), cache hits are local lookups
+        latency = np.where(error, ttft * rng.uniform(0.5, 3.0, size=n), latency)
+        latency = np.where(cache_hit, rng.uniform(0.5, 5.0, size=n), latency)
+        ttft = np.where(cache_hit, latency, np.minimum(ttft, latency))
+        latency_ms = np.maximum(1, latency).astype(np.int64)
+        ttft_ms = np.maximum(1, ttft).astype(np.int64)
+        tokens_per_s = np.round(ct * 1000.0 / latency_ms, 3)
+
+        # retries start after the previous attempt's latency plus a short backoff
+        backoff = np.where(attempt > 1, np.roll(latency_ms, 1) + (200 << np.maximum(attempt - 2, 0)), 0)
+        ts = r["ts"][req] + _cumsum_within(backoff, req)
+
+        idx, up, uc, cost, ver = self.prices.reprice(self._key_ids[model], ts, pt, ct, cache_hit)
+        unpriced = idx < 0
+        up = np.where(unpriced, 0.0, up)
+        uc = np.where(unpriced, 0.0, uc)
+        cost = np.where(unpriced, 0.0, cost)
+        ver = np.where(unpriced, "", ver)
+
+        tenant = r["tenant"][req]
+        stamp = np.datetime_as_string(ts.astype("datetime64[ms]"), unit="ms")
+        request_ids = np.asarray(_hex_ids(rng, n_requests), dtype=object)[req]
+        users = r["user"][req]
+        return {
+            "timestamp": [s.replace("T", " ") for s in stamp.tolist()],
+            "request_id": request_ids.tolist(),
+            "attempt": attempt.tolist(),
+            "tenant_id": self._tenant_names[tenant].tolist(),
+            "user_id": [f"{t}_u{u}" for t, u in zip(self._tenant_names[tenant].tolist(), users.tolist())],
+            "feature": self._feature_names[feat].tolist(),
+            "endpoint": self._endpoints[feat].tolist(),
+            "prompt_template_id": self._template_ids[r["template"][req]].tolist(),
+            "provider": self._providers[model].tolist(),
+            "model": self._models[model].tolist(),
+            "region": self._regions[model].tolist(),
+            "prompt_tokens": pt.tolist(),
+            "completion_tokens": ct.tolist(),
+            "total_tokens": (pt + ct).tolist(),
+            "latency_ms": latency_ms.tolist(),
+            "ttft_ms": ttft_ms.tolist(),
+            "tokens_per_s": tokens_per_s.tolist(),
+            "status": np.where(error, "error", "ok").tolist(),
+            "retry_count": (attempt - 1).tolist(),
+            "cache_hit": cache_hit.astype(np.int64).tolist(),
+            "price_version": ver.tolist(),
+            "unit_price_prompt": up.tolist(),
+            "unit_price_completion": uc.tolist(),
+            "computed_cost": cost.tolist(),
+            "prompt_chars": (pt * 4).tolist(),
+            "completion_chars": (ct * 4).tolist(),
+            "replica": [""] * n,
+        }
+
+    def batches(self, rows: int, batch_rows: int = 100_000) -> Iterator[Dict[str, List[Any]]]:
+        """~rows events (retries add a few percent) in time order, batch_rows requests at a time."""
+        n_batches = max(1, -(-rows // batch_rows))
+        step = self._span_ms / n_batches
+        for k in range(n_batches):
+            n = min(batch_rows, rows - k * batch_rows)
+            t_lo = self._start_ms + int(k * step)
+            yield self.columns(n, t_lo, max(t_lo + 1, self._start_ms + int((k + 1) * step)))
+
+
+def _cumsum_within(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    # running sum of values inside each run of equal (sorted) group ids
+    total = np.cumsum(values)
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    offset = np.repeat(total[starts] - values[starts], np.diff(np.r_[starts, len(values)]))
+    return total - offset
+
+
+# Every string column is generated from fixed ASCII names / hex ids, so JSON quoting is a
+# plain "%s" (no escaping needed); floats use repr like json.dumps.
+_JSONL_LINE = (
+    '{"timestamp": "%s", "request_id": "%s", "attempt": %d, "tenant_id": "%s", "user_id": "%s", '
+    '"feature": "%s", "endpoint": "%s", "prompt_template_id": "%s", "provider": "%s", "model": "%s", '
+    '"region": "%s", "prompt_tokens": %d, "completion_tokens": %d, "total_tokens": %d, '
+    '"latency_ms": %d, "ttft_ms": %d, "tokens_per_s": %r, "status": "%s", "retry_count": %d, '
+    '"cache_hit": %d, "price_version": "%s", "unit_price_prompt": %r, "unit_price_completion": %r, '
+    '"computed_cost": %r, "prompt_chars": %d, "completion_chars": %d, "replica": "%s"}\n'
+)
+_FIELDS = (
+    "timestamp", "request_id", "attempt", "tenant_id", "user_id", "feature", "endpoint", "prompt_template_id",
+    "provider", "model", "region", "prompt_tokens", "completion_tokens", "total_tokens", "latency_ms", "ttft_ms",
+    "tokens_per_s", "status", "retry_count", "cache_hit", "price_version", "unit_price_prompt",
+    "unit_price_completion", "computed_cost", "prompt_chars", "completion_chars", "replica",
+)
+
+
+def jsonl_lines(cols: Dict[str, List[Any]]) -> str:
+    fmt = _JSONL_LINE
+    return "".join([fmt % row for row in zip(*(cols[f] for f in _FIELDS))])
+
+
+def iter_events(cols: Dict[str, List[Any]]) -> Iterator[Dict[str, Any]]:
+    for row in zip(*(cols[f] for f in _FIELDS)):
+        yield dict(zip(_FIELDS, row))
+
+
+def write_events(
+    path: str,
+    rows: int,
+    cfg: Optional[SynthConfig] = None,
+    *,
+    price_book_path: str = "pricing/price_book.yaml",
+    fmt: str = "jsonl",
+    batch_rows: int = 100_000,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Write ~rows synthetic events to path (jsonl / rowbinary); returns counts and rates."""
+    if fmt not in ("jsonl", "rowbinary"):
+        raise ValueError(f"Unknown format: {fmt}")
+    gen = SyntheticEvents(cfg or SynthConfig(), PriceBook.load(price_book_path), seed=seed)
+    d = os.path.dirname(path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    n = 0
+    t0 = time.perf_counter()
+    with open(path, "wb") as f:
+        if fmt == "rowbinary":
+            f.write(rowbinary.file_header())
+        for cols in gen.batches(rows, batch_rows):
+            if fmt == "jsonl":
+                f.write(jsonl_lines(cols).encode("utf-8"))
+            else:
+                f.write(b"".join([rowbinary.encode_record(e) for e in iter_events(cols)]))
+            n += len(cols["timestamp"])
+    dt = time.perf_counter() - t0
+    return {
+        "path": path,
+        "events": n,
+        "mb": round(os.path.getsize(path) / 1e6, 2),
+        "seconds": round(dt, 3),
+        "events_per_s": round(n / dt, 1) if dt > 0 else 0.0,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Write synthetic LLM usage events (load tests)")
+    ap.add_argument("--out", default="data/synth_events.jsonl")
+    ap.add_argument("--rows", type=int, default=1_000_000, help="requests to generate (retries add attempts)")
+    ap.add_argument("--format", choices=("jsonl", "rowbinary"), default="jsonl")
+    ap.add_argument("--start", default=SynthConfig.start, help="UTC, e.g. 2025-12-01T00:00:00")
+    ap.add_argument("--days", type=float, default=SynthConfig.days)
+    ap.add_argument("--tenants", type=int, default=SynthConfig.tenants)
+    ap.add_argument("--batch-rows", type=int, default=100_000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--price-book", default=os.getenv("PRICE_BOOK_PATH", "pricing/price_book.yaml"))
+    args = ap.parse_args()
+
+    cfg = SynthConfig(start=args.start, days=args.days, tenants=args.tenants)
+    print(json.dumps(write_events(
+        args.out, args.rows, cfg, price_book_path=args.price_book, fmt=args.format,
+        batch_rows=args.batch_rows, seed=args.seed,
+    ), indent=2))
+
+
+if __name__ == "__main__":
+    main()
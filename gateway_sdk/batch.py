@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict
+
+# Client-side rate limits for LLMGateway.chat_batch(): one RateLimiter per provider, shared by
+# every worker thread (and every chat_batch call of the gateway).
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    requests_per_min: float = 0.0  # 0 = unlimited
+    tokens_per_min: float = 0.0  # prompt + completion, as the provider counts them
+    # bucket size: how much of a minute's budget may go out at once
+    burst_s: float = 10.0
+
+
+class RateLimiter:
+    """
+    Two token buckets (requests, tokens). acquire() blocks until both have room;
+    the token cost is an estimate up front, settle() books the real usage afterwards
+    (the bucket may go negative, which delays the next callers).
+    """
+
+    def __init__(self, limit: RateLimit):
+        self.limit = limit
+        self._lock = Lock()
+        self._req_cap = limit.requests_per_min * limit.burst_s / 60.0 if limit.requests_per_min > 0 else 0.0
+        self._tok_cap = limit.tokens_per_min * limit.burst_s / 60.0 if limit.tokens_per_min > 0 else 0.0
+        self._req = self._req_cap
+        self._tok = self._tok_cap
+        self._t = time.monotonic()
+        self.waited_s = 0.0
+
+    def _refill(self, now: float) -> None:
+        dt = now - self._t
+        self._t = now
+        if self._req_cap:
+            self._req = min(self._req_cap, self._req + dt * self.limit.requests_per_min / 60.0)
+        if self._tok_cap:
+            self._tok = min(self._tok_cap, self._tok + dt * self.limit.tokens_per_min / 60.0)
+
+    def acquire(self, tokens: int) -> None:
+        # a request bigger than the bucket only waits for a full bucket
+        need_req = min(1.0, self._req_cap) if self._req_cap else 0.0
+        need_tok = min(float(tokens), self._tok_cap) if self._tok_cap else 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._req >= need_req and self._tok >= need_tok:
+                    self._req -= 1.0 if self._req_cap else 0.0
+                    self._tok -= tokens if self._tok_cap else 0.0
+                    return
+                wait = 0.0
+                if self._req < need_req:
+                    wait = (need_req - self._req) * 60.0 / self.limit.requests_per_min
+                if self._tok < need_tok:
+                    wait = max(wait, (need_tok - self._tok) * 60.0 / self.limit.tokens_per_min)
+                self.waited_s += wait
+            time.sleep(wait)
+
+    def settle(self, estimated: int, actual: int) -> None:
+        if self._tok_cap:
+            with self._lock:
+                self._tok -= actual - estimated
+
+
+def estimate_tokens(prompt_tokens: int, kwargs: Dict[str, Any]) -> int:
+    """Upper-ish bound before the call: local prompt count + the completion cap (256 if none given)."""
+    cap = kwargs.get("max_completion_tokens") or kwargs.get("max_tokens") or 256
+    return int(prompt_tokens) + int(cap)
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# In-process spend accounting + budgets for LLMGateway.
+#
+# Every usage event's computed_cost is added to sliding-window counters, one per budget and
+# per value of the budget's `per` dimensions (tenant_id / feature / model). A window is a ring
+# of `buckets` time slots with a running total, so reading the spend is a dict lookup and an
+# attribute read; the ring only rotates (under its shard's lock) when a slot boundary passes.
+# Counters are spread over `shards` dicts, each with its own lock, so concurrent events of
+# different tenants rarely wait on each other.
+#
+# Spend is per process: several gateway workers each enforce the budget on their own traffic
+# plus whatever seed_from_clickhouse() loaded at startup.
+
+DIMENSIONS = ("tenant_id", "feature", "model")
+ACTIONS = ("reject", "downgrade")
+
+
+@dataclass(frozen=True)
+class Budget:
+    limit_usd: float
+    window_s: float = 24 * 3600.0
+    # one counter per value combination of these dimensions; () = one shared counter
+    per: Tuple[str, ...] = ("tenant_id",)
+    # only calls matching these count / are checked (None = any)
+    tenant_id: Optional[str] = None
+    feature: Optional[str] = None
+    model: Optional[str] = None
+    # "reject": raise BudgetExceeded before the call; "downgrade": send it to downgrade_model instead
+    action: str = "reject"
+    downgrade_model: Optional[str] = None
+    downgrade_provider: Optional[str] = None  # default: same provider
+    # default: the call's region for the same provider, else GatewayConfig.region_default,
+    # else any region the price book prices the downgrade model in
+    downgrade_region: Optional[str] = None
+    name: str = ""
+
+    def label(self) -> str:
+        return self.name or f"{'/'.join(self.per) or 'all'}<={self.limit_usd:g}usd/{self.window_s:g}s"
+
+
+class BudgetExceeded(RuntimeError):
+    def __init__(self, budget: Budget, key: Tuple[str, ...], spent: float, estimate: float, note: str = ""):
+        self.budget = budget
+        self.key = key
+        self.spent = spent
+        self.estimate = estimate
+        super().__init__(
+            f"budget {budget.label()} exceeded for {dict(zip(budget.per, key))}: "
+            f"spent {spent:.6f} + estimated {estimate:.6f} > {budget.limit_usd:g} USD"
+            + (f"; {note}" if note else "")
+        )
+
+
+class _Window:
+    __slots__ = ("slots", "head", "total")
+
+    def __init__(self, n: int, head: int):
+        self.slots = [0.0] * n
+        self.head = head  # absolute slot index of the newest slot
+        self.total = 0.0
+
+    def advance(self, idx: int) -> None:
+        # caller holds the shard lock; clears the slots that fell out of the window
+        steps = idx - self.head
+        if steps <= 0:
+            return
+        slots = self.slots
+        n = len(slots)
+        if steps >= n:
+            slots[:] = [0.0] * n
+        else:
+            for i in range(self.head + 1, idx + 1):
+                slots[i % n] = 0.0
+        self.head = idx
+        self.total = sum(slots)  # re-summed, so float error doesn't build up
+
+
+class SpendTracker:
+    """
+    budgets: checked in order; the first "reject" budget that would be exceeded wins over
+    any "downgrade" one.
+    """
+
+    def __init__(self, budgets: Sequence[Budget], *, buckets: int = 60, shards: int = 16):
+        for b in budgets:
+            if b.action not in ACTIONS:
+                raise ValueError(f"Unknown budget action: {b.action} (expected one of {ACTIONS})")
+            if b.action == "downgrade" and not b.downgrade_model:
+                raise ValueError(f"budget {b.label()}: action='downgrade' needs downgrade_model")
+            bad = set(b.per) - set(DIMENSIONS)
+            if bad:
+                raise ValueError(f"budget {b.label()}: per must be a subset of {DIMENSIONS}, got {sorted(bad)}")
+            if b.limit_usd < 0 or b.window_s <= 0:
+                raise ValueError(f"budget {b.label()}: limit_usd must be >= 0 and window_s > 0")
+        self.budgets = tuple(budgets)
+        self.buckets = buckets
+        self._slot_s = [b.window_s / buckets for b in self.budgets]
+        self._per_idx = [tuple(DIMENSIONS.index(d) for d in b.per) for b in self.budgets]
+        self._filters = [
+            tuple((i, v) for i, v in enumerate((b.tenant_id, b.feature, b.model)) if v is not None)
+            for b in self.budgets
+        ]
+        self._mask = shards - 1 if shards & (shards - 1) == 0 else None
+        self._shards: List[Tuple[Lock, Dict[Tuple[Any, ...], _Window]]] = [(Lock(), {}) for _ in range(shards)]
+        # (tenant_id, feature, model) -> counters it touches, so the hot path skips matching / hashing
+        self._routes: Dict[Tuple[str, str, str], Tuple[Tuple[Any, ...], ...]] = {}
+        self.max_routes = 65536
+        self.recorded = 0
+
+    def _shard(self, key: Tuple[Any, ...]) -> Tuple[Lock, Dict[Tuple[Any, ...], _Window]]:
+        h = hash(key)
+        return self._shards[h & self._mask if self._mask is not None else h % len(self._shards)]
+
+    def _route(self, dims: Tuple[str, str, str]) -> Tuple[Tuple[Any, ...], ...]:
+        # (budget index, limit, slot seconds, counter key, shard lock, shard dict) per applicable budget
+        r = self._routes.get(dims)
+        if r is None:
+            out = []
+            for bi, flt in enumerate(self._filters):
+                if all(dims[i] == v for i, v in flt):
+                    key = (bi,) + tuple(dims[i] for i in self._per_idx[bi])
+                    out.append((bi, self.budgets[bi].limit_usd, self._slot_s[bi], key) + self._shard(key))
+            if len(self._routes) >= self.max_routes:
+                self._routes.clear()
+            r = self._routes[dims] = tuple(out)
+        return r
+
+    def add(self, tenant_id: str, feature: str, model: str, cost: float, ts: Optional[float] = None) -> None:
+        if not cost:
+            return
+        now = time.time()
+        ts = now if ts is None else ts
+        n = self.buckets
+        for _, _, slot_s, key, lock, windows in self._route((tenant_id, feature, model)):
+            idx = int(ts // slot_s)
+            head = int(now // slot_s)
+            if idx <= head - n:
+                continue  # already outside the window (old seed rows)
+            with lock:
+                w = windows.get(key)
+                if w is None:
+                    w = windows[key] = _Window(n, head)
+                w.advance(max(idx, head))
+                w.slots[min(idx, w.head) % n] += cost
+                w.total += cost
+        self.recorded += 1
+
+    def record(self, event: Any) -> None:
+        """Book one usage event (dict or UsageEvent) at the current time."""
+        self.add(event["tenant_id"], event["feature"], event["model"], float(event["computed_cost"] or 0.0))
+
+    @staticmethod
+    def _spent(slot_s: float, key: Tuple[Any, ...], lock: Lock, windows: Dict[Tuple[Any, ...], _Window], now: float) -> float:
+        w = windows.get(key)
+        if w is None:
+            return 0.0
+        idx = int(now // slot_s)
+        if idx != w.head:
+            with lock:
+                w.advance(idx)
+        return w.total
+
+    def spent(self, budget: Budget, tenant_id: str = "", feature: str = "", model: str = "") -> float:
+        """Current spend counted against `budget` for these dimension values."""
+        bi = self.budgets.index(budget)
+        key = (bi,) + tuple((tenant_id, feature, model)[i] for i in self._per_idx[bi])
+        return self._spent(self._slot_s[bi], key, *self._shard(key), time.time())
+
+    def headroom(self, tenant_id: str, feature: str, model: str) -> float:
+        """Smallest limit - spent over the budgets that apply (inf when none do)."""
+        now = time.time()
+        room = float("inf")
+        for _, limit, slot_s, key, lock, windows in self._route((tenant_id, feature, model)):
+            w = windows.get(key)
+            if w is not None:
+                if int(now // slot_s) != w.head:
+                    with lock:
+                        w.advance(int(now // slot_s))
+                limit -= w.total
+            if limit < room:
+                room = limit
+        return room
+
+    def exceeded(
+        self, tenant_id: str, feature: str, model: str, estimate: float, action: Optional[str] = None,
+    ) -> Optional[BudgetExceeded]:
+        """First budget (reject before downgrade) that spending `estimate` more would exceed."""
+        now = time.time()
+        found: Optional[BudgetExceeded] = None
+        for bi, _, slot_s, key, lock, windows in self._route((tenant_id, feature, model)):
+            b = self.budgets[bi]
+            if action is not None and b.action != action:
+                continue
+            spent = self._spent(slot_s, key, lock, windows, now)
+            if spent + estimate > b.limit_usd or spent >= b.limit_usd:
+                e = BudgetExceeded(b, key[1:], spent, estimate)
+                if b.action == "reject":
+                    return e
+                found = found or e
+        return found
+
+    def seed_from_clickhouse(self, client: Any, table: str = "llm_usage_rollup_1m") -> int:
+        """
+        Load the spend of the longest budget window from a rollup table (startup); returns rows.
+        client: reports.ReportClient. table: llm_usage_rollup_1m (per minute; complete even with
+        raw_sample_rates) or llm_usage_hourly (per hour, from the events MV).
+        Events not yet ingested when this runs are not counted.
+        """
+        ts_col = {"llm_usage_rollup_1m": "minute", "llm_usage_hourly": "hour"}.get(table)
+        if ts_col is None:
+            raise ValueError(f"Unknown rollup table: {table}")
+        if not self.budgets:
+            return 0
+        window_s = int(max(b.window_s for b in self.budgets)) + 1
+        rows = client.query(
+            f"""
+            SELECT toUnixTimestamp({ts_col}) AS ts, tenant_id, feature, model, sum(computed_cost) AS cost
+            FROM {client.database}.{table}
+            WHERE {ts_col} >= now() - toIntervalSecond({{window_s:UInt32}})
+            GROUP BY ts, tenant_id, feature, model
+            """,
+            {"window_s": window_s},
+        )
+        for r in rows:
+            self.add(r["tenant_id"], r["feature"], r["model"], float(r["cost"]), ts=float(r["ts"]))
+        return len(rows)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Current spend per budget counter (for debugging / an admin endpoint)."""
+        now = time.time()
+        out = []
+        for lock, windows in self._shards:
+            for key in list(windows):
+                bi = key[0]
+                b = self.budgets[bi]
+                out.append({
+                    "budget": b.label(),
+                    **dict(zip(b.per, key[1:])),
+                    "spent_usd": round(self._spent(self._slot_s[bi], key, lock, windows, now), 6),
+                    "limit_usd": b.limit_usd,
+                })
+        return out
@@ -0,0 +1,169 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+# Only these fields of an adapter result are cached ("raw" SDK objects are not serializable)
+CACHED_FIELDS = ("text", "prompt_tokens", "completion_tokens", "total_tokens", "token_source")
+
+
+def cache_key(provider: str, model: str, messages: List[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+    # role + content only, and kwargs in sorted order, so dict ordering / extra metadata don't split the key
+    norm_messages = [(m.get("role", "user"), m.get("content", "")) for m in messages]
+    payload = json.dumps(
+        [provider.lower(), model, norm_messages, kwargs],
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCache:
+    """In-process LRU with per-entry TTL."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 10000, ttl_s: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, value: Dict[str, Any], ttl_s: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl_s if ttl_s is None else ttl_s)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._data), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class SqliteCache:
+    """
+    On-disk tier (sqlite, WAL). Expired rows are ignored on read; when the table grows past
+    max_entries the least recently used rows are deleted (checked every `evict_every` writes).
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 1_000_000, ttl_s: float = 7 * 24 * 3600, evict_every: int = 1000):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.evict_every = evict_every
+        self._lock = Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache(accessed_at)")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any], ttl_s: Optional[float] = None) -> None:
+        now = time.time()
+        expires_at = now + (self.ttl_s if ttl_s is None else ttl_s)
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, data, expires_at, now),
+            )
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        (n,) = self._conn.execute("SELECT count(*) FROM llm_cache").fetchone()
+        if n > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                (n - self.max_entries,),
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (n,) = self._conn.execute("SELECT count(*) FROM llm_cache").fetchone()
+        return {"entries": n, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """Memory first, then disk; disk hits are promoted into memory."""
+
+    def __init__(self, memory: MemoryCache, disk: Optional[SqliteCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self.blocking = disk is not None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl_s: Optional[float] = None) -> None:
+        self.memory.set(key, value, ttl_s)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl_s)
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            out["disk"] = self.disk.stats()
+        return out
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
@@ -1,8 +1,54 @@
 from __future__ import annotations
+import atexit
+import itertools
 import json
 import os
-from typing import Dict, Any
-from threading import Lock
+import queue
+import socket
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, List, Optional
+from threading import Event, Lock, Thread
+
+from . import metrics, rowbinary
+from .event import UsageEvent
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "spill")
+EVENT_FORMATS = ("jsonl", "rowbinary")
+
+
+def _jsonl_line(event: Dict[str, Any]) -> bytes:
+    # gateway / instrumentor events render from their precompiled template
+    if type(event) is UsageEvent:
+        return event.to_jsonl()
+    return (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _open_events_file(path: str, fmt: str):
+    if fmt not in EVENT_FORMATS:
+        raise ValueError(f"Unknown event format: {fmt} (expected one of {EVENT_FORMATS})")
+    f = open(path, "ab")
+    if fmt == "rowbinary":
+        rowbinary.ensure_header(f)
+        f.flush()
+    return f
+
+
+def _encoder(fmt: str) -> Callable[[Dict[str, Any]], bytes]:
+    return rowbinary.encode_record if fmt == "rowbinary" else _jsonl_line
+
+
+def emit_many(emitter: Any, events: List[Dict[str, Any]]) -> None:
+    """Bulk emit: one write where the emitter supports it (emit_many), else emit() per event."""
+    if not events:
+        return
+    bulk = getattr(emitter, "emit_many", None)
+    if bulk is not None:
+        bulk(events)
+    else:
+        for e in events:
+            emitter.emit(e)
 
 class JsonlEmitter:
     def __init__(self, path: str):
@@ -11,7 +57,471 @@ class JsonlEmitter:
         self._lock = Lock()
 
     def emit(self, event: Dict[str, Any]) -> None:
-        line = json.dumps(event, ensure_ascii=False)
+        line = _jsonl_line(event)
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(line)
+
+    def emit_many(self, events: List[Dict[str, Any]]) -> None:
+        data = b"".join(_jsonl_line(e) for e in events)
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class RowBinaryEmitter:
+    """
+    JsonlEmitter counterpart writing length-prefixed ClickHouse RowBinary records
+    (see gateway_sdk/rowbinary.py); keeps the file open.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = Lock()
+        self._f = _open_events_file(path, "rowbinary")
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        rec = rowbinary.encode_record(event)
+        with self._lock:
+            self._f.write(rec)
+            self._f.flush()
+
+    def emit_many(self, events: List[Dict[str, Any]]) -> None:
+        data = b"".join(rowbinary.encode_record(e) for e in events)
+        with self._lock:
+            self._f.write(data)
+            self._f.flush()
+
+    def flush(self) -> None:
         with self._lock:
-            with open(self.path, "a", encoding="utf-8") as f:
-                f.write(line + "\n")
\ No newline at end of file
+            self._f.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._f.close()
+
+
+_STOP = object()
+
+class AsyncJsonlEmitter:
+    """
+    Same interface as JsonlEmitter, but emit() only enqueues.
+    A background writer thread keeps the file open and writes batches
+    when batch_size events are pending or flush_interval_s has passed.
+
+    overflow (queue full):
+      - "block":       caller waits for room
+      - "drop_oldest": discard the oldest queued event (counted in dropped)
+      - "spill":       write the event synchronously to spill_path (default: <path>.spill)
+
+    fmt: "jsonl" or "rowbinary" (applies to the spill file too).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval_s: float = 0.2,
+        overflow: str = "block",
+        spill_path: Optional[str] = None,
+        fmt: str = "jsonl",
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow} (expected one of {OVERFLOW_POLICIES})")
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.overflow = overflow
+        self.spill_path = spill_path or path + ".spill"
+        self.fmt = fmt
+        self._encode = _encoder(fmt)
+
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._counter_lock = Lock()
+        self._spill_lock = Lock()
+        self._closed = False
+
+        # written / write_errors 只由 writer thread 更新；dropped / spilled 走 overflow 慢路徑，才需要 lock
+        self.written = 0
+        self.write_errors = 0
+        self.dropped = 0
+        self.spilled = 0
+
+        self._f = _open_events_file(self.path, fmt)
+        self._writer = Thread(target=self._run, name="jsonl-emitter", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+        for name, fn in self._gauges():
+            metrics.REGISTRY.gauge_fn(name, "AsyncJsonlEmitter backlog / counters", ("path",), (self.path,), fn)
+
+    def _gauges(self):
+        return (
+            ("gateway_sdk_emitter_queue_depth", self._q.qsize),
+            ("gateway_sdk_emitter_written_total", lambda: self.written),
+            ("gateway_sdk_emitter_dropped_total", lambda: self.dropped),
+            ("gateway_sdk_emitter_spilled_total", lambda: self.spilled),
+            ("gateway_sdk_emitter_write_errors_total", lambda: self.write_errors),
+        )
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        if self._closed:
+            raise RuntimeError("AsyncJsonlEmitter is closed")
+        if self.overflow == "block":
+            self._q.put(event)
+        else:
+            try:
+                self._q.put_nowait(event)
+            except queue.Full:
+                if self.overflow == "spill":
+                    self._spill(event)
+                    return
+                self._drop_oldest_and_put(event)
+
+    def emit_many(self, events: List[Dict[str, Any]]) -> None:
+        # the writer thread batches anyway; same overflow handling per event
+        for e in events:
+            self.emit(e)
+
+    def _drop_oldest_and_put(self, event: Dict[str, Any]) -> None:
+        while True:
+            try:
+                oldest = self._q.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                self._q.task_done()
+                with self._counter_lock:
+                    self.dropped += 1
+                if oldest is _STOP:
+                    # close() raced this emit and queued its sentinel: the writer must still see it,
+                    # so the new event is the one dropped (the writer is draining, put() gets room)
+                    self._q.put(_STOP)
+                    return
+            try:
+                self._q.put_nowait(event)
+                return
+            except queue.Full:
+                continue
+
+    def _spill(self, event: Dict[str, Any]) -> None:
+        rec = self._encode(event)
+        with self._spill_lock:
+            with _open_events_file(self.spill_path, self.fmt) as f:
+                f.write(rec)
+        with self._counter_lock:
+            self.spilled += 1
+
+    def _run(self) -> None:
+        q = self._q
+        while True:
+            item = q.get()
+            if item is _STOP:
+                q.task_done()
+                return
+            batch: List[Dict[str, Any]] = [item]
+            deadline = time.monotonic() + self.flush_interval_s
+            stop = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write_batch(batch)
+            if stop:
+                q.task_done()
+                return
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        t = metrics.start()
+        try:
+            self._f.write(b"".join(self._encode(e) for e in batch))
+            self._f.flush()
+            self.written += len(batch)
+            metrics.STAGE_EMITTER_WRITE_BATCH.observe_since(t)
+        except Exception:
+            # keep the writer alive; the batch is lost but counted
+            self.write_errors += len(batch)
+        finally:
+            for _ in batch:
+                self._q.task_done()
+
+    def flush(self) -> None:
+        """Block until every event enqueued so far is written to the file."""
+        self._q.join()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._q.put(_STOP)
+        self._writer.join()
+        self._f.close()
+        atexit.unregister(self.close)
+        for name, _ in self._gauges():
+            metrics.REGISTRY.remove_gauge(name, (self.path,))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queue_depth": self._q.qsize(),
+            "written": self.written,
+            "write_errors": self.write_errors,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+        }
+
+
+SEGMENT_OPEN_SUFFIX = ".open"
+# per process, shared by all ShardedEmitters so two of them in one directory never pick the same name
+_segment_seq = itertools.count(1)
+
+
+def _segment_ext(fmt: str) -> str:
+    return ".rowbinary" if fmt == "rowbinary" else ".jsonl"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def seal_orphan_segments(directory: str, prefix: str = "events") -> List[str]:
+    """
+    Seal .open segments left behind by dead processes on this host (crash / kill -9).
+    A torn trailing JSONL line is cut off first; RowBinary readers already skip a torn record.
+    """
+    host = socket.gethostname()
+    sealed: List[str] = []
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith(prefix + "-") and name.endswith(SEGMENT_OPEN_SUFFIX)):
+            continue
+        # <prefix>-<start>-<host>-<pid>-<seq><ext>.open (host may contain "-")
+        _, _, rest = name[len(prefix) + 1:].partition("-")
+        if not rest.startswith(host + "-"):
+            continue
+        try:
+            pid = int(rest[len(host) + 1:].split("-", 1)[0])
+        except ValueError:
+            continue
+        if pid == os.getpid() or _pid_alive(pid):
+            continue
+        path = os.path.join(directory, name)
+        if name.endswith(".jsonl" + SEGMENT_OPEN_SUFFIX):
+            with open(path, "rb+") as f:
+                data = f.read()
+                cut = data.rfind(b"\n") + 1
+                if cut < len(data):
+                    f.truncate(cut)
+        os.rename(path, path[:-len(SEGMENT_OPEN_SUFFIX)])
+        sealed.append(path[:-len(SEGMENT_OPEN_SUFFIX)])
+    return sealed
+
+
+class ShardedEmitter:
+    """
+    Multi-process safe emitter: every process appends to its own segment file in `directory`,
+    one os.write() per emit on an O_APPEND fd, so gunicorn / uvicorn workers never share a file.
+
+      <prefix>-<start>-<host>-<pid>-<seq>.jsonl.open   being written by that process
+      <prefix>-<start>-<host>-<pid>-<seq>.jsonl        sealed (renamed), never written again
+
+    A segment is sealed when it reaches max_bytes, when it is older than max_age_s
+    (checked on emit and by a background timer), and on close(). Ingest only reads sealed
+    segments; they can be compressed / deleted independently of the writers.
+    fmt: "jsonl" or "rowbinary" (each segment starts with its own header).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        prefix: str = "events",
+        fmt: str = "jsonl",
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age_s: float = 60.0,
+    ):
+        if fmt not in EVENT_FORMATS:
+            raise ValueError(f"Unknown event format: {fmt} (expected one of {EVENT_FORMATS})")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.prefix = prefix
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self._encode = _encoder(fmt)
+        self._host = socket.gethostname()
+        seal_orphan_segments(directory, prefix)
+
+        self.sealed = 0
+        self.written = 0
+        self._closed = False
+        self._reset()
+        # gunicorn --preload & co. fork after the emitter is built: the child must not keep
+        # writing (or sealing) the parent's segment, and its lock / timer thread are gone
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self.close)
+
+    def _after_fork(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)  # the child's copy only; the parent keeps writing its segment
+        self._reset()
+
+    def _reset(self) -> None:
+        self._lock = Lock()
+        self._pid = os.getpid()
+        self._fd: Optional[int] = None
+        self._open_path = ""
+        self._size = 0
+        self._opened_at = 0.0
+        self._stop = Event()
+        self._timer = Thread(target=self._run, name="segment-sealer", daemon=True)
+        self._timer.start()
+
+    def _run(self) -> None:
+        interval = min(max(self.max_age_s / 4, 0.05), 5.0)
+        while not self._stop.wait(interval):
+            with self._lock:
+                if self._fd is not None and time.monotonic() - self._opened_at >= self.max_age_s:
+                    self._seal_locked()
+
+    def _open_locked(self) -> None:
+        start = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        name = f"{self.prefix}-{start}-{self._host}-{self._pid}-{next(_segment_seq):06d}{_segment_ext(self.fmt)}"
+        self._open_path = os.path.join(self.directory, name + SEGMENT_OPEN_SUFFIX)
+        self._fd = os.open(self._open_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._size = 0
+        self._opened_at = time.monotonic()
+        if self.fmt == "rowbinary":
+            self._size += os.write(self._fd, rowbinary.file_header())
+
+    def _seal_locked(self) -> None:
+        os.close(self._fd)
+        self._fd = None
+        os.rename(self._open_path, self._open_path[:-len(SEGMENT_OPEN_SUFFIX)])
+        self.sealed += 1
+
+    def _write(self, data: bytes, n: int) -> None:
+        if self._closed:
+            raise RuntimeError("ShardedEmitter is closed")
+        with self._lock:
+            if self._fd is not None and (
+                self._size >= self.max_bytes or time.monotonic() - self._opened_at >= self.max_age_s
+            ):
+                self._seal_locked()
+            if self._fd is None:
+                self._open_locked()
+            # one write per call: O_APPEND keeps each record contiguous even if someone else appends
+            view = memoryview(data)
+            while view:
+                k = os.write(self._fd, view)
+                view = view[k:]
+            self._size += len(data)
+            self.written += n
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        self._write(self._encode(event), 1)
+
+    def emit_many(self, events: List[Dict[str, Any]]) -> None:
+        if events:
+            self._write(b"".join(self._encode(e) for e in events), len(events))
+
+    def seal(self) -> None:
+        """Seal the current segment now (e.g. before a deploy drains the worker)."""
+        with self._lock:
+            if self._fd is not None:
+                self._seal_locked()
+
+    def flush(self) -> None:
+        # os.write is unbuffered; nothing to flush
+        pass
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self.seal()
+        atexit.unregister(self.close)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"written": self.written, "sealed": self.sealed, "open_segment": self._open_path if self._fd is not None else None}
+
+
+class FanoutEmitter:
+    """Send every event to several sinks (e.g. raw JSONL + RollupEmitter)."""
+
+    def __init__(self, emitters: List[Any]):
+        self.emitters = list(emitters)
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        for e in self.emitters:
+            e.emit(event)
+
+    def emit_many(self, events: List[Dict[str, Any]]) -> None:
+        for e in self.emitters:
+            emit_many(e, events)
+
+    def flush(self) -> None:
+        for e in self.emitters:
+            e.flush()
+
+    def close(self) -> None:
+        for e in self.emitters:
+            e.close()
+
+
+class SampledEmitter:
+    """
+    Keep only a fraction of raw events per feature (rate 0 turns a feature off).
+    Sampling is by request_id hash, so all attempts of a request are kept or dropped together.
+    """
+
+    def __init__(self, inner: Any, rates: Dict[str, float], default_rate: float = 1.0):
+        self.inner = inner
+        self.rates = dict(rates)
+        self.default_rate = default_rate
+        self._counter_lock = Lock()
+        self.sampled_out = 0
+
+    def _keep(self, event: Dict[str, Any]) -> bool:
+        rate = self.rates.get(event.get("feature", ""), self.default_rate)
+        if rate < 1.0 and (zlib.crc32(str(event.get("request_id", "")).encode("utf-8")) / 0xFFFFFFFF) >= rate:
+            with self._counter_lock:
+                self.sampled_out += 1
+            return False
+        return True
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        if self._keep(event):
+            self.inner.emit(event)
+
+    def emit_many(self, events: List[Dict[str, Any]]) -> None:
+        emit_many(self.inner, [e for e in events if self._keep(e)])
+
+    def flush(self) -> None:
+        self.inner.flush()
+
+    def close(self) -> None:
+        self.inner.close()
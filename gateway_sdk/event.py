@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from json.encoder import encode_basestring  # C-accelerated; keeps non-ASCII like json.dumps(ensure_ascii=False)
+from math import isfinite
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from . import metrics
+
+# One usage event per LLM call, shared by LLMGateway and LLMInstrumentor.
+# UsageEvent is a __slots__ record (no per-event dict) that still reads like a mapping
+# (event["status"], event.get(...), dict(event)) for emitters / rollups / sampling.
+# to_jsonl() renders one JSON line from a precompiled template; low-cardinality strings
+# (tenant, feature, model, price_version, ...) are escaped once and cached, and the
+# "YYYY-MM-DD HH:MM:SS" timestamp prefix is reused within the same second.
+
+# JSON key order = ClickHouse column order of ingest/02_create_table.sql
+EVENT_FIELDS: Tuple[str, ...] = (
+    "timestamp", "request_id", "attempt",
+    "tenant_id", "user_id", "feature", "endpoint", "prompt_template_id",
+    "provider", "model", "region",
+    "prompt_tokens", "completion_tokens", "total_tokens",
+    "latency_ms", "ttft_ms", "tokens_per_s", "status", "retry_count", "cache_hit",
+    "price_version", "price_tier", "unit_price_prompt", "unit_price_completion", "computed_cost",
+    "prompt_chars", "completion_chars", "replica", "token_source",
+)
+
+_JSONL = (
+    '{"timestamp": "%s", "request_id": %s, "attempt": %d, '
+    '"tenant_id": %s, "user_id": %s, "feature": %s, "endpoint": %s, "prompt_template_id": %s, '
+    '"provider": %s, "model": %s, "region": %s, '
+    '"prompt_tokens": %d, "completion_tokens": %d, "total_tokens": %d, '
+    '"latency_ms": %d, "ttft_ms": %d, "tokens_per_s": %r, "status": %s, "retry_count": %d, "cache_hit": %d, '
+    '"price_version": %s, "price_tier": %s, "unit_price_prompt": %r, "unit_price_completion": %r, "computed_cost": %r, '
+    '"prompt_chars": %d, "completion_chars": %d, "replica": %s, "token_source": %s}\n'
+)
+
+# escaped JSON strings of low-cardinality values; cleared when it grows past the cap
+_QUOTED: Dict[str, str] = {}
+_QUOTED_MAX = 65536
+
+
+def _q(s: str) -> str:
+    v = _QUOTED.get(s)
+    if v is None:
+        if len(_QUOTED) >= _QUOTED_MAX:
+            _QUOTED.clear()
+        v = _QUOTED[s] = encode_basestring(s)
+    return v
+
+
+def compute_cost(prompt_tokens: int, completion_tokens: int, price_per_1k_prompt: float, price_per_1k_completion: float) -> float:
+    return (prompt_tokens / 1000.0) * price_per_1k_prompt + (completion_tokens / 1000.0) * price_per_1k_completion
+
+
+_last_second: Tuple[int, str] = (-1, "")
+
+
+def format_ts(ts: datetime) -> str:
+    """ts.strftime("%Y-%m-%d %H:%M:%S.%f")[:23], formatting the date part once per second."""
+    global _last_second
+    sec = int(ts.timestamp())
+    last = _last_second
+    if last[0] != sec:
+        last = _last_second = (sec, ts.strftime("%Y-%m-%d %H:%M:%S"))
+    return "%s.%03d" % (last[1], ts.microsecond // 1000)
+
+
+class UsageEvent:
+    __slots__ = EVENT_FIELDS
+
+    def __init__(
+        self, timestamp, request_id, attempt,
+        tenant_id, user_id, feature, endpoint, prompt_template_id,
+        provider, model, region,
+        prompt_tokens, completion_tokens, total_tokens,
+        latency_ms, ttft_ms, tokens_per_s, status, retry_count, cache_hit,
+        price_version, price_tier, unit_price_prompt, unit_price_completion, computed_cost,
+        prompt_chars, completion_chars, replica, token_source,
+    ):
+        # positional in EVENT_FIELDS order: ~2x cheaper than building the equivalent dict
+        self.timestamp = timestamp
+        self.request_id = request_id
+        self.attempt = attempt
+        self.tenant_id = tenant_id
+        self.user_id = user_id
+        self.feature = feature
+        self.endpoint = endpoint
+        self.prompt_template_id = prompt_template_id
+        self.provider = provider
+        self.model = model
+        self.region = region
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_tokens = total_tokens
+        self.latency_ms = latency_ms
+        self.ttft_ms = ttft_ms
+        self.tokens_per_s = tokens_per_s
+        self.status = status
+        self.retry_count = retry_count
+        self.cache_hit = cache_hit
+        self.price_version = price_version
+        self.price_tier = price_tier
+        self.unit_price_prompt = unit_price_prompt
+        self.unit_price_completion = unit_price_completion
+        self.computed_cost = computed_cost
+        self.prompt_chars = prompt_chars
+        self.completion_chars = completion_chars
+        self.replica = replica
+        self.token_source = token_source
+
+    # ---- mapping view (emitters written for dict events keep working) ----
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return getattr(self, name, default)
+
+    def __contains__(self, name: object) -> bool:
+        return name in EVENT_FIELDS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(EVENT_FIELDS)
+
+    def __len__(self) -> int:
+        return len(EVENT_FIELDS)
+
+    def keys(self) -> Tuple[str, ...]:
+        return EVENT_FIELDS
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return ((f, getattr(self, f)) for f in EVENT_FIELDS)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {f: getattr(self, f) for f in EVENT_FIELDS}
+
+    def __repr__(self) -> str:
+        return f"UsageEvent({self.as_dict()!r})"
+
+    # ---- encoding ----
+
+    def to_jsonl(self) -> bytes:
+        """Same bytes as json.dumps(self.as_dict(), ensure_ascii=False) + "\\n"."""
+        if not isfinite(self.tokens_per_s + self.unit_price_prompt + self.unit_price_completion + self.computed_cost):
+            # %r would write inf / nan; keep json.dumps' Infinity / NaN as before
+            return (json.dumps(self.as_dict(), ensure_ascii=False) + "\n").encode("utf-8")
+        return (_JSONL % (
+            self.timestamp, encode_basestring(self.request_id), self.attempt,
+            _q(self.tenant_id), encode_basestring(self.user_id), _q(self.feature), _q(self.endpoint),
+            _q(self.prompt_template_id),
+            _q(self.provider), _q(self.model), _q(self.region),
+            self.prompt_tokens, self.completion_tokens, self.total_tokens,
+            self.latency_ms, self.ttft_ms, self.tokens_per_s, _q(self.status), self.retry_count, self.cache_hit,
+            _q(self.price_version), _q(self.price_tier), self.unit_price_prompt, self.unit_price_completion,
+            self.computed_cost,
+            self.prompt_chars, self.completion_chars, _q(self.replica), _q(self.token_source),
+        )).encode("utf-8")
+
+
+def build_event(
+    price_book: Any,
+    ctx: Dict[str, Any],
+    result: Optional[Dict[str, Any]],
+    status: str,
+    latency_ms: int,
+    ttft_ms: Optional[int] = None,
+    completion_chars: Optional[int] = None,
+) -> UsageEvent:
+    """
+    tokens -> versioned price -> one UsageEvent.
+    ctx: provider, model, region, ts (UTC datetime), request_id, attempt, retry_count, cache_hit,
+    tenant_id, user_id, feature, endpoint, template_id, prompt_chars [, replica, price_tier].
+    Non-streaming calls get their first token with the full response, so ttft_ms = latency_ms.
+    token_source: result["token_source"] ("estimated" when counted locally, see gateway_sdk.tokens),
+    else "provider", or "none" when there are no token counts at all (e.g. failed calls).
+    """
+    t = metrics.start()
+    provider, model, region, ts = ctx["provider"], ctx["model"], ctx["region"], ctx["ts"]
+    metrics.record_call(provider, model, status, latency_ms / 1000.0)
+    cache_hit = ctx["cache_hit"]
+
+    r = result or {}
+    pt = int(r.get("prompt_tokens", 0) or 0)
+    ct = int(r.get("completion_tokens", 0) or 0)
+    tt = int(r.get("total_tokens", 0) or (pt + ct))
+
+    # Price resolve (versioned) by timestamp; "batch" only when the row has a batch tier
+    price = price_book.resolve(provider, model, region, ts)
+    unit_p, unit_c, tier = price.unit_prices(ctx.get("price_tier", "standard"))
+    unit_p, unit_c = float(unit_p), float(unit_c)
+    cost = 0.0 if cache_hit else float(compute_cost(pt, ct, unit_p, unit_c))
+
+    latency_ms = int(latency_ms)
+    if completion_chars is None:
+        completion_chars = len(r.get("text", "") or "")
+    event = UsageEvent(
+        # ids as str: callers may pass ints, and to_jsonl / RowBinary only encode strings
+        format_ts(ts), str(ctx["request_id"]), int(ctx["attempt"]),
+        str(ctx["tenant_id"]), str(ctx["user_id"]), str(ctx["feature"]), str(ctx["endpoint"]), ctx["template_id"],
+        provider, model, region,
+        pt, ct, tt,
+        # tokens_per_s: end-to-end output rate as the caller sees it
+        latency_ms, latency_ms if ttft_ms is None else int(ttft_ms),
+        round(ct * 1000.0 / latency_ms, 3) if latency_ms > 0 else 0.0,
+        status, int(ctx["retry_count"]), 1 if cache_hit else 0,
+        price.price_version, tier, unit_p, unit_c, cost,
+        ctx["prompt_chars"], int(completion_chars),
+        # serving replica (vLLM pool); error events get it from the exception
+        r.get("replica") or ctx.get("replica", ""),
+        r.get("token_source") or ("provider" if pt or ct else "none"),
+    )
+    metrics.STAGE_BUILD_EVENT.observe_since(t)
+    return event
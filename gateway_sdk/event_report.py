@@ -0,0 +1,472 @@
+from __future__ import annotations
+import json
+import math
+import mmap
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from operator import itemgetter
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from . import rowbinary
+
+# Offline cost reports straight from event JSONL files (no ClickHouse needed).
+#
+# Files are memory-mapped and cut into newline-aligned byte ranges that a process pool
+# aggregates independently. Lines are not json.loads()-ed on the fast path: the gateway
+# writes "timestamp" first, so the time filter is a 23-byte slice compare, and lines that
+# pass it are matched against one regex compiled for the file's key layout that captures
+# only the fields the report needs (~4x cheaper than json.loads). Lines that don't fit
+# (escaped strings, another writer's layout) are decoded normally and teach a new layout.
+# Latency percentiles come from mergeable log-scale histograms (~1% relative error).
+# RowBinary files (events_format="rowbinary") are decoded record by record, one work item per file.
+
+GROUP_FIELDS = (
+    "tenant_id", "feature", "model", "provider", "region", "endpoint", "status",
+    "user_id", "prompt_template_id", "price_version", "price_tier", "replica", "token_source",
+    "day", "hour",  # derived from timestamp
+)
+_DERIVED = {"day": 10, "hour": 13}  # prefix length of "YYYY-MM-DD HH:MM:SS.fff"
+
+_TS_PREFIX = b'{"timestamp": "'
+_TS_LEN = 23
+_TS_ANY = re.compile(rb'"timestamp": ?"([^"\\]{23})"')
+_MAX_LAYOUTS = 8
+
+# log-scale latency buckets: bucket i covers (GROWTH ** (i - 1), GROWTH ** i] ms
+_GROWTH = 1.02
+_INV_LOG_GROWTH = 1.0 / math.log(_GROWTH)
+
+_SUMS = ("prompt_tokens", "completion_tokens", "total_tokens", "computed_cost", "retry_count", "cache_hit")
+# row layout per group: calls, errors, <_SUMS...>, latency_ms sum, {bucket: count}
+_CALLS, _ERRORS, _LAT_SUM, _HIST = 0, 1, 2 + len(_SUMS), 3 + len(_SUMS)
+
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ReportQuery:
+    group_by: Tuple[str, ...] = ("tenant_id",)
+    since: Optional[str] = None  # UTC, inclusive; "YYYY-MM-DD[ HH:MM[:SS[.fff]]]" or ISO
+    until: Optional[str] = None  # UTC, exclusive
+    where: Tuple[Tuple[str, str], ...] = ()  # equality filters, e.g. (("feature", "chat_support"),)
+    quantiles: Tuple[float, ...] = (0.5, 0.95, 0.99)
+
+
+def normalize_ts(s: str) -> str:
+    """Any ISO-ish UTC timestamp -> the events' "YYYY-MM-DD HH:MM:SS.fff" (compares as bytes)."""
+    dt = datetime.fromisoformat(s.strip().replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")[:_TS_LEN]
+
+
+def _ts(line: bytes) -> Optional[bytes]:
+    if line.startswith(_TS_PREFIX):
+        return line[15:15 + _TS_LEN]
+    m = _TS_ANY.search(line)
+    return m.group(1) if m else None
+
+
+def _bucket(v: float) -> int:
+    return int(math.log(v) * _INV_LOG_GROWTH) + 1 if v > 1.0 else 0
+
+
+def _bucket_value(i: int) -> float:
+    return _GROWTH ** i if i > 0 else 1.0
+
+
+def _new_row() -> List[Any]:
+    return [0, 0] + [0] * len(_SUMS) + [0, {}]
+
+
+class _Layout:
+    """Compiled matcher for one key order / value-type layout of event lines."""
+
+    __slots__ = ("pattern", "ts", "status", "latency", "sums", "key", "where", "key_of", "sum_slots", "sums_of")
+
+    def __init__(self, event: Dict[str, Any], query: ReportQuery):
+        wanted = {"timestamp", "status", "latency_ms", *_SUMS, *query.group_by, *(f for f, _ in query.where)}
+        group: Dict[str, int] = {}
+        parts: List[bytes] = []
+        for k, v in event.items():
+            k_b = re.escape(k.encode("utf-8"))
+            if isinstance(v, str):
+                val = rb'"([^"\\]*)"' if k in wanted else rb'"[^"\\]*"'
+            elif v is None or isinstance(v, (bool, int, float)):
+                # wanted numbers must look like numbers (a null goes to the slow path)
+                val = rb'(-?[0-9][^,}"]*)' if k in wanted else rb'[^,}"]*'
+            else:
+                raise ValueError(f"nested value in {k!r}")
+            if k in wanted:
+                group[k] = len(group)
+            parts.append(b'"' + k_b + b'": ' + val)
+        self.pattern = re.compile(rb"\{" + b", ".join(parts) + rb"\}")
+        missing = [f for f in ("timestamp", "status", "latency_ms") if f not in group]
+        if missing:
+            raise ValueError(f"missing {missing}")
+        self.ts = group["timestamp"]
+        self.status = group["status"]
+        self.latency = group["latency_ms"]
+        # absent optional fields (older events without e.g. replica) read as ""/0
+        self.sums = [group.get(f, -1) for f in _SUMS]
+        self.key = [(-_DERIVED[f], 0) if f in _DERIVED else (group.get(f, -1), 1) for f in query.group_by]
+        self.where = [
+            (-_DERIVED[f] if f in _DERIVED else group.get(f, -1), v.encode("utf-8")) for f, v in query.where
+        ]
+        # per-line work below is a couple of C calls when every key field is a plain capture
+        specs = [spec for spec, _ in self.key]
+        if specs and all(i >= 0 for i in specs):
+            get = itemgetter(*specs)
+            self.key_of = (lambda g, ts: (get(g),)) if len(specs) == 1 else (lambda g, ts: get(g))
+        else:
+            self.key_of = lambda g, ts: tuple([_pick(g, ts, spec) for spec in specs])
+        present = [(slot, i) for slot, i in enumerate(self.sums, 2) if i >= 0]
+        self.sum_slots = [slot for slot, _ in present]
+        get_sums = itemgetter(*[i for _, i in present])
+        self.sums_of = (lambda g: (get_sums(g),)) if len(present) == 1 else get_sums
+
+
+def _pick(g: Tuple[bytes, ...], ts: bytes, spec: int) -> bytes:
+    if spec >= 0:
+        return g[spec]
+    return ts[:-spec] if spec != -1 else b""
+
+
+def _slow_values(
+    line: bytes, query: ReportQuery
+) -> Optional[Tuple[Dict[str, Any], Tuple[bytes, ...], bool, List[float], float, bytes]]:
+    # escaped strings / unknown layout: decode the line for real
+    try:
+        e = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(e, dict):
+        return None
+    return (e,) + _event_values(e, query)
+
+
+def _event_values(
+    e: Dict[str, Any], query: ReportQuery
+) -> Tuple[Tuple[bytes, ...], bool, List[float], float, bytes]:
+    # (group key, is error, _SUMS values, latency, b"1" if it passes query.where else b"")
+    ts = str(e.get("timestamp", ""))
+
+    def get(f: str) -> bytes:
+        v = ts[:_DERIVED[f]] if f in _DERIVED else e.get(f, "")
+        return str(v if v is not None else "").encode("utf-8")
+
+    for f, v in query.where:
+        if get(f) != v.encode("utf-8"):
+            return (), False, [], 0.0, b""
+    key = tuple(get(f) for f in query.group_by)
+    sums = [float(e.get(f, 0) or 0) for f in _SUMS]
+    return key, e.get("status") == "error", sums, float(e.get("latency_ms", 0) or 0), b"1"
+
+
+def _scan_rowbinary(path: str, query: ReportQuery) -> Tuple[Dict[Tuple[bytes, ...], List[Any]], Dict[str, int]]:
+    # decoded events carry the same fields as JSON lines; a torn last record is skipped by the reader
+    groups: Dict[Tuple[bytes, ...], List[Any]] = {}
+    records = matched = 0
+    for e in rowbinary.read_events(path):
+        records += 1
+        ts = e["timestamp"]
+        if (query.since is not None and ts < query.since) or (query.until is not None and ts >= query.until):
+            continue
+        key, is_error, sums, latency, hit = _event_values(e, query)
+        if not hit:
+            continue
+        matched += 1
+        row = groups.get(key)
+        if row is None:
+            row = groups[key] = _new_row()
+        row[_CALLS] += 1
+        if is_error:
+            row[_ERRORS] += 1
+        for i, v in enumerate(sums, 2):
+            row[i] += v
+        row[_LAT_SUM] += latency
+        b = _bucket(latency) if latency > 1.0 else 0
+        row[_HIST][b] = row[_HIST].get(b, 0) + 1
+    return groups, {"lines": records, "matched": matched, "slow": 0, "bad": 0}
+
+
+def scan_range(
+    path: str,
+    start: int,
+    end: int,
+    query: ReportQuery,
+) -> Tuple[Dict[Tuple[bytes, ...], List[Any]], Dict[str, int]]:
+    """
+    Aggregate the lines that start in [start, end) of path.
+    Returns ({group key (bytes values): row}, counters). Module-level so a process pool can run it.
+    """
+    since = query.since.encode() if query.since else None
+    until = query.until.encode() if query.until else None
+    groups: Dict[Tuple[bytes, ...], List[Any]] = {}
+    layouts: List[_Layout] = []
+    lines = matched = slow = bad = 0
+    empty = {"lines": 0, "matched": 0, "slow": 0, "bad": 0}
+
+    size = os.path.getsize(path)
+    if size == 0 or start >= size:
+        return groups, empty
+    if rowbinary.is_rowbinary_file(path):
+        # plan_ranges gives a RowBinary file a single (0, size) range
+        return _scan_rowbinary(path, query) if start == 0 else (groups, empty)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # a line belongs to the range its first byte falls into
+        if start > 0:
+            nl = mm.find(b"\n", start - 1)
+            start = size if nl < 0 else nl + 1
+        if end < size:
+            nl = mm.find(b"\n", end - 1)
+            end = size if nl < 0 else nl + 1
+        else:
+            end = size
+        if start >= end:
+            return groups, empty
+        data = mm[start:end]
+
+    for line in data.split(b"\n"):
+        if not line:
+            continue
+        lines += 1
+        ts = _ts(line)
+        if ts is None:
+            bad += 1  # torn tail of an open segment, or not an event
+            continue
+        if since is not None and ts < since:
+            continue
+        if until is not None and ts >= until:
+            continue
+
+        for lay in layouts:
+            m = lay.pattern.match(line)
+            if m is not None:
+                break
+        else:
+            m = None
+
+        if m is not None:
+            g = m.groups()
+            ok = True
+            for spec, want in lay.where:
+                if _pick(g, ts, spec) != want:
+                    ok = False
+                    break
+            if not ok:
+                continue
+            key = lay.key_of(g, ts)
+            is_error = g[lay.status] == b"error"
+            sums = zip(lay.sum_slots, map(float, lay.sums_of(g)))
+            latency = float(g[lay.latency])
+        else:
+            parsed = _slow_values(line, query)
+            if parsed is None:
+                bad += 1
+                continue
+            event, key, is_error, sum_values, latency, hit = parsed
+            sums = zip(range(2, 2 + len(_SUMS)), sum_values)
+            slow += 1
+            if len(layouts) < _MAX_LAYOUTS and b"\\" not in line:
+                try:
+                    layouts.insert(0, _Layout(event, query))
+                except ValueError:
+                    pass
+            if not hit:
+                continue
+
+        matched += 1
+        row = groups.get(key)
+        if row is None:
+            row = groups[key] = _new_row()
+        row[_CALLS] += 1
+        if is_error:
+            row[_ERRORS] += 1
+        for i, v in sums:
+            row[i] += v
+        row[_LAT_SUM] += latency
+        b = _bucket(latency) if latency > 1.0 else 0
+        hist = row[_HIST]
+        hist[b] = hist.get(b, 0) + 1
+
+    return groups, {"lines": lines, "matched": matched, "slow": slow, "bad": bad}
+
+
+def _merge(into: Dict[Tuple[bytes, ...], List[Any]], part: Dict[Tuple[bytes, ...], List[Any]]) -> None:
+    for key, row in part.items():
+        acc = into.get(key)
+        if acc is None:
+            into[key] = row
+            continue
+        for i in range(_HIST):
+            acc[i] += row[i]
+        hist = acc[_HIST]
+        for b, c in row[_HIST].items():
+            hist[b] = hist.get(b, 0) + c
+
+
+def _quantiles(hist: Dict[int, int], n: int, qs: Sequence[float]) -> List[float]:
+    out: List[float] = []
+    if not n:
+        return [0.0 for _ in qs]
+    items = sorted(hist.items())
+    for q in qs:
+        target = max(1, math.ceil(q * n))
+        acc = 0
+        for b, c in items:
+            acc += c
+            if acc >= target:
+                out.append(round(_bucket_value(b), 1))
+                break
+    return out
+
+
+def _seek(mm: mmap.mmap, bound: bytes) -> int:
+    """Byte offset of the first line whose timestamp >= bound, assuming the file is time-ordered."""
+    lo, hi = 0, len(mm)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        nl = mm.find(b"\n", mid)
+        if nl < 0 or nl + 1 >= len(mm):
+            hi = mid
+            continue
+        ts = _ts(mm[nl + 1:nl + 1 + 256])
+        if ts is None or ts < bound:
+            lo = nl + 1
+        else:
+            hi = mid
+    # lo sits at a line start or inside the line before the first match
+    if lo > 0 and mm[lo - 1:lo] != b"\n":
+        nl = mm.rfind(b"\n", 0, lo)
+        lo = nl + 1 if nl >= 0 else 0
+    return lo
+
+
+def _shift(ts: str, seconds: float) -> bytes:
+    t = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=timezone.utc).timestamp() + seconds
+    return datetime.fromtimestamp(t, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:_TS_LEN].encode()
+
+
+def plan_ranges(
+    paths: Iterable[str],
+    query: ReportQuery,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    order_slack_s: Optional[float] = 3600.0,
+) -> List[Tuple[str, int, int]]:
+    """
+    (path, start, end) work items. With since / until and order_slack_s set, each file is
+    bisected to the byte window that can hold matching lines: events are appended when a call
+    ends, so a file is time-ordered up to call latency; order_slack_s bounds that disorder
+    (None: always scan whole files).
+    """
+    out: List[Tuple[str, int, int]] = []
+    for path in paths:
+        size = os.path.getsize(path)
+        if size == 0:
+            continue
+        if rowbinary.is_rowbinary_file(path):
+            # records can't be cut at arbitrary offsets: the whole file is one work item
+            out.append((path, 0, size))
+            continue
+        lo, hi = 0, size
+        if order_slack_s is not None and (query.since or query.until):
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if query.since:
+                    lo = _seek(mm, _shift(query.since, -order_slack_s))
+                if query.until:
+                    hi = _seek(mm, _shift(query.until, order_slack_s))
+        for s in range(lo, hi, chunk_bytes):
+            out.append((path, s, min(s + chunk_bytes, hi)))
+    return out
+
+
+def expand_paths(paths: Iterable[str]) -> List[str]:
+    """Files as given; directories -> their .jsonl / .rowbinary files (sealed segments, sorted)."""
+    out: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(sorted(
+                e.path for e in os.scandir(p) if e.is_file() and e.name.endswith((".jsonl", ".rowbinary"))
+            ))
+        else:
+            out.append(p)
+    return out
+
+
+def cost_report(
+    paths: Iterable[str],
+    query: ReportQuery = ReportQuery(),
+    *,
+    workers: Optional[int] = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+    order_slack_s: Optional[float] = 3600.0,
+) -> Dict[str, Any]:
+    """
+    Group-by sums + latency percentiles over event JSONL / RowBinary files and segment directories.
+
+        cost_report(["data/events.jsonl"], ReportQuery(group_by=("feature", "model"), since="2025-12-01"))
+
+    Returns {"rows": [...sorted by cost desc], "stats": {...}}. workers=1 scans in-process.
+    """
+    for f in query.group_by + tuple(f for f, _ in query.where):
+        if f not in GROUP_FIELDS:
+            raise ValueError(f"Unknown field {f!r} (expected one of {GROUP_FIELDS})")
+    query = ReportQuery(
+        group_by=query.group_by,
+        since=normalize_ts(query.since) if query.since else None,
+        until=normalize_ts(query.until) if query.until else None,
+        where=query.where,
+        quantiles=query.quantiles,
+    )
+    t0 = time.perf_counter()
+    files = expand_paths(paths)
+    ranges = plan_ranges(files, query, chunk_bytes, order_slack_s)
+    scanned = sum(e - s for _, s, e in ranges)
+
+    groups: Dict[Tuple[bytes, ...], List[Any]] = {}
+    counters = {"lines": 0, "matched": 0, "slow": 0, "bad": 0}
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(ranges) <= 1:
+        parts = [scan_range(p, s, e, query) for p, s, e in ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as ex:
+            parts = list(ex.map(scan_range, *zip(*ranges), [query] * len(ranges)))
+    for part, c in parts:
+        _merge(groups, part)
+        for k, v in c.items():
+            counters[k] += v
+
+    rows: List[Dict[str, Any]] = []
+    for key, r in groups.items():
+        row: Dict[str, Any] = {f: v.decode("utf-8", "replace") for f, v in zip(query.group_by, key)}
+        calls = r[_CALLS]
+        row["calls"] = calls
+        row["errors"] = r[_ERRORS]
+        for i, f in enumerate(_SUMS, 2):
+            row[f] = r[i] if f == "computed_cost" else int(r[i])
+        row["cost"] = row.pop("computed_cost")
+        row["retries"] = row.pop("retry_count")
+        row["cache_hits"] = row.pop("cache_hit")
+        row["latency_ms_avg"] = round(r[_LAT_SUM] / calls, 1) if calls else 0.0
+        for q, v in zip(query.quantiles, _quantiles(r[_HIST], calls, query.quantiles)):
+            row[f"latency_ms_p{q * 100:g}"] = v
+        rows.append(row)
+    rows.sort(key=lambda x: x["cost"], reverse=True)
+
+    dt = time.perf_counter() - t0
+    return {
+        "rows": rows,
+        "stats": {
+            "files": len(files),
+            "ranges": len(ranges),
+            "scanned_mb": round(scanned / 1e6, 2),
+            **counters,
+            "seconds": round(dt, 3),
+            "mb_per_s": round(scanned / 1e6 / dt, 1) if dt > 0 else 0.0,
+        },
+    }
@@ -1,52 +1,196 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
 import time
 import uuid
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 
-from .pricing import PriceBook, stable_template_id
-from .emitter import JsonlEmitter
-from .instrument import compute_cost  # reuse your function
+from . import metrics
+from .pricing import PriceBook, WatchedPriceBook, stable_template_id
+from .emitter import (
+    AsyncJsonlEmitter, FanoutEmitter, JsonlEmitter, RowBinaryEmitter, SampledEmitter, ShardedEmitter, emit_many,
+)
+from .rollup import RollupEmitter
+from .cache import CACHED_FIELDS, MemoryCache, SqliteCache, TieredCache, cache_key
+from .templates import TemplateMiner
+from .retry import LatencyTracker, RetryPolicy, backoff_s, is_retryable
+from .batch import RateLimit, RateLimiter, estimate_tokens
+from .event import UsageEvent, build_event
+from .tokens import TokenCounter
+from .budget import Budget, BudgetExceeded, SpendTracker
+from .reports import ReportClient
 
 from .providers.openai_adapter import OpenAIAdapter, OpenAIAdapterConfig
 from .providers.vllm_adapter import VLLMAdapter, VLLMAdapterConfig
 from .providers.gemini_adapter import GeminiAdapter, GeminiAdapterConfig
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass(frozen=True)
 class GatewayConfig:
     price_book_path: str
     events_jsonl_path: str
     region_default: str = "us"
+    # > 0: watch price_book_path and hot-swap valid edits (WatchedPriceBook); 0: load once
+    price_book_reload_s: float = 0.0
+    # "sync": write on the caller thread; "async": bounded queue + background writer;
+    # "sharded": one segment file per process under events_segment_dir (multi-worker servers)
+    emitter_mode: str = "sync"
+    emitter_overflow: str = "block"  # async only: block / drop_oldest / spill
+    events_format: str = "jsonl"  # or "rowbinary" (compact, FORMAT RowBinary on ingest)
+    # sharded only: default <events_jsonl_path without extension>.segments/
+    events_segment_dir: Optional[str] = None
+    segment_max_bytes: int = 64 * 1024 * 1024
+    segment_max_age_s: float = 60.0
+    # achat(): max in-flight calls per provider; per-provider overrides, e.g. {"vllm": 512}
+    async_max_concurrency: int = 256
+    async_provider_concurrency: Optional[Dict[str, int]] = None
+    # response cache for chat()/achat(): 0 entries = off; sqlite path adds an on-disk tier
+    cache_max_entries: int = 0
+    cache_ttl_s: float = 3600
+    cache_sqlite_path: Optional[str] = None
+    cache_sqlite_max_entries: int = 1_000_000
+    # per-minute rollups next to the raw events; raw events can then be sampled per feature
+    rollup_jsonl_path: Optional[str] = None
+    rollup_interval_s: float = 10.0
+    raw_sample_rates: Optional[Dict[str, float]] = None  # feature -> keep rate (0 = rollup only)
+    # prompt_template_id: "mine" = Drain-style templates (user values become slots),
+    # "hash" = sha256 of the whole prompt (one id per distinct prompt, previous behaviour)
+    prompt_template_mode: str = "mine"
+    # serve gateway_sdk.metrics on this port (/metrics Prometheus text, /snapshot JSON);
+    # loopback only unless metrics_addr is widened (e.g. "0.0.0.0" for a scraper on another host)
+    metrics_port: Optional[int] = None
+    metrics_addr: str = "127.0.0.1"
+    # retries with backoff on retryable errors and hedged achat() calls; one event per attempt.
+    # None = single attempt (callers pass attempt / retry_count themselves, previous behaviour)
+    retry: Optional[RetryPolicy] = None
+    # chat_batch(): client-side requests/min + tokens/min per provider, e.g. {"openai": RateLimit(500, 200_000)}
+    batch_rate_limits: Optional[Dict[str, RateLimit]] = None
+    # count tokens locally when the provider reports no usage (event token_source="estimated");
+    # tokenizers: {model glob: "tiktoken[:<encoding>]" | "hf:<tokenizer.json>" | "heuristic"} (see gateway_sdk.tokens)
+    token_estimation: bool = True
+    tokenizers: Optional[Dict[str, str]] = None
+    # spend limits checked before each call (reject / downgrade, see gateway_sdk.budget);
+    # spend = computed_cost of this gateway's events, sliding windows kept in memory
+    budgets: Optional[Sequence[Budget]] = None
+    # at startup, load the current windows' spend from this ClickHouse rollup table
+    # ("llm_usage_rollup_1m" / "llm_usage_hourly"; CLICKHOUSE_* env as for ReportClient).
+    # A failed load is logged and counted (gateway_sdk_budget_seed_total{result="error"}) and the
+    # gateway starts with empty windows, unless budget_seed_required: then __init__ raises
+    budget_seed_table: Optional[str] = None
+    budget_seed_required: bool = False
 
 
 class LLMGateway:
-    def __init__(self, cfg: GatewayConfig):
+    def __init__(self, cfg: GatewayConfig, cache: Optional[Any] = None):
+        """
+        cache: anything with get(key) -> Optional[dict] / set(key, value) (see gateway_sdk.cache);
+        defaults to one built from the cache_* config fields.
+        """
         self.cfg = cfg
-        self.price_book = PriceBook.load(cfg.price_book_path)
-        self.emitter = JsonlEmitter(cfg.events_jsonl_path)
+        if cfg.price_book_reload_s > 0:
+            self.price_book: Any = WatchedPriceBook(cfg.price_book_path, poll_s=cfg.price_book_reload_s)
+        else:
+            self.price_book = PriceBook.load(cfg.price_book_path)
+        self.emitter = self._build_emitter(cfg)
+        if cfg.prompt_template_mode not in ("mine", "hash"):
+            raise ValueError(f"Unknown prompt_template_mode: {cfg.prompt_template_mode}")
+        self.template_miner = TemplateMiner() if cfg.prompt_template_mode == "mine" else None
+        if cfg.metrics_port:
+            metrics.serve(cfg.metrics_port, cfg.metrics_addr)
 
         # Lazy init adapters (only build if needed)
         self._openai: Optional[OpenAIAdapter] = None
         self._vllm: Optional[VLLMAdapter] = None
         self._gemini: Optional[GeminiAdapter] = None
 
+        # achat(): one semaphore per provider, created on first use
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+        self.retry = cfg.retry or RetryPolicy()
+        # hedge delay source: recent successful attempt latencies per (provider, model)
+        self.latency = LatencyTracker()
+        # hedge losers still running after the winner returned
+        self._background: Set["asyncio.Task[Any]"] = set()
+        self._rate_limiters = {p.lower(): RateLimiter(l) for p, l in (cfg.batch_rate_limits or {}).items()}
+        self.tokens = TokenCounter(cfg.tokenizers)
+        self.spend = SpendTracker(cfg.budgets) if cfg.budgets else None
+        self._prompt_prices: Dict[Tuple[str, str, str, str], Tuple[float, float]] = {}
+        for b in cfg.budgets or ():
+            self._check_downgrade(b)
+        if self.spend is not None and cfg.budget_seed_table:
+            try:
+                self.spend.seed_from_clickhouse(ReportClient(), cfg.budget_seed_table)
+            except Exception:
+                metrics.BUDGET_SEED_TOTAL.labels("error").inc()
+                if cfg.budget_seed_required:
+                    raise
+                logger.warning("budget seed from %s failed, starting with empty windows", cfg.budget_seed_table, exc_info=True)
+            else:
+                metrics.BUDGET_SEED_TOTAL.labels("ok").inc()
+
+        if cache is None and cfg.cache_max_entries > 0:
+            disk = None
+            if cfg.cache_sqlite_path:
+                disk = SqliteCache(cfg.cache_sqlite_path, max_entries=cfg.cache_sqlite_max_entries, ttl_s=cfg.cache_ttl_s)
+            cache = TieredCache(MemoryCache(cfg.cache_max_entries, cfg.cache_ttl_s), disk)
+        self.cache = cache
+
+    @staticmethod
+    def _build_emitter(cfg: GatewayConfig):
+        if cfg.emitter_mode == "async":
+            raw = AsyncJsonlEmitter(cfg.events_jsonl_path, overflow=cfg.emitter_overflow, fmt=cfg.events_format)
+        elif cfg.emitter_mode == "sharded":
+            raw = ShardedEmitter(
+                cfg.events_segment_dir or os.path.splitext(cfg.events_jsonl_path)[0] + ".segments",
+                fmt=cfg.events_format,
+                max_bytes=cfg.segment_max_bytes,
+                max_age_s=cfg.segment_max_age_s,
+            )
+        elif cfg.emitter_mode == "sync":
+            if cfg.events_format == "rowbinary":
+                raw = RowBinaryEmitter(cfg.events_jsonl_path)
+            else:
+                raw = JsonlEmitter(cfg.events_jsonl_path)
+        else:
+            raise ValueError(f"Unknown emitter_mode: {cfg.emitter_mode}")
+        if cfg.raw_sample_rates:
+            raw = SampledEmitter(raw, cfg.raw_sample_rates)
+        if cfg.rollup_jsonl_path:
+            return FanoutEmitter([raw, RollupEmitter(cfg.rollup_jsonl_path, interval_s=cfg.rollup_interval_s)])
+        return raw
+
+    def close(self) -> None:
+        """Flush and close the emitter (needed for emitter_mode="async")."""
+        self.emitter.close()
+        if self.cache is not None and hasattr(self.cache, "close"):
+            self.cache.close()
+        if isinstance(self.price_book, WatchedPriceBook):
+            self.price_book.close()
+
     def _get_adapter(self, provider: str):
         provider = provider.lower()
         if provider == "openai":
             if not self._openai:
                 api_key = os.environ["OPENAI_API_KEY"]
-                self._openai = OpenAIAdapter(OpenAIAdapterConfig(api_key=api_key))
+                self._openai = OpenAIAdapter(OpenAIAdapterConfig(api_key=api_key, max_retries=self._sdk_retries()))
             return self._openai
 
         if provider == "vllm":
             if not self._vllm:
                 base_url = os.environ.get("VLLM_BASE_URL", "http://localhost:8000/v1")
+                # several replicas: VLLM_BASE_URLS=http://a:8000/v1,http://b:8000/v1
+                base_urls = tuple(u.strip() for u in os.environ.get("VLLM_BASE_URLS", "").split(",") if u.strip())
                 api_key = os.environ.get("VLLM_API_KEY", "EMPTY")
-                self._vllm = VLLMAdapter(VLLMAdapterConfig(base_url=base_url, api_key=api_key))
+                self._vllm = VLLMAdapter(VLLMAdapterConfig(
+                    base_url=base_url, base_urls=base_urls, api_key=api_key, max_retries=self._sdk_retries(),
+                ))
             return self._vllm
 
         if provider == "gemini":
@@ -57,11 +201,193 @@ class LLMGateway:
 
         raise ValueError(f"Unknown provider: {provider}")
 
+    def _sdk_retries(self) -> Optional[int]:
+        # the SDK's own retries would be invisible attempts (unbilled in the events)
+        return 0 if self.retry.max_attempts > 1 or self.retry.hedge else None
+
     @staticmethod
     def _messages_to_prompt(messages: List[Dict[str, str]]) -> str:
         # For template hashing / chars; keep it deterministic.
         return "\n".join([f'{m.get("role","user")}: {m.get("content","")}' for m in messages])
 
+    def count_tokens(self, provider: str, model: str, messages: List[Dict[str, Any]]) -> int:
+        """Prompt tokens of a request before sending it (local tokenizer, offline)."""
+        return self.tokens.count_messages(provider.lower(), model, messages)
+
+    def _fill_usage(self, ctx: Dict[str, Any], messages: List[Dict[str, Any]], r: Dict[str, Any], text: str) -> None:
+        """Count the prompt / completion tokens the provider did not report into r (token_source="estimated")."""
+        pt = int(r.get("prompt_tokens") or 0)
+        ct = int(r.get("completion_tokens") or 0)
+        if not self.cfg.token_estimation or (pt and (ct or not text)):
+            return
+        t = metrics.start()
+        provider, model = ctx["provider"].lower(), ctx["model"]
+        if not pt:
+            pt = r["prompt_tokens"] = self.tokens.count_messages(provider, model, messages)
+        if not ct and text:
+            ct = r["completion_tokens"] = self.tokens.count_text(provider, model, text)
+        r["total_tokens"] = pt + ct
+        r["token_source"] = "estimated"
+        metrics.TOKENS_ESTIMATED_TOTAL.labels(ctx["provider"], model).inc()
+        metrics.STAGE_COUNT_TOKENS.observe_since(t)
+
+    def _build_event(
+        self,
+        *,
+        ctx: Dict[str, Any],
+        result: Optional[Dict[str, Any]],
+        status: str,
+        latency_ms: int,
+        ttft_ms: Optional[int] = None,
+        completion_chars: Optional[int] = None,
+    ) -> UsageEvent:
+        """Shared by chat() / achat() / chat_stream() / chat_batch(); see event.build_event."""
+        event = build_event(self.price_book, ctx, result, status, latency_ms, ttft_ms, completion_chars)
+        if self.spend is not None:
+            self.spend.record(event)
+        return event
+
+    def _admit(self, adapter: Any, ctx: Dict[str, Any], messages: List[Dict[str, Any]]) -> Any:
+        """
+        Budget check before sending: raises BudgetExceeded, or for a "downgrade" budget switches
+        ctx to the cheaper model and returns its adapter. Estimate = prompt cost at the resolved price.
+        """
+        spend = self.spend
+        if spend is None:
+            return adapter
+        t = metrics.start()
+        # str like the event fields the spend is booked under
+        tenant_id, feature, model = str(ctx["tenant_id"]), str(ctx["feature"]), ctx["model"]
+        room = spend.headroom(tenant_id, feature, model)
+        exc: Optional[BudgetExceeded] = None
+        if room != float("inf"):
+            estimate = self._prompt_cost(ctx, messages, room)
+            if estimate is not None and estimate > room:
+                exc = spend.exceeded(tenant_id, feature, model, estimate)
+        if exc is not None and exc.budget.action == "downgrade":
+            b = exc.budget
+            target = self._downgrade_target(b, ctx)
+            if target is None:
+                # the call would fail on its event price anyway; say why before sending it
+                exc = BudgetExceeded(
+                    b, exc.key, exc.spent, exc.estimate,
+                    note=f"downgrade target {b.downgrade_provider or ctx['provider']}/{b.downgrade_model} "
+                         f"has no price{' in region ' + b.downgrade_region if b.downgrade_region else ''}",
+                )
+            else:
+                metrics.BUDGET_ACTIONS_TOTAL.labels(b.label(), "downgrade").inc()
+                ctx["downgraded_from"] = model
+                ctx["provider"], ctx["model"], ctx["region"] = target
+                adapter = self._get_adapter(ctx["provider"])
+                estimate = self._prompt_cost(ctx, messages, 0.0)
+                exc = spend.exceeded(tenant_id, feature, ctx["model"], estimate or 0.0, action="reject")
+        metrics.STAGE_BUDGET_CHECK.observe_since(t)
+        if exc is not None:
+            metrics.BUDGET_ACTIONS_TOTAL.labels(exc.budget.label(), "reject").inc()
+            raise exc
+        return adapter
+
+    def _downgrade_target(self, b: Budget, ctx: Dict[str, Any]) -> Optional[Tuple[str, str, str]]:
+        """(provider, model, region) a downgrade budget sends the call to, None if it has no price now."""
+        provider, model = b.downgrade_provider or ctx["provider"], b.downgrade_model
+        if b.downgrade_region:
+            regions: List[str] = [b.downgrade_region]
+        else:
+            # same region when only the model changes; another provider like a hedge, then any priced region
+            first = ctx["region"] if provider == ctx["provider"] else self.cfg.region_default
+            regions = [first] + sorted(r for p, m, r in self.price_book.keys() if p == provider and m == model and r != first)
+        priced = set(self.price_book.keys())
+        now = datetime.now(timezone.utc)
+        for region in regions:
+            if (provider, model, region) not in priced:
+                continue
+            try:
+                self.price_book.resolve(provider, model, region, now)
+            except KeyError:
+                continue  # only priced from a later effective_from
+            return provider, model, region
+        return None
+
+    def _check_downgrade(self, b: Budget) -> None:
+        # config typos fail at startup instead of on the first call over budget
+        if b.action != "downgrade":
+            return
+        keys = self.price_book.keys()
+        if not any(
+            m == b.downgrade_model
+            and (b.downgrade_provider is None or p == b.downgrade_provider)
+            and (b.downgrade_region is None or r == b.downgrade_region)
+            for p, m, r in keys
+        ):
+            where = ", ".join(f"{k}={v}" for k, v in (
+                ("provider", b.downgrade_provider), ("model", b.downgrade_model), ("region", b.downgrade_region),
+            ) if v)
+            raise ValueError(f"budget {b.label()}: downgrade target ({where}) is not in the price book")
+
+    def _prompt_cost(self, ctx: Dict[str, Any], messages: List[Dict[str, Any]], room: float) -> Optional[float]:
+        # prompt unit price, re-resolved at most once a second (price book reloads / new effective_from)
+        pk = (ctx["provider"], ctx["model"], ctx["region"], ctx.get("price_tier", "standard"))
+        now = time.monotonic()
+        hit = self._prompt_prices.get(pk)
+        if hit is None or hit[0] < now:
+            try:
+                price = self.price_book.resolve(pk[0], pk[1], pk[2], datetime.now(timezone.utc))
+            except KeyError:
+                return None  # no price: the call fails on its event as before
+            hit = self._prompt_prices[pk] = (now + 1.0, float(price.unit_prices(pk[3])[0]))
+        unit_p = hit[1]
+        # a prompt has fewer tokens than chars: only tokenize when that bound doesn't fit
+        upper = ctx["prompt_chars"] * unit_p / 1000.0
+        if upper <= room:
+            return upper
+        return self.count_tokens(ctx["provider"], ctx["model"], messages) * unit_p / 1000.0
+
+    def _call_context(
+        self,
+        *,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        tenant_id: str,
+        user_id: str,
+        feature: str,
+        endpoint: str,
+        region: Optional[str],
+        request_id: Optional[str],
+        attempt: int,
+        retry_count: int,
+        cache_hit: bool,
+    ) -> Dict[str, Any]:
+        if self.template_miner is not None:
+            t = metrics.start()
+            template_id = self.template_miner.template_id(messages)
+            metrics.STAGE_TEMPLATE_HASH.observe_since(t)
+            # len(_messages_to_prompt(messages)) without building the joined string
+            prompt_chars = sum(len(m.get("role", "user")) + len(str(m.get("content", ""))) + 3 for m in messages) - 1
+        else:
+            t = metrics.start()
+            prompt_for_hash = self._messages_to_prompt(messages)
+            metrics.STAGE_MESSAGES_TO_PROMPT.observe_since(t)
+            t = metrics.start()
+            template_id = stable_template_id(prompt_for_hash)
+            metrics.STAGE_TEMPLATE_HASH.observe_since(t)
+            prompt_chars = len(prompt_for_hash)
+        return {
+            "provider": provider,
+            "model": model,
+            "region": region or self.cfg.region_default,
+            "request_id": request_id or str(uuid.uuid4()),
+            "attempt": attempt,
+            "retry_count": retry_count,
+            "cache_hit": cache_hit,
+            "tenant_id": tenant_id,
+            "user_id": user_id,
+            "feature": feature,
+            "endpoint": endpoint,
+            "template_id": template_id,
+            "prompt_chars": max(prompt_chars, 0),
+        }
+
     def chat(
         self,
         *,
@@ -77,79 +403,635 @@ class LLMGateway:
         attempt: int = 1,
         retry_count: int = 0,
         cache_hit: bool = False,
+        use_cache: bool = True,
         **kwargs: Any,
     ) -> Dict[str, Any]:
         """
         Returns: normalized adapter result + emits one usage event.
+        With a response cache configured, identical (provider, model, messages, kwargs)
+        are served from cache without calling the adapter (event has cache_hit=1).
         """
         adapter = self._get_adapter(provider)
-        region = region or self.cfg.region_default
-        request_id = request_id or str(uuid.uuid4())
+        ctx = self._call_context(
+            provider=provider, model=model, messages=messages,
+            tenant_id=tenant_id, user_id=user_id, feature=feature, endpoint=endpoint,
+            region=region, request_id=request_id,
+            attempt=attempt, retry_count=retry_count, cache_hit=cache_hit,
+        )
+
+        key = None
+        if self.cache is not None and use_cache:
+            key = cache_key(provider, model, messages, kwargs)
+            ctx["ts"] = datetime.now(timezone.utc)
+            t0 = time.perf_counter()
+            cached = self.cache.get(key)
+            if cached is not None:
+                result = self._from_cache(cached)
+                self._emit(self._cache_hit_event(ctx, result, t0))
+                return result
+
+        adapter = self._admit(adapter, ctx, messages)
+        result = self._call_with_retries(adapter, ctx, messages, kwargs)
+        if "downgraded_from" in ctx:
+            result["downgraded_from"] = ctx["downgraded_from"]
+        elif key is not None:
+            self.cache.set(key, {f: result.get(f) for f in CACHED_FIELDS})
+        return result
+
+    def _call_with_retries(
+        self,
+        adapter: Any,
+        ctx: Dict[str, Any],
+        messages: List[Dict[str, str]],
+        kwargs: Dict[str, Any],
+        emit: Optional[Callable[[Dict[str, Any]], None]] = None,
+        limiter: Optional[RateLimiter] = None,
+    ) -> Dict[str, Any]:
+        policy = self.retry
+        retries = 0
+        while True:
+            try:
+                return self._call_once(adapter, self._attempt_ctx(ctx, retries, retries), messages, kwargs, emit, limiter)
+            except Exception as e:
+                retries += 1
+                if retries >= policy.max_attempts or not is_retryable(e):
+                    raise
+                metrics.EXTRA_ATTEMPTS_TOTAL.labels(ctx["provider"], "retry").inc()
+                time.sleep(backoff_s(policy, retries, e))
+
+    @staticmethod
+    def _attempt_ctx(ctx: Dict[str, Any], n: int, retries: int, **override: Any) -> Dict[str, Any]:
+        # n-th attempt after the first (retry or hedge); retry_count counts retries only,
+        # so attempt - 1 > retry_count on a request means hedges were sent
+        return dict(ctx, attempt=ctx["attempt"] + n, retry_count=ctx["retry_count"] + retries, **override)
 
-        ts = datetime.now(timezone.utc)
+    def _call_once(
+        self,
+        adapter: Any,
+        ctx: Dict[str, Any],
+        messages: List[Dict[str, str]],
+        kwargs: Dict[str, Any],
+        emit: Optional[Callable[[Dict[str, Any]], None]] = None,
+        limiter: Optional[RateLimiter] = None,
+    ) -> Dict[str, Any]:
+        """One attempt, one event (emit: default self._emit; chat_batch collects them)."""
+        estimated = 0
+        if limiter is not None:
+            estimated = estimate_tokens(self.count_tokens(ctx["provider"], ctx["model"], messages), kwargs)
+            limiter.acquire(estimated)
+        ctx["ts"] = datetime.now(timezone.utc)
         t0 = time.perf_counter()
 
         status = "ok"
         result: Optional[Dict[str, Any]] = None
 
-        prompt_for_hash = self._messages_to_prompt(messages)
-        template_id = stable_template_id(prompt_for_hash)
-
         try:
             # Each adapter exposes .chat(model=..., messages=...)
-            result = adapter.chat(model=model, messages=messages, **kwargs)
+            result = adapter.chat(model=ctx["model"], messages=messages, **kwargs)
             return result
-        except Exception:
+        except Exception as e:
             status = "error"
+            ctx["replica"] = getattr(e, "replica", "")
             raise
         finally:
+            elapsed = time.perf_counter() - t0
+            if status == "ok":
+                self.latency.observe(ctx["provider"], ctx["model"], elapsed)
+                self._fill_usage(ctx, messages, result, result.get("text") or "")
+            if limiter is not None:
+                # failed calls still count as a request, their tokens are given back
+                limiter.settle(estimated, int((result or {}).get("total_tokens", 0) or 0))
+            (emit or self._emit)(self._build_event(ctx=ctx, result=result, status=status, latency_ms=int(elapsed * 1000)))
+
+    def chat_batch(
+        self,
+        requests: Sequence[Dict[str, Any]],
+        *,
+        max_workers: int = 16,
+        use_batch_api: bool = False,
+        batch_poll_s: float = 30.0,
+        batch_timeout_s: float = 24 * 3600.0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Many chat() calls for offline jobs. Each request is a dict of chat() keyword arguments
+        (provider, model, messages, tenant_id, user_id, feature, endpoint, [region, request_id,
+        ...adapter kwargs such as max_tokens]).
+
+        Runs on max_workers threads, each call waiting for GatewayConfig.batch_rate_limits of
+        its provider; retries follow GatewayConfig.retry. Returns one entry per request, in
+        order: the normalized result, or {"error": "...", "exception": e} for a failed item.
+        All usage events are written with one bulk emit at the end. No response cache.
+
+        use_batch_api: providers with a batch endpoint (OpenAI Batch API) get one batch per
+        model instead, priced at the price book's batch tier (event price_tier="batch");
+        latency_ms of those events is the batch turnaround. Other providers use the pool.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+        events: List[Dict[str, Any]] = []
+        todo = list(range(len(requests)))
+        # build adapters up front, not racing in the worker threads
+        for provider in {str(r.get("provider", "")).lower() for r in requests}:
+            try:
+                self._get_adapter(provider)
+            except Exception:
+                pass  # reported per item
+        if use_batch_api:
+            todo = self._run_batch_api(requests, todo, results, events, batch_poll_s, batch_timeout_s)
+
+        def one(i: int) -> Dict[str, Any]:
+            try:
+                adapter, ctx, messages, kwargs = self._batch_item(requests[i])
+                adapter = self._admit(adapter, ctx, messages)
+                limiter = self._rate_limiters.get(ctx["provider"].lower())
+                result = self._call_with_retries(adapter, ctx, messages, kwargs, events.append, limiter)
+                if "downgraded_from" in ctx:
+                    result["downgraded_from"] = ctx["downgraded_from"]
+                return result
+            except Exception as e:
+                return {"error": f"{type(e).__name__}: {e}", "exception": e}
+
+        if todo:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(todo))), thread_name_prefix="chat-batch") as pool:
+                for i, out in zip(todo, pool.map(one, todo)):
+                    results[i] = out
+
+        t = metrics.start()
+        emit_many(self.emitter, events)
+        metrics.STAGE_EMIT.observe_since(t)
+        return results  # type: ignore[return-value]
+
+    def _batch_item(self, req: Dict[str, Any]) -> Tuple[Any, Dict[str, Any], List[Dict[str, str]], Dict[str, Any]]:
+        kwargs = dict(req)
+        provider, model, messages = kwargs.pop("provider"), kwargs.pop("model"), kwargs.pop("messages")
+        adapter = self._get_adapter(provider)
+        ctx = self._call_context(
+            provider=provider, model=model, messages=messages,
+            tenant_id=kwargs.pop("tenant_id"), user_id=kwargs.pop("user_id"),
+            feature=kwargs.pop("feature"), endpoint=kwargs.pop("endpoint"),
+            region=kwargs.pop("region", None), request_id=kwargs.pop("request_id", None),
+            attempt=kwargs.pop("attempt", 1), retry_count=kwargs.pop("retry_count", 0), cache_hit=False,
+        )
+        kwargs.pop("use_cache", None)
+        return adapter, ctx, messages, kwargs
+
+    def _run_batch_api(
+        self,
+        requests: Sequence[Dict[str, Any]],
+        todo: List[int],
+        results: List[Optional[Dict[str, Any]]],
+        events: List[Dict[str, Any]],
+        poll_s: float,
+        timeout_s: float,
+    ) -> List[int]:
+        """Send what the provider can batch; returns the indexes left for the worker pool."""
+        groups: Dict[Tuple[str, str], List[Tuple[int, Dict[str, Any], List[Dict[str, str]], Dict[str, Any]]]] = {}
+        rest: List[int] = []
+        for i in todo:
+            try:
+                adapter, ctx, messages, kwargs = self._batch_item(requests[i])
+            except Exception:
+                rest.append(i)  # the pool reports the error
+                continue
+            if not hasattr(adapter, "batch_chat"):
+                rest.append(i)
+                continue
+            ctx["price_tier"] = "batch"
+            try:
+                if self._admit(adapter, ctx, messages) is not adapter:
+                    rest.append(i)  # downgraded to a provider without the batch path
+                    continue
+            except BudgetExceeded as e:
+                results[i] = {"error": f"{type(e).__name__}: {e}", "exception": e}
+                continue
+            groups.setdefault((ctx["provider"], ctx["model"]), []).append((i, ctx, messages, kwargs))
+
+        for (provider, model), items in groups.items():
+            ts = datetime.now(timezone.utc)
+            t0 = time.perf_counter()
+            try:
+                outs: List[Any] = self._get_adapter(provider).batch_chat(
+                    model=model, requests=[(m, kw) for _, _, m, kw in items], poll_s=poll_s, timeout_s=timeout_s,
+                )
+            except Exception as e:
+                outs = [e] * len(items)
             latency_ms = int((time.perf_counter() - t0) * 1000)
+            for (i, ctx, _, _), out in zip(items, outs):
+                ctx["ts"] = ts
+                if isinstance(out, BaseException):
+                    results[i] = {"error": f"{type(out).__name__}: {out}", "exception": out}
+                    events.append(self._build_event(ctx=ctx, result=None, status="error", latency_ms=latency_ms))
+                else:
+                    results[i] = out
+                    events.append(self._build_event(ctx=ctx, result=out, status="ok", latency_ms=latency_ms))
+        return rest
 
-            pt = int((result or {}).get("prompt_tokens", 0) or 0)
-            ct = int((result or {}).get("completion_tokens", 0) or 0)
-            tt = int((result or {}).get("total_tokens", 0) or (pt + ct))
+    @staticmethod
+    def _from_cache(cached: Dict[str, Any]) -> Dict[str, Any]:
+        # copy: the memory tier hands out the stored dict
+        result = dict(cached)
+        result["raw"] = None
+        result["cache_hit"] = True
+        return result
+
+    def _cache_hit_event(self, ctx: Dict[str, Any], result: Dict[str, Any], t0: float) -> Dict[str, Any]:
+        ctx["cache_hit"] = True
+        latency_ms = int((time.perf_counter() - t0) * 1000)
+        return self._build_event(ctx=ctx, result=result, status="ok", latency_ms=latency_ms)
+
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        sem = self._semaphores.get(provider)
+        if sem is None:
+            limit = (self.cfg.async_provider_concurrency or {}).get(provider, self.cfg.async_max_concurrency)
+            sem = self._semaphores.setdefault(provider, asyncio.Semaphore(limit))
+        return sem
 
-            # Price resolve (versioned) by timestamp
-            price = self.price_book.resolve(provider, model, region, ts)
+    def _emit(self, event: Dict[str, Any]) -> None:
+        t = metrics.start()
+        self.emitter.emit(event)
+        metrics.STAGE_EMIT.observe_since(t)
+
+    def _emit_nowait(self, event: Dict[str, Any]) -> None:
+        emitter = self.emitter
+        if isinstance(emitter, AsyncJsonlEmitter) and emitter.overflow != "block":
+            emitter.emit(event)
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # finalized outside a loop (e.g. GC after loop shutdown): nothing to block, write it here
+            emitter.emit(event)
+            return
+        loop.run_in_executor(None, emitter.emit, event)
+
+    async def _aemit(self, event: Dict[str, Any]) -> None:
+        # AsyncJsonlEmitter that never blocks (drop_oldest / spill) is just a queue put;
+        # anything that may block on I/O or a full queue goes to a worker thread.
+        t = metrics.start()
+        emitter = self.emitter
+        if isinstance(emitter, AsyncJsonlEmitter) and emitter.overflow != "block":
+            emitter.emit(event)
+        else:
+            await asyncio.to_thread(emitter.emit, event)
+        metrics.STAGE_EMIT.observe_since(t)
+
+    async def achat(
+        self,
+        *,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        tenant_id: str,
+        user_id: str,
+        feature: str,
+        endpoint: str,
+        region: Optional[str] = None,
+        request_id: Optional[str] = None,
+        attempt: int = 1,
+        retry_count: int = 0,
+        cache_hit: bool = False,
+        use_cache: bool = True,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        """
+        Async chat(): awaits the adapter's native async client, bounded by a per-provider
+        semaphore (GatewayConfig.async_max_concurrency / async_provider_concurrency).
+        latency_ms covers the model call only, not the time spent waiting for a slot.
+        Cache hits skip the semaphore.
+        """
+        adapter = self._get_adapter(provider)
+        ctx = self._call_context(
+            provider=provider, model=model, messages=messages,
+            tenant_id=tenant_id, user_id=user_id, feature=feature, endpoint=endpoint,
+            region=region, request_id=request_id,
+            attempt=attempt, retry_count=retry_count, cache_hit=cache_hit,
+        )
 
-            unit_p = float(price.price_per_1k_prompt)
-            unit_c = float(price.price_per_1k_completion)
+        key = None
+        cache = self.cache
+        if cache is not None and use_cache:
+            key = cache_key(provider, model, messages, kwargs)
+            ctx["ts"] = datetime.now(timezone.utc)
+            t0 = time.perf_counter()
+            cached = await asyncio.to_thread(cache.get, key) if getattr(cache, "blocking", True) else cache.get(key)
+            if cached is not None:
+                result = self._from_cache(cached)
+                await self._aemit(self._cache_hit_event(ctx, result, t0))
+                return result
 
-            if cache_hit:
-                cost = 0.0
+        adapter = self._admit(adapter, ctx, messages)
+        policy = self.retry
+        if policy.hedge:
+            result = await self._ahedged(adapter, ctx, messages, kwargs)
+        else:
+            retries = 0
+            while True:
+                try:
+                    result = await self._acall_once(adapter, self._attempt_ctx(ctx, retries, retries), messages, kwargs)
+                    break
+                except Exception as e:
+                    retries += 1
+                    if retries >= policy.max_attempts or not is_retryable(e):
+                        raise
+                    metrics.EXTRA_ATTEMPTS_TOTAL.labels(ctx["provider"], "retry").inc()
+                    await asyncio.sleep(backoff_s(policy, retries, e))
+        if "downgraded_from" in ctx:
+            result["downgraded_from"] = ctx["downgraded_from"]
+        elif key is not None:
+            value = {f: result.get(f) for f in CACHED_FIELDS}
+            if getattr(cache, "blocking", True):
+                await asyncio.to_thread(cache.set, key, value)
             else:
-                cost = float(compute_cost(pt, ct, unit_p, unit_c))
-
-            event = {
-                "timestamp": ts.strftime("%Y-%m-%d %H:%M:%S.%f")[:23],  # ClickHouse-friendly DateTime64(3)
-                "request_id": request_id,
-                "attempt": int(attempt),
-
-                "tenant_id": tenant_id,
-                "user_id": user_id,
-                "feature": feature,
-                "endpoint": endpoint,
-                "prompt_template_id": template_id,
-
-                "provider": provider,
-                "model": model,
-                "region": region,
-
-                "prompt_tokens": pt,
-                "completion_tokens": ct,
-                "total_tokens": tt,
-
-                "latency_ms": int(latency_ms),
-                "status": status,
-                "retry_count": int(retry_count),
-                "cache_hit": 1 if cache_hit else 0,
-
-                "price_version": price.price_version,
-                "unit_price_prompt": unit_p,
-                "unit_price_completion": unit_c,
-                "computed_cost": cost,
-
-                "prompt_chars": len(prompt_for_hash),
-                "completion_chars": 0,
-            }
-            self.emitter.emit(event)
\ No newline at end of file
+                cache.set(key, value)
+        return result
+
+    async def _acall_once(
+        self,
+        adapter: Any,
+        ctx: Dict[str, Any],
+        messages: List[Dict[str, str]],
+        kwargs: Dict[str, Any],
+        race: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        One attempt under the provider semaphore, one event. race: shared by hedged attempts;
+        an attempt that succeeds after another one already won is recorded as status="hedged".
+        """
+        provider, model = ctx["provider"], ctx["model"]
+        async with self._semaphore(provider.lower()):
+            ctx["ts"] = datetime.now(timezone.utc)
+            t0 = time.perf_counter()
+
+            status = "ok"
+            result: Optional[Dict[str, Any]] = None
+
+            try:
+                result = await adapter.achat(model=model, messages=messages, **kwargs)
+                if race is not None:
+                    if race["winner"] is None:
+                        race["winner"] = ctx["attempt"]
+                    else:
+                        status = "hedged"
+                return result
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            except Exception as e:
+                status = "error"
+                ctx["replica"] = getattr(e, "replica", "")
+                raise
+            finally:
+                elapsed = time.perf_counter() - t0
+                if status in ("ok", "hedged"):
+                    self.latency.observe(provider, model, elapsed)
+                    self._fill_usage(ctx, messages, result, result.get("text") or "")
+                event = self._build_event(ctx=ctx, result=result, status=status, latency_ms=int(elapsed * 1000))
+                if status == "cancelled":
+                    self._emit_nowait(event)
+                else:
+                    await self._aemit(event)
+
+    async def _ahedged(
+        self, adapter: Any, ctx: Dict[str, Any], messages: List[Dict[str, str]], kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        First attempt, plus one hedge if it is still running after the hedge delay; the first
+        success wins. Failures are retried (with backoff) only once nothing else is in flight.
+        """
+        policy = self.retry
+        loop = asyncio.get_running_loop()
+        race: Dict[str, Any] = {"winner": None}
+        pending: Set["asyncio.Task[Dict[str, Any]]"] = set()
+        hedge_provider = (policy.hedge_provider or ctx["provider"]).lower()
+        hedge = {
+            "provider": hedge_provider,
+            "model": policy.hedge_model or ctx["model"],
+            "region": policy.hedge_region or (ctx["region"] if hedge_provider == ctx["provider"] else self.cfg.region_default),
+        }
+        launched = retries = 0
+
+        def launch(target: Any, **override: Any) -> "asyncio.Task[Dict[str, Any]]":
+            nonlocal launched
+            actx = self._attempt_ctx(ctx, launched, retries, **override)
+            launched += 1
+            task = asyncio.ensure_future(self._acall_once(target, actx, messages, kwargs, race))
+            pending.add(task)
+            return task
+
+        primary = launch(adapter)
+        delay = self.latency.hedge_delay_s(policy, ctx["provider"], ctx["model"])
+        hedge_at = loop.time() + delay if delay is not None else None
+        last: Optional[BaseException] = None
+        try:
+            while True:
+                timeout = max(0.0, hedge_at - loop.time()) if hedge_at is not None else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedge_at = None  # one hedge per call
+                    metrics.EXTRA_ATTEMPTS_TOTAL.labels(ctx["provider"], "hedge").inc()
+                    launch(self._get_adapter(hedge_provider), **hedge)
+                    continue
+                for t in done:
+                    if t.exception() is None:
+                        if t is not primary:
+                            metrics.EXTRA_ATTEMPTS_TOTAL.labels(ctx["provider"], "hedge_won").inc()
+                        self._settle_losers(pending)
+                        pending = set()
+                        return t.result()
+                    last = t.exception()
+                if pending:
+                    continue
+                retries += 1
+                if retries >= policy.max_attempts or not is_retryable(last):
+                    raise last
+                metrics.EXTRA_ATTEMPTS_TOTAL.labels(ctx["provider"], "retry").inc()
+                await asyncio.sleep(backoff_s(policy, retries, last))
+                primary = launch(adapter)
+        finally:
+            # caller cancelled / failed: nothing should outlive the call
+            for t in pending:
+                t.cancel()
+
+    def _settle_losers(self, pending: Set["asyncio.Task[Any]"]) -> None:
+        if self.retry.hedge_cancel_loser:
+            for t in pending:
+                t.cancel()
+            return
+        # let them finish so their events carry the real usage; keep a reference until then
+        for t in pending:
+            self._background.add(t)
+            t.add_done_callback(self._loser_done)
+
+    def _loser_done(self, t: "asyncio.Task[Any]") -> None:
+        self._background.discard(t)
+        if not t.cancelled():
+            t.exception()  # already recorded as an error event; don't log "never retrieved"
+
+    @staticmethod
+    def _stream_accumulate(acc: Dict[str, Any], chunk: Dict[str, Any]) -> str:
+        # adapters yield {"text": delta} ... and a final usage chunk
+        if "total_tokens" in chunk:
+            acc["prompt_tokens"] = chunk["prompt_tokens"]
+            acc["completion_tokens"] = chunk["completion_tokens"]
+            acc["total_tokens"] = chunk["total_tokens"]
+        if "replica" in chunk:
+            acc["replica"] = chunk["replica"]
+        text = chunk.get("text") or ""
+        if text:
+            acc["text_chars"] += len(text)
+            parts = acc.get("parts")
+            if parts is not None:
+                parts.append(text)
+        return text
+
+    def chat_stream(
+        self,
+        *,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        tenant_id: str,
+        user_id: str,
+        feature: str,
+        endpoint: str,
+        region: Optional[str] = None,
+        request_id: Optional[str] = None,
+        attempt: int = 1,
+        retry_count: int = 0,
+        cache_hit: bool = False,
+        **kwargs: Any,
+    ) -> Iterator[str]:
+        """
+        Streaming chat(): yields text deltas as they arrive and emits one usage event
+        when the stream ends (ttft_ms = time to first non-empty delta).
+        Stopping iteration early records status="cancelled".
+        With GatewayConfig.retry, a failure before the first delta is retried (new event);
+        once text was yielded the error is raised.
+        """
+        adapter = self._get_adapter(provider)
+        ctx = self._call_context(
+            provider=provider, model=model, messages=messages,
+            tenant_id=tenant_id, user_id=user_id, feature=feature, endpoint=endpoint,
+            region=region, request_id=request_id,
+            attempt=attempt, retry_count=retry_count, cache_hit=cache_hit,
+        )
+        adapter = self._admit(adapter, ctx, messages)
+        provider, model = ctx["provider"], ctx["model"]  # a downgrade budget may switch them
+
+        policy = self.retry
+        retries = 0
+        while True:
+            actx = self._attempt_ctx(ctx, retries, retries)
+            actx["ts"] = datetime.now(timezone.utc)
+            t0 = time.perf_counter()
+            ttft_ms: Optional[int] = None
+
+            status = "ok"
+            # deltas are kept only to count completion tokens if no usage chunk arrives
+            acc: Dict[str, Any] = {"text_chars": 0, "parts": [] if self.cfg.token_estimation else None}
+            retry_exc: Optional[Exception] = None
+
+            try:
+                for chunk in adapter.stream(model=model, messages=messages, **kwargs):
+                    text = self._stream_accumulate(acc, chunk)
+                    if text:
+                        if ttft_ms is None:
+                            ttft_ms = int((time.perf_counter() - t0) * 1000)
+                        yield text
+            except GeneratorExit:
+                status = "cancelled"
+                raise
+            except Exception as e:
+                status = "error"
+                actx["replica"] = getattr(e, "replica", "")
+                if ttft_ms is not None or retries + 1 >= policy.max_attempts or not is_retryable(e):
+                    raise
+                retry_exc = e
+            finally:
+                latency_ms = int((time.perf_counter() - t0) * 1000)
+                # a stream that produced text was served (and billed) even if it ended early
+                if status == "ok" or acc["text_chars"]:
+                    self._fill_usage(actx, messages, acc, "".join(acc["parts"] or ()))
+                self._emit(self._build_event(
+                    ctx=actx, result=acc, status=status, latency_ms=latency_ms,
+                    ttft_ms=ttft_ms, completion_chars=acc["text_chars"],
+                ))
+            if retry_exc is None:
+                return
+            retries += 1
+            metrics.EXTRA_ATTEMPTS_TOTAL.labels(ctx["provider"], "retry").inc()
+            time.sleep(backoff_s(policy, retries, retry_exc))
+
+    async def achat_stream(
+        self,
+        *,
+        provider: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        tenant_id: str,
+        user_id: str,
+        feature: str,
+        endpoint: str,
+        region: Optional[str] = None,
+        request_id: Optional[str] = None,
+        attempt: int = 1,
+        retry_count: int = 0,
+        cache_hit: bool = False,
+        **kwargs: Any,
+    ) -> AsyncIterator[str]:
+        """
+        Async chat_stream(); holds the provider semaphore for the whole stream
+        (released during retry backoff). Retries as in chat_stream(); no hedging.
+        """
+        adapter = self._get_adapter(provider)
+        ctx = self._call_context(
+            provider=provider, model=model, messages=messages,
+            tenant_id=tenant_id, user_id=user_id, feature=feature, endpoint=endpoint,
+            region=region, request_id=request_id,
+            attempt=attempt, retry_count=retry_count, cache_hit=cache_hit,
+        )
+        adapter = self._admit(adapter, ctx, messages)
+        provider, model = ctx["provider"], ctx["model"]  # a downgrade budget may switch them
+
+        policy = self.retry
+        retries = 0
+        while True:
+            retry_exc: Optional[Exception] = None
+            async with self._semaphore(provider.lower()):
+                actx = self._attempt_ctx(ctx, retries, retries)
+                actx["ts"] = datetime.now(timezone.utc)
+                t0 = time.perf_counter()
+                ttft_ms: Optional[int] = None
+
+                status = "ok"
+                acc: Dict[str, Any] = {"text_chars": 0, "parts": [] if self.cfg.token_estimation else None}
+
+                try:
+                    async for chunk in adapter.astream(model=model, messages=messages, **kwargs):
+                        text = self._stream_accumulate(acc, chunk)
+                        if text:
+                            if ttft_ms is None:
+                                ttft_ms = int((time.perf_counter() - t0) * 1000)
+                            yield text
+                except (GeneratorExit, asyncio.CancelledError):
+                    status = "cancelled"
+                    raise
+                except Exception as e:
+                    status = "error"
+                    actx["replica"] = getattr(e, "replica", "")
+                    if ttft_ms is not None or retries + 1 >= policy.max_attempts or not is_retryable(e):
+                        raise
+                    retry_exc = e
+                finally:
+                    latency_ms = int((time.perf_counter() - t0) * 1000)
+                    if status == "ok" or acc["text_chars"]:
+                        self._fill_usage(actx, messages, acc, "".join(acc["parts"] or ()))
+                    # no await here: the generator may be finalized by aclose() / GC
+                    self._emit_nowait(self._build_event(
+                        ctx=actx, result=acc, status=status, latency_ms=latency_ms,
+                        ttft_ms=ttft_ms, completion_chars=acc["text_chars"],
+                    ))
+            if retry_exc is None:
+                return
+            retries += 1
+            metrics.EXTRA_ATTEMPTS_TOTAL.labels(ctx["provider"], "retry").inc()
+            await asyncio.sleep(backoff_s(policy, retries, retry_exc))
@@ -4,15 +4,28 @@ import uuid
 from datetime import datetime, timezone
 from typing import Any, Callable, Dict, Optional, Tuple
 
+from . import metrics
 from .pricing import PriceBook, stable_template_id
 from .emitter import JsonlEmitter
-
-def compute_cost(prompt_tokens: int, completion_tokens: int, price_per_1k_prompt: float, price_per_1k_completion: float) -> float:
-    return (prompt_tokens / 1000.0) * price_per_1k_prompt + (completion_tokens / 1000.0) * price_per_1k_completion
+from .event import build_event, compute_cost  # noqa: F401  (compute_cost re-exported)
+from .templates import TemplateMiner
+from .tokens import TokenCounter
 
 class LLMInstrumentor:
-    def __init__(self, price_book: PriceBook, emitter: JsonlEmitter, provider_default: str = "openai", region_default: str = "us"):
+    def __init__(
+        self,
+        price_book: PriceBook,
+        emitter: JsonlEmitter,
+        provider_default: str = "openai",
+        region_default: str = "us",
+        template_miner: Optional[TemplateMiner] = None,
+        token_counter: Optional[TokenCounter] = None,
+    ):
+        # template_miner: mine prompt_template_id (see gateway_sdk.templates) instead of hashing the prompt
+        # token_counter: count tokens locally when the caller passes none (token_source="estimated")
         self.price_book = price_book
+        self.token_counter = token_counter
+        self.template_miner = template_miner
         self.emitter = emitter
         self.provider_default = provider_default
         self.region_default = region_default
@@ -60,55 +73,35 @@ class LLMInstrumentor:
         finally:
             latency_ms = int((time.perf_counter() - t0) * 1000)
 
-            # tokens：優先用你傳入的；否則嘗試從 result 抽（不同 provider 格式不同，你之後再補）
-            pt = int(prompt_tokens or 0)
-            ct = int(completion_tokens or 0)
-            total = pt + ct
-
-            template_id = stable_template_id(prompt)
-
-            # 價格（可回溯）：用 timestamp resolve 出當時的版本
-            price = self.price_book.resolve(provider, model, region, ts)
-
-            if cache_hit:
-                unit_p = price.price_per_1k_prompt
-                unit_c = price.price_per_1k_completion
-                cost = 0.0
+            t = metrics.start()
+            if self.template_miner is not None:
+                template_id = self.template_miner.template_id_text(prompt)
             else:
-                unit_p = price.price_per_1k_prompt
-                unit_c = price.price_per_1k_completion
-                cost = compute_cost(pt, ct, unit_p, unit_c)
-
-            event = {
-                "timestamp": ts.strftime("%Y-%m-%d %H:%M:%S.%f")[:23],
-                "request_id": request_id,
-                "attempt": int(attempt),
+                template_id = stable_template_id(prompt)
+            metrics.STAGE_TEMPLATE_HASH.observe_since(t)
 
-                "tenant_id": tenant_id,
-                "user_id": user_id,
-                "feature": feature,
-                "endpoint": endpoint,
-                "prompt_template_id": template_id,
-
-                "provider": provider,
-                "model": model,
-                "region": region,
-
-                "prompt_tokens": pt,
-                "completion_tokens": ct,
-                "total_tokens": total,
-
-                "latency_ms": latency_ms,
-                "status": status_override or status,
-                "retry_count": int(retry_count),
-                "cache_hit": 1 if cache_hit else 0,
-
-                "price_version": price.price_version,
-                "unit_price_prompt": float(unit_p),
-                "unit_price_completion": float(unit_c),
-                "computed_cost": float(cost),
-
-                "prompt_chars": len(prompt),
-                "completion_chars": 0,
+            # tokens：優先用你傳入的；否則嘗試從 result 抽（不同 provider 格式不同，你之後再補）
+            # 價格（可回溯）：build_event 用 timestamp resolve 出當時的版本
+            ctx = {
+                "provider": provider, "model": model, "region": region, "ts": ts,
+                "request_id": request_id, "attempt": attempt, "retry_count": retry_count, "cache_hit": cache_hit,
+                "tenant_id": tenant_id, "user_id": user_id, "feature": feature, "endpoint": endpoint,
+                "template_id": template_id, "prompt_chars": len(prompt),
             }
-            self.emitter.emit(event)
\ No newline at end of file
+            text = (result.get("text", "") or "") if isinstance(result, dict) else ""
+            usage: Dict[str, Any] = {"prompt_tokens": int(prompt_tokens or 0), "completion_tokens": int(completion_tokens or 0)}
+            if self.token_counter is not None and prompt_tokens is None and completion_tokens is None and status == "ok":
+                t = metrics.start()
+                usage = {
+                    "prompt_tokens": self.token_counter.count_text(provider, model, prompt),
+                    "completion_tokens": self.token_counter.count_text(provider, model, text),
+                    "token_source": "estimated",
+                }
+                metrics.TOKENS_ESTIMATED_TOTAL.labels(provider, model).inc()
+                metrics.STAGE_COUNT_TOKENS.observe_since(t)
+            event = build_event(
+                self.price_book, ctx, usage, status_override or status, latency_ms, completion_chars=len(text),
+            )
+            t = metrics.start()
+            self.emitter.emit(event)
+            metrics.STAGE_EMIT.observe_since(t)
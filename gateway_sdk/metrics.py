@@ -0,0 +1,362 @@
+from __future__ import annotations
+import json
+import os
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# In-process metrics for the SDK hot path.
+#
+#   t = metrics.start()            # 0.0 when disabled
+#   ...work...
+#   STAGE.labels("template_hash").observe_since(t)
+#
+# Disabled (GATEWAY_SDK_METRICS=0 or metrics.disable()) this costs one attribute check per call site.
+
+_perf = time.perf_counter
+
+# 1-2.5-5 series from 1us to 100s; covers both SDK stages (us) and provider calls (s)
+DEFAULT_BUCKETS: Tuple[float, ...] = tuple(
+    m * 10.0 ** e for e in range(-6, 2) for m in (1.0, 2.5, 5.0)
+) + (100.0,)
+
+
+class Registry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = Lock()
+        self._metrics: Dict[str, "_Metric"] = {}
+        self._gauges: Dict[Tuple[str, Tuple[str, ...]], Tuple[str, Tuple[str, ...], Callable[[], float]]] = {}
+        self._gauge_help: Dict[str, str] = {}
+
+    def _register(self, metric: "_Metric") -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def histogram(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> "Histogram":
+        return self._register(Histogram(self, name, help, tuple(label_names), tuple(buckets)))
+
+    def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> "Counter":
+        return self._register(Counter(self, name, help, tuple(label_names)))
+
+    def gauge_fn(self, name: str, help: str, label_names: Sequence[str], label_values: Sequence[str], fn: Callable[[], float]) -> None:
+        """Register a callback gauge (read at snapshot/scrape time, zero hot-path cost)."""
+        with self._lock:
+            self._gauge_help[name] = help
+            self._gauges[(name, tuple(label_values))] = (name, tuple(label_names), fn)
+
+    def remove_gauge(self, name: str, label_values: Sequence[str]) -> None:
+        with self._lock:
+            self._gauges.pop((name, tuple(label_values)), None)
+
+    def reset(self) -> None:
+        for m in list(self._metrics.values()):
+            m.reset()
+
+    def snapshot(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"enabled": self.enabled}
+        for name, m in sorted(self._metrics.items()):
+            out[name] = m.snapshot()
+        for (name, values), (_, label_names, fn) in sorted(self._gauges.items()):
+            try:
+                v = float(fn())
+            except Exception:
+                continue
+            out.setdefault(name, []).append({"labels": dict(zip(label_names, values)), "value": v})
+        return out
+
+    def prometheus_text(self) -> str:
+        lines: List[str] = []
+        for name, m in sorted(self._metrics.items()):
+            lines.extend(m.prometheus_lines())
+        seen = set()
+        for (name, values), (_, label_names, fn) in sorted(self._gauges.items()):
+            try:
+                v = float(fn())
+            except Exception:
+                continue
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {self._gauge_help.get(name, '')}")
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_fmt_labels(label_names, values)} {_num(v)}")
+        return "\n".join(lines) + "\n"
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    # full precision: %g would turn a counter of 12345678 or a unix timestamp into 1.23457e+07
+    v = float(v)
+    return str(int(v)) if v.is_integer() else repr(v)
+
+
+def _escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: Registry, name: str, help: str, label_names: Tuple[str, ...]):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = Lock()
+
+    def labels(self, *values: str) -> Any:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        # zero in place: call sites keep references to their children
+        for child in list(self._children.values()):
+            child.reset()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [
+            {"labels": dict(zip(self.label_names, values)), **child.snapshot()}
+            for values, child in sorted(self._children.items())
+        ]
+
+    def prometheus_lines(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(child.prometheus_lines(self.name, self.label_names, values))
+        return lines
+
+
+class _HistogramChild:
+    __slots__ = ("_registry", "_bounds", "_counts", "_sum", "_count", "_lock")
+
+    def __init__(self, registry: Registry, bounds: Tuple[float, ...]):
+        self._registry = registry
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = Lock()
+
+    def observe(self, value: float) -> None:
+        if not self._registry.enabled:
+            return
+        i = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    def observe_since(self, t0: float) -> None:
+        if t0:
+            self.observe(_perf() - t0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * (len(self._bounds) + 1)
+            self._sum = 0.0
+            self._count = 0
+
+    def quantile(self, q: float) -> float:
+        # upper bound of the bucket holding the q-th observation
+        target = q * self._count
+        acc = 0
+        for i, c in enumerate(self._counts):
+            acc += c
+            if acc >= target and c:
+                return self._bounds[i] if i < len(self._bounds) else float("inf")
+        return 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self._count,
+            "sum": self._sum,
+            "mean": self._sum / self._count if self._count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+    def prometheus_lines(self, name: str, label_names: Sequence[str], values: Sequence[str]) -> List[str]:
+        lines = []
+        acc = 0
+        for bound, c in zip(self._bounds, self._counts):
+            acc += c
+            le = 'le="%g"' % bound
+            lines.append(f"{name}_bucket{_fmt_labels(label_names, values, le)} {acc}")
+        le = 'le="+Inf"'
+        lines.append(f"{name}_bucket{_fmt_labels(label_names, values, le)} {self._count}")
+        lines.append(f"{name}_sum{_fmt_labels(label_names, values)} {_num(self._sum)}")
+        lines.append(f"{name}_count{_fmt_labels(label_names, values)} {self._count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry: Registry, name: str, help: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        super().__init__(registry, name, help, label_names)
+        self.buckets = buckets
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.registry, self.buckets)
+
+
+class _CounterChild:
+    __slots__ = ("_registry", "_value", "_lock")
+
+    def __init__(self, registry: Registry):
+        self._registry = registry
+        self._value = 0.0
+        self._lock = Lock()
+
+    def inc(self, n: float = 1) -> None:
+        if not self._registry.enabled:
+            return
+        with self._lock:
+            self._value += n
+
+    def reset(self) -> None:
+        with self._lock:
+            self._value = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"value": self._value}
+
+    def prometheus_lines(self, name: str, label_names: Sequence[str], values: Sequence[str]) -> List[str]:
+        return [f"{name}{_fmt_labels(label_names, values)} {_num(self._value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild(self.registry)
+
+
+REGISTRY = Registry(enabled=os.getenv("GATEWAY_SDK_METRICS", "1") != "0")
+
+
+def start() -> float:
+    """Timestamp for observe_since(); 0.0 (= skip) when metrics are disabled."""
+    return _perf() if REGISTRY.enabled else 0.0
+
+
+def enable() -> None:
+    REGISTRY.enabled = True
+
+
+def disable() -> None:
+    REGISTRY.enabled = False
+
+
+def snapshot() -> Dict[str, Any]:
+    return REGISTRY.snapshot()
+
+
+def prometheus_text() -> str:
+    return REGISTRY.prometheus_text()
+
+
+# ---- SDK metrics (shared by gateway / instrument / pricing / emitter) ----
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "gateway_sdk_stage_seconds", "Time spent in SDK hot-path stages", ("stage",)
+)
+PROVIDER_SECONDS = REGISTRY.histogram(
+    "gateway_sdk_provider_call_seconds", "Provider call latency as seen by the SDK", ("provider", "model")
+)
+CALLS_TOTAL = REGISTRY.counter(
+    "gateway_sdk_calls_total", "LLM calls by outcome", ("provider", "model", "status")
+)
+PRICE_MISSES_TOTAL = REGISTRY.counter(
+    "gateway_sdk_price_misses_total", "PriceBook.resolve lookups without a matching price", ("provider", "model", "region")
+)
+PRICE_BOOK_RELOADS_TOTAL = REGISTRY.counter(
+    "gateway_sdk_price_book_reloads_total", "WatchedPriceBook reload attempts by result (ok / error / unchanged)", ("result",)
+)
+EXTRA_ATTEMPTS_TOTAL = REGISTRY.counter(
+    "gateway_sdk_extra_attempts_total", "Retries / hedges sent by the gateway and hedges that won (kind)", ("provider", "kind")
+)
+TOKENS_ESTIMATED_TOTAL = REGISTRY.counter(
+    "gateway_sdk_tokens_estimated_total", "Events whose token counts were estimated locally (no provider usage)", ("provider", "model")
+)
+BUDGET_ACTIONS_TOTAL = REGISTRY.counter(
+    "gateway_sdk_budget_actions_total", "Calls rejected / downgraded by a spend budget", ("budget", "action")
+)
+BUDGET_SEED_TOTAL = REGISTRY.counter(
+    "gateway_sdk_budget_seed_total", "Startup loads of budget spend from ClickHouse by result (ok / error)", ("result",)
+)
+
+STAGE_MESSAGES_TO_PROMPT = STAGE_SECONDS.labels("messages_to_prompt")
+STAGE_TEMPLATE_HASH = STAGE_SECONDS.labels("template_hash")
+STAGE_PRICE_RESOLVE = STAGE_SECONDS.labels("price_resolve")
+STAGE_BUILD_EVENT = STAGE_SECONDS.labels("build_event")
+STAGE_COUNT_TOKENS = STAGE_SECONDS.labels("count_tokens")
+STAGE_BUDGET_CHECK = STAGE_SECONDS.labels("budget_check")
+STAGE_EMIT = STAGE_SECONDS.labels("emit")
+STAGE_EMITTER_WRITE_BATCH = STAGE_SECONDS.labels("emitter_write_batch")
+STAGE_PRICE_BOOK_RELOAD = STAGE_SECONDS.labels("price_book_reload")  # background thread, not per call
+
+
+def record_call(provider: str, model: str, status: str, latency_s: float) -> None:
+    if REGISTRY.enabled:
+        PROVIDER_SECONDS.labels(provider, model).observe(latency_s)
+        CALLS_TOTAL.labels(provider, model, status).inc()
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.startswith("/metrics"):
+            body = REGISTRY.prometheus_text().encode("utf-8")
+            ctype = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.startswith("/snapshot"):
+            body = json.dumps(REGISTRY.snapshot()).encode("utf-8")
+            ctype = "application/json"
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+def serve(port: int = 9464, addr: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Start (once per process) a background HTTP server: /metrics (Prometheus text), /snapshot (JSON).
+    Loopback only by default (labels carry tenant / model names); addr="0.0.0.0" for a remote scraper.
+    """
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((addr, port), _Handler)
+        Thread(target=_server.serve_forever, name="gateway-sdk-metrics", daemon=True).start()
+    return _server
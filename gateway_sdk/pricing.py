@@ -1,10 +1,20 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from bisect import bisect_right
+from threading import Event, Thread
+import logging
+import math
+import os
+import time
 import yaml
 import hashlib
 
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
 @dataclass(frozen=True)
 class Price:
     provider: str
@@ -14,6 +24,15 @@ class Price:
     price_per_1k_prompt: float
     price_per_1k_completion: float
     price_version: str
+    # discounted tier for provider batch endpoints (e.g. OpenAI Batch API); None = not offered
+    batch_price_per_1k_prompt: Optional[float] = None
+    batch_price_per_1k_completion: Optional[float] = None
+
+    def unit_prices(self, tier: str = "standard") -> Tuple[float, float, str]:
+        """(per-1k prompt, per-1k completion, tier actually applied); batch falls back to standard."""
+        if tier == "batch" and self.batch_price_per_1k_prompt is not None and self.batch_price_per_1k_completion is not None:
+            return self.batch_price_per_1k_prompt, self.batch_price_per_1k_completion, "batch"
+        return self.price_per_1k_prompt, self.price_per_1k_completion, "standard"
 
 def _parse_dt(s: str) -> datetime:
     # expects ISO8601 with Z
@@ -21,39 +40,217 @@ def _parse_dt(s: str) -> datetime:
         s = s[:-1] + "+00:00"
     return datetime.fromisoformat(s).astimezone(timezone.utc)
 
+PriceKey = Tuple[str, str, str]  # (provider, model, region)
+
 class PriceBook:
     def __init__(self, prices: List[Price]):
         self.prices = prices
+        # (provider, model, region) -> (sorted effective_from, prices in the same order)
+        # sort is stable, so rows with the same effective_from keep file order and the last one wins
+        self._index: Dict[PriceKey, Tuple[List[datetime], List[Price]]] = {}
+        grouped: Dict[PriceKey, List[Price]] = {}
+        for p in prices:
+            grouped.setdefault((p.provider, p.model, p.region), []).append(p)
+        for key, rows in grouped.items():
+            rows.sort(key=lambda x: x.effective_from)
+            self._index[key] = ([r.effective_from for r in rows], rows)
 
     @staticmethod
     def load(path: str) -> "PriceBook":
-        raw = yaml.safe_load(open(path, "r", encoding="utf-8"))
+        with open(path, "r", encoding="utf-8") as f:
+            return PriceBook.parse(yaml.safe_load(f))
+
+    @staticmethod
+    def parse(raw: Any) -> "PriceBook":
+        """Build a PriceBook from the parsed YAML document; ValueError if anything is off."""
+        if not isinstance(raw, dict) or not isinstance(raw.get("prices"), list) or not raw["prices"]:
+            raise ValueError("price book needs a non-empty 'prices' list")
         version = str(raw.get("version", "unknown"))
         prices: List[Price] = []
-        for p in raw["prices"]:
-            prices.append(
-                Price(
-                    provider=p["provider"],
-                    model=p["model"],
-                    region=p.get("region", "global"),
-                    effective_from=_parse_dt(p["effective_from"]),
+        for i, p in enumerate(raw["prices"]):
+            try:
+                batch = [p.get(f) for f in ("batch_price_per_1k_prompt", "batch_price_per_1k_completion")]
+                if (batch[0] is None) != (batch[1] is None):
+                    raise ValueError("batch_price_per_1k_prompt and batch_price_per_1k_completion go together")
+                price = Price(
+                    provider=str(p["provider"]),
+                    model=str(p["model"]),
+                    region=str(p.get("region", "global")),
+                    effective_from=_parse_dt(str(p["effective_from"])),
                     price_per_1k_prompt=float(p["price_per_1k_prompt"]),
                     price_per_1k_completion=float(p["price_per_1k_completion"]),
                     price_version=version,
+                    batch_price_per_1k_prompt=None if batch[0] is None else float(batch[0]),
+                    batch_price_per_1k_completion=None if batch[1] is None else float(batch[1]),
                 )
-            )
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                raise ValueError(f"prices[{i}]: {e!r}") from e
+            for v in (price.price_per_1k_prompt, price.price_per_1k_completion,
+                      price.batch_price_per_1k_prompt, price.batch_price_per_1k_completion):
+                if v is None:
+                    continue
+                if not math.isfinite(v) or v < 0:
+                    raise ValueError(f"prices[{i}]: price must be a finite number >= 0, got {v}")
+            prices.append(price)
         return PriceBook(prices)
 
+    def keys(self) -> List[PriceKey]:
+        return list(self._index)
+
     def resolve(self, provider: str, model: str, region: str, ts: datetime) -> Price:
+        t = metrics.start()
         ts = ts.astimezone(timezone.utc)
-        candidates = [
-            p for p in self.prices
-            if p.provider == provider and p.model == model and p.region == region and p.effective_from <= ts
-        ]
-        if not candidates:
+        entry = self._index.get((provider, model, region))
+        # pick latest effective_from <= ts
+        i = bisect_right(entry[0], ts) if entry else 0
+        if i == 0:
+            metrics.PRICE_MISSES_TOTAL.labels(provider, model, region).inc()
             raise KeyError(f"No price for provider={provider}, model={model}, region={region}, ts={ts.isoformat()}")
-        # pick latest effective_from
-        return sorted(candidates, key=lambda x: x.effective_from)[-1]
+        metrics.STAGE_PRICE_RESOLVE.observe_since(t)
+        return entry[1][i - 1]
+
+    def resolve_many(self, items: Iterable[Tuple[str, str, str, datetime]]) -> List[Price]:
+        """
+        Bulk resolve for re-pricing: items are (provider, model, region, ts).
+        Same semantics as resolve(); raises KeyError on the first row without a price.
+        """
+        index = self._index
+        out: List[Price] = []
+        for provider, model, region, ts in items:
+            ts = ts.astimezone(timezone.utc)
+            entry = index.get((provider, model, region))
+            i = bisect_right(entry[0], ts) if entry else 0
+            if i == 0:
+                raise KeyError(f"No price for provider={provider}, model={model}, region={region}, ts={ts.isoformat()}")
+            out.append(entry[1][i - 1])
+        return out
+
+class WatchedPriceBook:
+    """
+    PriceBook that follows its YAML file. A background thread polls the file's
+    (mtime, size, inode) every poll_s; on a change it parses and validates the new file
+    and swaps in a new PriceBook with one reference assignment. PriceBook is never
+    mutated after construction, so resolve() only reads self._book and takes no lock.
+
+    A file that fails to parse / validate (or drops a (provider, model, region) key that
+    the current book prices, e.g. a half-written save) is rejected and the current book
+    stays; the file is retried when it changes again.
+    """
+
+    def __init__(self, path: str, poll_s: float = 5.0, allow_removed_keys: bool = False):
+        self.path = path
+        self.poll_s = poll_s
+        self.allow_removed_keys = allow_removed_keys
+        self._book = PriceBook.load(path)  # a bad file at startup still fails loudly
+        self._stat = self._file_stat()
+        self._digest = self._file_digest()
+        self.loaded_at = time.time()
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error: Optional[str] = None
+
+        metrics.REGISTRY.gauge_fn("gateway_sdk_price_book_loaded_timestamp", "Unix time the active price book was loaded",
+                                  ("path",), (path,), lambda: self.loaded_at)
+        metrics.REGISTRY.gauge_fn("gateway_sdk_price_book_rows", "Rows in the active price book",
+                                  ("path",), (path,), lambda: len(self._book.prices))
+
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+        if poll_s > 0:
+            self._thread = Thread(target=self._run, name="price-book-watch", daemon=True)
+            self._thread.start()
+
+    def _file_stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _file_digest(self) -> str:
+        with open(self.path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_s):
+            st = self._file_stat()
+            if st is not None and st != self._stat:
+                self._stat = st
+                self.reload()
+
+    def reload(self) -> bool:
+        """Re-read the file now. Returns True if a new book was swapped in."""
+        t = metrics.start()
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            if digest == self._digest:
+                metrics.PRICE_BOOK_RELOADS_TOTAL.labels("unchanged").inc()
+                return False
+            book = PriceBook.parse(yaml.safe_load(data.decode("utf-8")))
+            if not self.allow_removed_keys:
+                removed = set(self._book._index) - set(book._index)
+                if removed:
+                    raise ValueError(f"new price book drops priced keys: {sorted(removed)[:5]}")
+        except Exception as e:
+            self.reload_errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            metrics.PRICE_BOOK_RELOADS_TOTAL.labels("error").inc()
+            logger.warning("price book reload rejected (%s), keeping version %s: %s", self.path, self.version, self.last_error)
+            return False
+        self._book = book  # the swap
+        self._digest = digest
+        self.loaded_at = time.time()
+        self.reloads += 1
+        self.last_error = None
+        metrics.PRICE_BOOK_RELOADS_TOTAL.labels("ok").inc()
+        metrics.STAGE_PRICE_BOOK_RELOAD.observe_since(t)
+        return True
+
+    @property
+    def book(self) -> PriceBook:
+        return self._book
+
+    @property
+    def prices(self) -> List[Price]:
+        return self._book.prices
+
+    @property
+    def _index(self) -> Dict[PriceKey, Tuple[List[datetime], List[Price]]]:
+        # PriceArrays / clickhouse_mutations read the index directly
+        return self._book._index
+
+    @property
+    def version(self) -> str:
+        prices = self._book.prices
+        return prices[0].price_version if prices else "unknown"
+
+    def keys(self) -> List[PriceKey]:
+        return self._book.keys()
+
+    def resolve(self, provider: str, model: str, region: str, ts: datetime) -> Price:
+        return self._book.resolve(provider, model, region, ts)
+
+    def resolve_many(self, items: Iterable[Tuple[str, str, str, datetime]]) -> List[Price]:
+        return self._book.resolve_many(items)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for name in ("gateway_sdk_price_book_loaded_timestamp", "gateway_sdk_price_book_rows"):
+            metrics.REGISTRY.remove_gauge(name, (self.path,))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "rows": len(self._book.prices),
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error,
+        }
 
 def stable_template_id(prompt: str) -> str:
     # 不存原文，存 hash 當 template_id（你也可以改成你自己的 template key）
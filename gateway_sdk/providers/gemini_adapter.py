@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 
 from google import genai
 
@@ -41,7 +41,55 @@ class GeminiAdapter:
             contents=prompt_text,
             **kwargs,
         )
+        return self._normalize(resp)
 
+    async def achat(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Dict[str, Any]:
+        prompt_text = self._messages_to_text(messages)
+
+        # same client, async surface: client.aio.models.generate_content(...)
+        resp = await self.client.aio.models.generate_content(
+            model=model,
+            contents=prompt_text,
+            **kwargs,
+        )
+        return self._normalize(resp)
+
+    def stream(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Same chunk shape as OpenAIAdapter.stream(): {"text": delta} ..., then one usage chunk.
+        Gemini repeats (cumulative) usage_metadata on chunks; we report the last one.
+        """
+        usage: Optional[Dict[str, Any]] = None
+        for chunk in self.client.models.generate_content_stream(
+            model=model,
+            contents=self._messages_to_text(messages),
+            **kwargs,
+        ):
+            n = self._normalize(chunk)
+            if n["text"]:
+                yield {"text": n["text"]}
+            if n["total_tokens"]:
+                usage = n
+        if usage:
+            yield {"text": "", "prompt_tokens": usage["prompt_tokens"], "completion_tokens": usage["completion_tokens"], "total_tokens": usage["total_tokens"]}
+
+    async def astream(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+        usage: Optional[Dict[str, Any]] = None
+        async for chunk in await self.client.aio.models.generate_content_stream(
+            model=model,
+            contents=self._messages_to_text(messages),
+            **kwargs,
+        ):
+            n = self._normalize(chunk)
+            if n["text"]:
+                yield {"text": n["text"]}
+            if n["total_tokens"]:
+                usage = n
+        if usage:
+            yield {"text": "", "prompt_tokens": usage["prompt_tokens"], "completion_tokens": usage["completion_tokens"], "total_tokens": usage["total_tokens"]}
+
+    @staticmethod
+    def _normalize(resp: Any) -> Dict[str, Any]:
         # Extract text (SDK response shape can evolve; keep it defensive)
         text = ""
         if hasattr(resp, "text") and resp.text:
@@ -72,4 +120,4 @@ class GeminiAdapter:
             "completion_tokens": ct,
             "total_tokens": tt,
             "raw": resp,
-        }
\ No newline at end of file
+        }
@@ -1,15 +1,21 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import time
+import weakref
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 
 @dataclass(frozen=True)
 class OpenAIAdapterConfig:
     api_key: str
     base_url: Optional[str] = None  # None -> official endpoint
+    # None = SDK default (2 hidden retries); 0 when the gateway retries itself (RetryPolicy)
+    max_retries: Optional[int] = None
 
 
 class OpenAIAdapter:
@@ -18,25 +24,50 @@ class OpenAIAdapter:
     Uses the official openai-python SDK. :contentReference[oaicite:2]{index=2}
     """
 
-    def __init__(self, cfg: OpenAIAdapterConfig):
+    def __init__(
+        self,
+        cfg: OpenAIAdapterConfig,
+        *,
+        http_client: Optional[Any] = None,
+        async_http_client_factory: Optional[Callable[[], Any]] = None,
+    ):
+        """
+        http_client / async_http_client_factory: optional shared httpx clients
+        (e.g. one tuned connection pool for several base_urls, see VLLMAdapter).
+        """
         self.cfg = cfg
+        extra: Dict[str, Any] = {"http_client": http_client} if http_client is not None else {}
+        if cfg.max_retries is not None:
+            extra["max_retries"] = cfg.max_retries
         if cfg.base_url:
-            self.client = OpenAI(api_key=cfg.api_key, base_url=cfg.base_url)
+            self.client = OpenAI(api_key=cfg.api_key, base_url=cfg.base_url, **extra)
         else:
-            self.client = OpenAI(api_key=cfg.api_key)
+            self.client = OpenAI(api_key=cfg.api_key, **extra)
+        self._async_http_client_factory = async_http_client_factory
+        self._aclients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
 
-    def chat(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Dict[str, Any]:
-        """
-        Returns normalized result:
-        {
-          "text": str,
-          "prompt_tokens": int,
-          "completion_tokens": int,
-          "total_tokens": int,
-          "raw": Any
-        }
-        """
-        resp = self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+    @property
+    def aclient(self) -> AsyncOpenAI:
+        # Lazy: sync-only users never build an httpx.AsyncClient.
+        # One per running event loop: its connection pool can't be used from another loop
+        # (a second asyncio.run(), achat from several threads' loops)
+        loop = asyncio.get_running_loop()
+        client = self._aclients.get(loop)
+        if client is None:
+            extra: Dict[str, Any] = {}
+            if self.cfg.max_retries is not None:
+                extra["max_retries"] = self.cfg.max_retries
+            if self._async_http_client_factory is not None:
+                extra["http_client"] = self._async_http_client_factory()
+            if self.cfg.base_url:
+                client = AsyncOpenAI(api_key=self.cfg.api_key, base_url=self.cfg.base_url, **extra)
+            else:
+                client = AsyncOpenAI(api_key=self.cfg.api_key, **extra)
+            self._aclients[loop] = client
+        return client
+
+    @staticmethod
+    def _normalize(resp: Any) -> Dict[str, Any]:
         text = (resp.choices[0].message.content or "") if resp.choices else ""
 
         # usage fields are commonly present on chat completion responses. :contentReference[oaicite:3]{index=3}
@@ -51,4 +82,123 @@ class OpenAIAdapter:
             "completion_tokens": ct,
             "total_tokens": tt,
             "raw": resp,
-        }
\ No newline at end of file
+        }
+
+    def chat(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Dict[str, Any]:
+        """
+        Returns normalized result:
+        {
+          "text": str,
+          "prompt_tokens": int,
+          "completion_tokens": int,
+          "total_tokens": int,
+          "raw": Any
+        }
+        """
+        resp = self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+        return self._normalize(resp)
+
+    async def achat(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Dict[str, Any]:
+        """Async version of chat() on AsyncOpenAI; same normalized result."""
+        resp = await self.aclient.chat.completions.create(model=model, messages=messages, **kwargs)
+        return self._normalize(resp)
+
+    @staticmethod
+    def _normalize_body(body: Dict[str, Any]) -> Dict[str, Any]:
+        # same shape as _normalize(), from a chat.completion JSON body (Batch API output lines)
+        choices = body.get("choices") or []
+        text = ((choices[0].get("message") or {}).get("content") or "") if choices else ""
+        usage = body.get("usage") or {}
+        pt = int(usage.get("prompt_tokens", 0) or 0)
+        ct = int(usage.get("completion_tokens", 0) or 0)
+        tt = int(usage.get("total_tokens", 0) or (pt + ct))
+        return {"text": text, "prompt_tokens": pt, "completion_tokens": ct, "total_tokens": tt, "raw": body}
+
+    def batch_chat(
+        self,
+        *,
+        model: str,
+        requests: Sequence[Tuple[List[Dict[str, str]], Dict[str, Any]]],
+        poll_s: float = 30.0,
+        timeout_s: float = 24 * 3600.0,
+    ) -> List[Any]:
+        """
+        Batch API (discounted, completes within 24h): upload one JSONL of chat.completions
+        bodies, poll until the batch ends, read the output / error files.
+        requests: (messages, extra create() kwargs) per item.
+        Returns normalized results in request order; failed items are exceptions.
+        """
+        lines = [
+            json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {"model": model, "messages": messages, **kwargs},
+            }, ensure_ascii=False)
+            for i, (messages, kwargs) in enumerate(requests)
+        ]
+        upload = self.client.files.create(file=("batch.jsonl", ("\n".join(lines) + "\n").encode("utf-8")), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=upload.id, endpoint="/v1/chat/completions", completion_window="24h",
+        )
+        deadline = time.monotonic() + timeout_s
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            if time.monotonic() >= deadline:
+                self.client.batches.cancel(batch.id)
+                raise TimeoutError(f"batch {batch.id} still {batch.status} after {timeout_s}s (cancelled)")
+            time.sleep(poll_s)
+            batch = self.client.batches.retrieve(batch.id)
+
+        # expired / cancelled batches still return whatever finished
+        out: List[Any] = [RuntimeError(f"batch {batch.id} {batch.status}: no result for this item")] * len(requests)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                i = int(row["custom_id"])
+                resp = row.get("response") or {}
+                if resp.get("status_code") == 200:
+                    out[i] = self._normalize_body(resp.get("body") or {})
+                else:
+                    err = row.get("error") or (resp.get("body") or {}).get("error") or {}
+                    msg = err.get("message", err) if isinstance(err, dict) else err
+                    out[i] = RuntimeError(f"batch item failed ({resp.get('status_code')}): {msg}")
+        return out
+
+    @staticmethod
+    def _normalize_chunk(chunk: Any) -> Optional[Dict[str, Any]]:
+        # usage only arrives on the last chunk (choices == []) when include_usage is set
+        usage = getattr(chunk, "usage", None)
+        if usage:
+            pt = int(getattr(usage, "prompt_tokens", 0) or 0)
+            ct = int(getattr(usage, "completion_tokens", 0) or 0)
+            tt = int(getattr(usage, "total_tokens", 0) or (pt + ct))
+            return {"text": "", "prompt_tokens": pt, "completion_tokens": ct, "total_tokens": tt}
+        if chunk.choices:
+            delta = chunk.choices[0].delta
+            text = getattr(delta, "content", None) or ""
+            if text:
+                return {"text": text}
+        return None
+
+    def stream(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Yields {"text": delta} as tokens arrive, then one usage chunk
+        {"text": "", "prompt_tokens", "completion_tokens", "total_tokens"} if the server reports it.
+        """
+        kwargs.setdefault("stream_options", {"include_usage": True})
+        for chunk in self.client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs):
+            out = self._normalize_chunk(chunk)
+            if out:
+                yield out
+
+    async def astream(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+        kwargs.setdefault("stream_options", {"include_usage": True})
+        resp = await self.aclient.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+        async for chunk in resp:
+            out = self._normalize_chunk(chunk)
+            if out:
+                yield out
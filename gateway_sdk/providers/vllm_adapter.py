@@ -1,26 +1,218 @@
 from __future__ import annotations
 
+import asyncio
+import time
+import weakref
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from threading import Lock
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
+import httpx
+import openai
+
+from .. import metrics
 from .openai_adapter import OpenAIAdapter, OpenAIAdapterConfig
 
 
 @dataclass(frozen=True)
 class VLLMAdapterConfig:
-    base_url: str               # e.g. http://localhost:8000/v1
+    base_url: str = ""          # e.g. http://localhost:8000/v1
     api_key: str = "EMPTY"      # vLLM can be started with an api-key; many setups use a dummy token. :contentReference[oaicite:5]{index=5}
+    # several replicas of the same model; overrides base_url
+    base_urls: Tuple[str, ...] = ()
+    # a replica is ejected for eject_s after this many consecutive failures (connection error / 5xx);
+    # once eject_s is over it gets traffic again and a single further failure ejects it again
+    eject_after_failures: int = 3
+    eject_s: float = 30.0
+    # one httpx connection pool shared by every replica's client (limits are per host inside it);
+    # async calls get one such pool per event loop
+    max_connections: int = 1000
+    max_keepalive_connections: int = 200
+    keepalive_expiry_s: float = 30.0
+    max_retries: Optional[int] = None  # see OpenAIAdapterConfig
+
+
+class _Replica:
+    __slots__ = ("url", "adapter", "outstanding", "failures", "ejected_until", "requests", "errors", "ejections")
+
+    def __init__(self, url: str, adapter: OpenAIAdapter):
+        self.url = url
+        self.adapter = adapter
+        self.outstanding = 0
+        self.failures = 0  # consecutive
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+
+
+def _is_replica_failure(exc: BaseException) -> bool:
+    # 4xx (bad request, context too long, ...) is the caller's problem, not the replica's
+    if isinstance(exc, openai.APIConnectionError):  # includes APITimeoutError
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+def _tag(exc: BaseException, url: str) -> None:
+    # lets the gateway put the replica on error events too
+    try:
+        exc.replica = url  # type: ignore[attr-defined]
+    except Exception:
+        pass
 
 
 class VLLMAdapter:
     """
     vLLM OpenAI-compatible server adapter. :contentReference[oaicite:6]{index=6}
-    Internally reuses OpenAIAdapter with base_url.
+    Internally reuses OpenAIAdapter with base_url, one per replica.
+
+    With several base_urls every call goes to the healthy replica with the fewest
+    in-flight requests (ties rotate); results / stream chunks carry "replica".
     """
 
     def __init__(self, cfg: VLLMAdapterConfig):
         self.cfg = cfg
-        self._openai = OpenAIAdapter(OpenAIAdapterConfig(api_key=cfg.api_key, base_url=cfg.base_url))
+        urls = list(cfg.base_urls) or ([cfg.base_url] if cfg.base_url else [])
+        if not urls:
+            raise ValueError("VLLMAdapterConfig needs base_url or base_urls")
+
+        limits = httpx.Limits(
+            max_connections=cfg.max_connections,
+            max_keepalive_connections=cfg.max_keepalive_connections,
+            keepalive_expiry=cfg.keepalive_expiry_s,
+        )
+        self._limits = limits
+        self._lock = Lock()
+        self._http = openai.DefaultHttpxClient(limits=limits)
+        # an httpx.AsyncClient is bound to the loop it first ran on: one per loop, dropped with it
+        self._ahttp: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+        self._replicas = [
+            _Replica(url, OpenAIAdapter(
+                OpenAIAdapterConfig(api_key=cfg.api_key, base_url=url, max_retries=cfg.max_retries),
+                http_client=self._http,
+                async_http_client_factory=self._async_http,
+            ))
+            for url in urls
+        ]
+        self._rr = 0
+
+        for r in self._replicas:
+            metrics.REGISTRY.gauge_fn("gateway_sdk_vllm_outstanding", "In-flight requests per vLLM replica",
+                                      ("replica",), (r.url,), lambda r=r: r.outstanding)
+            metrics.REGISTRY.gauge_fn("gateway_sdk_vllm_ejected", "1 while a vLLM replica is ejected",
+                                      ("replica",), (r.url,), lambda r=r: float(r.ejected_until > time.monotonic()))
+
+    def _async_http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._ahttp.get(loop)
+            if client is None:
+                client = self._ahttp[loop] = openai.DefaultAsyncHttpxClient(limits=self._limits)
+        return client
+
+    def _acquire(self) -> _Replica:
+        now = time.monotonic()
+        with self._lock:
+            replicas = self._replicas
+            n = len(replicas)
+            start = self._rr
+            self._rr = (start + 1) % n
+            best: Optional[_Replica] = None
+            for i in range(n):
+                r = replicas[(start + i) % n]
+                if r.ejected_until > now:
+                    continue
+                if best is None or r.outstanding < best.outstanding:
+                    best = r
+            if best is None:
+                # everything ejected: fail open to the replica that comes back first
+                best = min(replicas, key=lambda r: r.ejected_until)
+            best.outstanding += 1
+            best.requests += 1
+            return best
+
+    def _release(self, r: _Replica, exc: Optional[BaseException] = None) -> None:
+        with self._lock:
+            r.outstanding -= 1
+            if exc is None:
+                r.failures = 0
+                return
+            r.errors += 1
+            if _is_replica_failure(exc):
+                r.failures += 1
+                if r.failures >= self.cfg.eject_after_failures:
+                    r.ejected_until = time.monotonic() + self.cfg.eject_s
+                    r.ejections += 1
 
     def chat(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Dict[str, Any]:
-        return self._openai.chat(model=model, messages=messages, **kwargs)
\ No newline at end of file
+        r = self._acquire()
+        err: Optional[BaseException] = None
+        try:
+            out = r.adapter.chat(model=model, messages=messages, **kwargs)
+            out["replica"] = r.url
+            return out
+        except Exception as e:
+            err = e
+            _tag(e, r.url)
+            raise
+        finally:
+            self._release(r, err)
+
+    async def achat(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Dict[str, Any]:
+        r = self._acquire()
+        err: Optional[BaseException] = None
+        try:
+            out = await r.adapter.achat(model=model, messages=messages, **kwargs)
+            out["replica"] = r.url
+            return out
+        except Exception as e:
+            err = e
+            _tag(e, r.url)
+            raise
+        finally:
+            self._release(r, err)
+
+    def stream(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Iterator[Dict[str, Any]]:
+        # vLLM's OpenAI server honours stream_options.include_usage as well
+        r = self._acquire()
+        err: Optional[BaseException] = None
+        try:
+            for chunk in r.adapter.stream(model=model, messages=messages, **kwargs):
+                chunk["replica"] = r.url
+                yield chunk
+        except Exception as e:
+            err = e
+            _tag(e, r.url)
+            raise
+        finally:
+            self._release(r, err)
+
+    async def astream(self, *, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+        r = self._acquire()
+        err: Optional[BaseException] = None
+        try:
+            async for chunk in r.adapter.astream(model=model, messages=messages, **kwargs):
+                chunk["replica"] = r.url
+                yield chunk
+        except Exception as e:
+            err = e
+            _tag(e, r.url)
+            raise
+        finally:
+            self._release(r, err)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "replica": r.url,
+                    "outstanding": r.outstanding,
+                    "requests": r.requests,
+                    "errors": r.errors,
+                    "ejections": r.ejections,
+                    "ejected": r.ejected_until > now,
+                }
+                for r in self._replicas
+            ]
@@ -0,0 +1,171 @@
+from __future__ import annotations
+import json
+import os
+import re
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from .cache import MemoryCache
+
+# Dashboard report queries over the rollup tables of ingest/04_create_rollup_views.sql.
+# Values are bound server-side with ClickHouse query parameters ({name:Type} + param_<name>),
+# never formatted into the SQL; only the database name (validated) and the group_by column
+# (whitelisted) are substituted. Results are kept in a TTL cache (same MemoryCache as the
+# response cache) and concurrent loads of the same report share one query.
+
+DAILY = "llm_usage_daily"
+HOURLY = "llm_usage_hourly"
+
+# columns a report may be grouped by (identifiers can't be query parameters)
+GROUP_COLUMNS = ("tenant_id", "feature", "model", "provider", "status")
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+# optional tenant / feature filters: '' = all
+_FILTERS = "({tenant_id:String} = '' OR tenant_id = {tenant_id:String}) AND ({feature:String} = '' OR feature = {feature:String})"
+
+REPORTS: Dict[str, str] = {
+    # 1️⃣ daily cost, gap-free
+    "daily_cost": f"""
+        SELECT day, sum(computed_cost) AS cost, sum(total_tokens) AS tokens, sum(calls) AS calls
+        FROM __DB__.{DAILY}
+        WHERE day >= today() - {{days:UInt32}} + 1 AND {_FILTERS}
+        GROUP BY day
+        ORDER BY day
+        WITH FILL FROM today() - {{days:UInt32}} + 1 TO today() + 1 STEP 1
+    """,
+    # 2️⃣ / 3️⃣ top N by cost for one dimension
+    "top_by_cost": f"""
+        SELECT __GROUP_BY__ AS key,
+               sum(computed_cost) AS cost,
+               sum(total_tokens) AS tokens,
+               sum(prompt_tokens) AS prompt_tokens,
+               sum(completion_tokens) AS completion_tokens,
+               sum(calls) AS calls,
+               sum(retries) AS retries,
+               sum(cache_hits) AS cache_hits,
+               sum(latency_ms_sum) / greatest(sum(calls), 1) AS avg_latency_ms
+        FROM __DB__.{DAILY}
+        WHERE day >= today() - {{days:UInt32}} + 1 AND {_FILTERS}
+        GROUP BY key
+        ORDER BY cost DESC
+        LIMIT {{limit:UInt32}}
+    """,
+    # 4️⃣ hourly prompt vs completion tokens, gap-free
+    "token_trend": f"""
+        SELECT hour, sum(prompt_tokens) AS prompt_tokens, sum(completion_tokens) AS completion_tokens,
+               sum(computed_cost) AS cost
+        FROM __DB__.{HOURLY}
+        WHERE hour >= toStartOfHour(now()) - toIntervalHour({{hours:UInt32}}) AND {_FILTERS}
+        GROUP BY hour
+        ORDER BY hour
+        WITH FILL FROM toStartOfHour(now()) - toIntervalHour({{hours:UInt32}}) TO toStartOfHour(now()) + 1 STEP 3600
+    """,
+    # latency / TTFT percentiles merged from the t-digest states
+    "latency_percentiles": f"""
+        SELECT __GROUP_BY__ AS key,
+               sum(calls) AS calls,
+               quantilesTDigestMerge{QUANTILES}(latency_q) AS latency_ms_q,
+               quantilesTDigestMerge{QUANTILES}(ttft_q) AS ttft_ms_q
+        FROM __DB__.{DAILY}
+        WHERE day >= today() - {{days:UInt32}} + 1 AND {_FILTERS}
+        GROUP BY key
+        ORDER BY calls DESC
+        LIMIT {{limit:UInt32}}
+    """,
+}
+
+_DEFAULTS: Dict[str, Any] = {"days": 7, "hours": 72, "limit": 10, "group_by": "tenant_id", "tenant_id": "", "feature": ""}
+_IDENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class ReportClient:
+    """
+    Parameterized dashboard reports with a TTL result cache.
+
+        rc = ReportClient()
+        rc.report("daily_cost", days=30, feature="search_rerank")
+        rc.report("top_by_cost", group_by="model", days=7, limit=5)
+        rc.report("latency_percentiles", group_by="feature")   # key, calls, latency_ms_q [p50, p90, p95, p99], ttft_ms_q
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        database: Optional[str] = None,
+        *,
+        cache_ttl_s: float = 60.0,
+        cache_max_entries: int = 1024,
+        timeout_s: float = 30.0,
+        session: Optional[requests.Session] = None,
+    ):
+        self.url = url or os.getenv("CLICKHOUSE_URL", "http://localhost:8123")
+        self.database = database or os.getenv("CLICKHOUSE_DB", "analytics")
+        if not _IDENT.match(self.database):
+            raise ValueError(f"Invalid database name: {self.database!r}")
+        self.timeout_s = timeout_s
+        self.session = session or requests.Session()
+        user = user or os.getenv("CLICKHOUSE_USER")
+        password = password or os.getenv("CLICKHOUSE_PASSWORD")
+        if user and password:
+            self.session.auth = (user, password)
+        self.cache = MemoryCache(cache_max_entries, cache_ttl_s)
+        self._inflight_lock = Lock()
+        self._inflight: Dict[Tuple[Any, ...], Lock] = {}
+        self.queries = 0
+
+    def query(self, sql: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Run one SELECT (no cache); params fill {name:Type} placeholders."""
+        http_params = {f"param_{k}": _param_value(v) for k, v in params.items()}
+        http_params["default_format"] = "JSON"
+        http_params["output_format_json_quote_64bit_integers"] = "0"
+        r = self.session.post(self.url, params=http_params, data=sql.encode("utf-8"), timeout=self.timeout_s)
+        if r.status_code != 200:
+            raise RuntimeError(f"ClickHouse query failed ({r.status_code}): {r.text[:500]}")
+        self.queries += 1
+        return r.json()["data"]
+
+    def report(self, name: str, *, ttl_s: Optional[float] = None, **params: Any) -> List[Dict[str, Any]]:
+        if name not in REPORTS:
+            raise ValueError(f"Unknown report: {name} (expected one of {sorted(REPORTS)})")
+        unknown = set(params) - set(_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown report parameters: {sorted(unknown)}")
+        p = {**_DEFAULTS, **params}
+        group_by = p.pop("group_by")
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(f"group_by must be one of {GROUP_COLUMNS}")
+        sql = REPORTS[name].replace("__DB__", self.database).replace("__GROUP_BY__", group_by)
+        key = (self.database, name, group_by) + tuple(sorted((k, str(v)) for k, v in p.items()))
+        ckey = json.dumps(key)
+
+        hit = self.cache.get(ckey)
+        if hit is not None:
+            return hit["rows"]
+        # single flight: a dashboard opening N panels / N viewers at once -> one query per report
+        with self._inflight_lock:
+            lock = self._inflight.setdefault(key, Lock())
+        with lock:
+            hit = self.cache.get(ckey)
+            if hit is not None:
+                return hit["rows"]
+            try:
+                rows = self.query(sql, p)
+                self.cache.set(ckey, {"rows": rows, "at": time.time()}, ttl_s=ttl_s)
+            finally:
+                with self._inflight_lock:
+                    self._inflight.pop(key, None)
+            return rows
+
+    def stats(self) -> Dict[str, Any]:
+        return {"queries": self.queries, **self.cache.stats()}
+
+
+def _param_value(v: Any) -> str:
+    if isinstance(v, bool):
+        return "1" if v else "0"
+    return str(v)
@@ -0,0 +1,365 @@
+from __future__ import annotations
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+
+from .pricing import PriceBook, PriceKey
+
+logger = logging.getLogger(__name__)
+
+# effective_from / event timestamps are packed as (key_id << _KEY_SHIFT) | epoch_ms so that
+# one searchsorted over a single sorted int64 array resolves every (key, ts) pair at once.
+# 2**42 ms ~ year 2109; leaves 21 bits (2M) for distinct (provider, model, region) keys.
+_KEY_SHIFT = 42
+
+
+@dataclass
+class RepriceStats:
+    rows: int = 0
+    changed: int = 0
+    unpriced: int = 0
+    cost_before: float = 0.0
+    cost_after: float = 0.0
+    seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "changed": self.changed,
+            "unpriced": self.unpriced,
+            "cost_before": self.cost_before,
+            "cost_after": self.cost_after,
+            "cost_delta": self.cost_after - self.cost_before,
+            "seconds": round(self.seconds, 3),
+            "rows_per_s": round(self.rows / self.seconds, 1) if self.seconds > 0 else 0.0,
+        }
+
+
+class PriceArrays:
+    """
+    Columnar view of a PriceBook for bulk resolution with NumPy.
+    Same semantics as PriceBook.resolve: latest effective_from <= ts for the exact key.
+    """
+
+    def __init__(self, price_book: PriceBook):
+        self.key_ids: Dict[PriceKey, int] = {}
+        packed: List[int] = []
+        unit_p: List[float] = []
+        unit_c: List[float] = []
+        batch_p: List[float] = []
+        batch_c: List[float] = []
+        versions: List[str] = []
+        for key, (effs, rows) in price_book._index.items():
+            kid = len(self.key_ids)
+            self.key_ids[key] = kid
+            for eff, p in zip(effs, rows):
+                packed.append((kid << _KEY_SHIFT) | int(eff.timestamp() * 1000))
+                unit_p.append(p.price_per_1k_prompt)
+                unit_c.append(p.price_per_1k_completion)
+                # NaN = no batch tier on this row (batch events keep the standard price)
+                batch_p.append(p.batch_price_per_1k_prompt if p.batch_price_per_1k_prompt is not None else np.nan)
+                batch_c.append(p.batch_price_per_1k_completion if p.batch_price_per_1k_completion is not None else np.nan)
+                versions.append(p.price_version)
+        if len(self.key_ids) >= 1 << (63 - _KEY_SHIFT):
+            raise ValueError(f"too many price keys for packed index: {len(self.key_ids)}")
+        # _index rows are already sorted per key and keys get increasing ids -> packed is sorted;
+        # equal effective_from keeps file order, and side="right" picks the last one like resolve()
+        self.packed = np.asarray(packed, dtype=np.int64)
+        self.unit_p = np.asarray(unit_p, dtype=np.float64)
+        self.unit_c = np.asarray(unit_c, dtype=np.float64)
+        self.batch_p = np.asarray(batch_p, dtype=np.float64)
+        self.batch_c = np.asarray(batch_c, dtype=np.float64)
+        self.versions = np.asarray(versions, dtype=object)
+
+    def key_id(self, provider: str, model: str, region: str) -> int:
+        return self.key_ids.get((provider, model, region), -1)
+
+    def resolve(self, key_ids: np.ndarray, ts_ms: np.ndarray) -> np.ndarray:
+        """
+        Vectorized resolve: returns an index into unit_p / unit_c / versions per row,
+        or -1 where there is no price (unknown key or ts before the first effective_from).
+        """
+        key_ids = np.asarray(key_ids, dtype=np.int64)
+        ts_ms = np.asarray(ts_ms, dtype=np.int64)
+        known = key_ids >= 0
+        q = (np.where(known, key_ids, 0) << _KEY_SHIFT) | ts_ms
+        idx = np.searchsorted(self.packed, q, side="right") - 1
+        # the hit must belong to the same key (not the tail of the previous key)
+        ok = known & (idx >= 0)
+        ok &= (self.packed[np.clip(idx, 0, None)] >> _KEY_SHIFT) == key_ids
+        return np.where(ok, idx, -1)
+
+    def reprice(
+        self,
+        key_ids: np.ndarray,
+        ts_ms: np.ndarray,
+        prompt_tokens: np.ndarray,
+        completion_tokens: np.ndarray,
+        cache_hit: np.ndarray,
+        batch: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns (idx, unit_price_prompt, unit_price_completion, computed_cost, price_version);
+        rows with idx == -1 have no price and should be left untouched.
+        batch: rows with price_tier == "batch" (priced at the batch tier where the row has one).
+        """
+        idx = self.resolve(key_ids, ts_ms)
+        safe = np.clip(idx, 0, None)
+        up = self.unit_p[safe]
+        uc = self.unit_c[safe]
+        if batch is not None:
+            bp, bc = self.batch_p[safe], self.batch_c[safe]
+            use = np.asarray(batch, dtype=bool) & ~np.isnan(bp)
+            up = np.where(use, bp, up)
+            uc = np.where(use, bc, uc)
+        # same formula as event.compute_cost; cache hits cost 0
+        cost = (np.asarray(prompt_tokens, dtype=np.float64) / 1000.0) * up \
+            + (np.asarray(completion_tokens, dtype=np.float64) / 1000.0) * uc
+        cost = np.where(np.asarray(cache_hit, dtype=bool), 0.0, cost)
+        return idx, up, uc, cost, self.versions[safe]
+
+
+def parse_event_ts_ms(timestamps: List[str]) -> np.ndarray:
+    # events use "YYYY-MM-DD HH:MM:SS.fff" (UTC); numpy parses the ISO form
+    arr = np.array([t.replace(" ", "T", 1) for t in timestamps], dtype="datetime64[ms]")
+    return arr.astype(np.int64)
+
+
+def reprice_events(pa: PriceArrays, events: List[Dict[str, Any]], stats: Optional[RepriceStats] = None) -> List[Dict[str, Any]]:
+    """Re-price a batch of event dicts in place (and return them)."""
+    if not events:
+        return events
+    stats = stats if stats is not None else RepriceStats()
+    n = len(events)
+    key_ids = np.fromiter(
+        (pa.key_id(e.get("provider", ""), e.get("model", ""), e.get("region", "")) for e in events),
+        dtype=np.int64, count=n,
+    )
+    ts_ms = parse_event_ts_ms([e["timestamp"] for e in events])
+    pt = np.fromiter((e.get("prompt_tokens", 0) or 0 for e in events), dtype=np.int64, count=n)
+    ct = np.fromiter((e.get("completion_tokens", 0) or 0 for e in events), dtype=np.int64, count=n)
+    ch = np.fromiter((e.get("cache_hit", 0) or 0 for e in events), dtype=np.int64, count=n)
+    old_cost = np.fromiter((float(e.get("computed_cost", 0.0) or 0.0) for e in events), dtype=np.float64, count=n)
+    batch = np.fromiter((e.get("price_tier") == "batch" for e in events), dtype=bool, count=n)
+
+    idx, up, uc, cost, ver = pa.reprice(key_ids, ts_ms, pt, ct, ch, batch)
+    priced = idx >= 0
+    new_cost = np.where(priced, cost, old_cost)
+
+    stats.rows += n
+    stats.unpriced += int(n - priced.sum())
+    stats.cost_before += float(old_cost.sum())
+    stats.cost_after += float(new_cost.sum())
+
+    up_l, uc_l, cost_l, ver_l = up.tolist(), uc.tolist(), cost.tolist(), ver.tolist()
+    for i in np.flatnonzero(priced).tolist():
+        e = events[i]
+        if (
+            e.get("unit_price_prompt") != up_l[i]
+            or e.get("unit_price_completion") != uc_l[i]
+            or e.get("computed_cost") != cost_l[i]
+            or e.get("price_version") != ver_l[i]
+        ):
+            stats.changed += 1
+        e["unit_price_prompt"] = up_l[i]
+        e["unit_price_completion"] = uc_l[i]
+        e["computed_cost"] = cost_l[i]
+        e["price_version"] = ver_l[i]
+    return events
+
+
+def iter_jsonl_batches(f: TextIO, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    for line in f:
+        if not line.strip():
+            continue
+        batch.append(json.loads(line))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def reprice_jsonl(
+    price_book: PriceBook,
+    in_path: str,
+    out_path: str,
+    batch_size: int = 200_000,
+    progress: bool = True,
+) -> RepriceStats:
+    """
+    Stream in_path -> out_path with corrected unit_price_* / computed_cost / price_version.
+    Memory is bounded by batch_size rows.
+    """
+    pa = PriceArrays(price_book)
+    stats = RepriceStats()
+    t0 = time.perf_counter()
+    with open(in_path, "r", encoding="utf-8") as fin, open(out_path, "w", encoding="utf-8") as fout:
+        for batch in iter_jsonl_batches(fin, batch_size):
+            reprice_events(pa, batch, stats)
+            fout.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in batch))
+            stats.seconds = time.perf_counter() - t0
+            if progress:
+                logger.info(
+                    "rows=%d changed=%d unpriced=%d (%s rows/s)",
+                    stats.rows, stats.changed, stats.unpriced, f"{stats.rows / max(stats.seconds, 1e-9):,.0f}",
+                )
+    stats.seconds = time.perf_counter() - t0
+    return stats
+
+
+def _sql_str(s: str) -> str:
+    return "'" + s.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _ch_ts(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")[:23]
+
+
+def _parse_ch_ts(s: str) -> datetime:
+    return datetime.fromisoformat(s).replace(tzinfo=timezone.utc)
+
+
+def _key_conds(keys: Optional[Iterable[PriceKey]]) -> List[str]:
+    if keys is None:
+        return []
+    tuples = ", ".join(f"({_sql_str(p)}, {_sql_str(m)}, {_sql_str(r)})" for p, m, r in keys)
+    return [f"(provider, model, region) IN ({tuples or '(NULL, NULL, NULL)'})"]
+
+
+def select_keys(
+    price_book: PriceBook, providers: Optional[Iterable[str]] = None, models: Optional[Iterable[str]] = None,
+) -> List[PriceKey]:
+    """Price book keys matching any of `providers` and any of `models` (None / empty = all)."""
+    providers = set(providers or ())
+    models = set(models or ())
+    return [
+        k for k in price_book.keys()
+        if (not providers or k[0] in providers) and (not models or k[1] in models)
+    ]
+
+
+def stored_prices_query(table: str, since: Optional[str] = None, keys: Optional[Iterable[PriceKey]] = None) -> str:
+    """
+    Distinct stored prices per key with the time range they cover; the rows feed
+    clickhouse_mutations(stored=...) so windows that are already right are skipped.
+    One GROUP BY over the prices columns (a few rows per key and price_version).
+    """
+    conds = _key_conds(keys)
+    if since:
+        conds.append(f"timestamp >= toDateTime64({_sql_str(since)}, 3, 'UTC')")
+    return (
+        "SELECT provider, model, region, price_version, price_tier, unit_price_prompt, unit_price_completion, "
+        "toString(min(timestamp)) AS lo, toString(max(timestamp)) AS hi "
+        f"FROM {table} "
+        + (f"WHERE {' AND '.join(conds)} " if conds else "")
+        + "GROUP BY provider, model, region, price_version, price_tier, unit_price_prompt, unit_price_completion "
+        "FORMAT JSONEachRow"
+    )
+
+
+def _window_stale(
+    groups: List[Dict[str, Any]], lo: datetime, hi: Optional[datetime], p: Any, batch: Optional[bool],
+) -> bool:
+    # conservative: a stored group whose [lo, hi] overlaps the window and carries other prices
+    # marks it stale, even if none of that group's rows are inside the window.
+    # batch: only groups of that tier (None = both, priced as unit_prices() would)
+    for g in groups:
+        if g["hi"] < lo or (hi is not None and g["lo"] >= hi):
+            continue
+        is_batch = g["price_tier"] == "batch"
+        if batch is not None and is_batch != batch:
+            continue
+        up, uc, _ = p.unit_prices("batch" if is_batch else "standard")
+        if (
+            g["price_version"] != p.price_version
+            or float(g["unit_price_prompt"]) != float(up)
+            or float(g["unit_price_completion"]) != float(uc)
+        ):
+            return True
+    return False
+
+
+def clickhouse_mutations(
+    price_book: PriceBook,
+    table: str,
+    since: Optional[str] = None,
+    keys: Optional[Iterable[PriceKey]] = None,
+    stored: Optional[Iterable[Dict[str, Any]]] = None,
+) -> List[str]:
+    """
+    ClickHouse side: a price only depends on (provider, model, region) and the
+    [effective_from, next effective_from) window, so instead of pulling rows we issue
+    one ALTER TABLE ... UPDATE per price segment and let the server recompute in place.
+    `since` ("YYYY-MM-DD HH:MM:SS") limits the rewrite to recent partitions.
+    Rows with price_tier = 'batch' get their own statement when the price row has a batch tier.
+    stored: rows of stored_prices_query(); only windows holding rows whose price_version /
+    unit prices differ from the price book get a mutation (each one rewrites whole parts).
+    """
+    wanted = set(keys) if keys is not None else None
+    since_dt = datetime.fromisoformat(since).replace(tzinfo=timezone.utc) if since else None
+    by_key: Optional[Dict[PriceKey, List[Dict[str, Any]]]] = None
+    if stored is not None:
+        by_key = {}
+        for r in stored:
+            g = dict(r, lo=_parse_ch_ts(r["lo"]), hi=_parse_ch_ts(r["hi"]))
+            by_key.setdefault((r["provider"], r["model"], r["region"]), []).append(g)
+    stmts: List[str] = []
+    for key, (effs, rows) in price_book._index.items():
+        if wanted is not None and key not in wanted:
+            continue
+        if by_key is not None and key not in by_key:
+            continue  # no stored rows for this key
+        provider, model, region = key
+        for i, p in enumerate(rows):
+            lo = _ch_ts(effs[i])
+            conds = [
+                f"provider = {_sql_str(provider)}",
+                f"model = {_sql_str(model)}",
+                f"region = {_sql_str(region)}",
+                f"timestamp >= toDateTime64({_sql_str(lo)}, 3, 'UTC')",
+            ]
+            hi_dt = effs[i + 1] if i + 1 < len(rows) else None
+            if hi_dt is not None:
+                hi = _ch_ts(hi_dt)
+                if hi == lo:
+                    continue  # shadowed by a later row with the same effective_from
+                if since_dt is not None and hi_dt <= since_dt:
+                    continue  # window ends before `since`
+                conds.append(f"timestamp < toDateTime64({_sql_str(hi)}, 3, 'UTC')")
+            if since:
+                conds.append(f"timestamp >= toDateTime64({_sql_str(since)}, 3, 'UTC')")
+            # (prompt, completion, tier condition, batch rows only / standard only / both)
+            tiers: List[Tuple[float, float, Optional[str], Optional[bool]]] = [
+                (p.price_per_1k_prompt, p.price_per_1k_completion, None, None)
+            ]
+            up_b, uc_b, tier = p.unit_prices("batch")
+            if tier == "batch":
+                tiers = [
+                    (tiers[0][0], tiers[0][1], "price_tier != 'batch'", False),
+                    (up_b, uc_b, "price_tier = 'batch'", True),
+                ]
+            for up, uc, tier_cond, batch in tiers:
+                if by_key is not None and not _window_stale(by_key[key], effs[i], hi_dt, p, batch):
+                    continue  # already stored with these prices
+                up, uc = float(up), float(uc)
+                # rows already carrying this price keep their part untouched
+                stale = (
+                    f"(price_version != {_sql_str(p.price_version)} "
+                    f"OR unit_price_prompt != {up!r} OR unit_price_completion != {uc!r})"
+                )
+                stmts.append(
+                    f"ALTER TABLE {table} UPDATE "
+                    f"unit_price_prompt = {up!r}, "
+                    f"unit_price_completion = {uc!r}, "
+                    f"computed_cost = if(cache_hit = 1, 0, prompt_tokens / 1000.0 * {up!r} + completion_tokens / 1000.0 * {uc!r}), "
+                    f"price_version = {_sql_str(p.price_version)} "
+                    f"WHERE " + " AND ".join(conds + ([tier_cond] if tier_cond else []) + [stale])
+                )
+    return stmts
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from collections import deque
+from dataclasses import dataclass
+from threading import Lock
+from typing import Deque, Dict, Optional, Tuple
+
+import httpx
+import openai
+
+# Retry / hedging policy for LLMGateway. Every attempt (first call, retry or hedge) is a
+# separate usage event of the same request_id with its own attempt / retry_count / cost,
+# so the dashboard's Q3 drill-down shows what retries and tail-latency cutting cost.
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 1  # 1 = no retries (previous behaviour)
+    # full-jitter exponential backoff: sleep uniform(0, min(backoff_max_s, backoff_base_s * 2**(n-1)))
+    backoff_base_s: float = 0.2
+    backoff_max_s: float = 5.0
+    # achat() only: if the first attempt is still running after the hedge delay, send one more
+    # to hedge_provider / hedge_model (default: same provider -> least-loaded vLLM replica)
+    # and return whichever succeeds first.
+    # delay = hedge_quantile of recent latencies of that (provider, model), at least
+    # hedge_min_delay_s; hedge_after_s is used until hedge_min_samples calls were seen (None = wait).
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+    hedge_min_samples: int = 50
+    hedge_min_delay_s: float = 0.05
+    hedge_after_s: Optional[float] = None
+    hedge_provider: Optional[str] = None
+    hedge_model: Optional[str] = None
+    hedge_region: Optional[str] = None
+    # False: the slower attempt runs to the end in the background, so its event carries the
+    # real tokens / cost (status="hedged"); True: it is cancelled (status="cancelled", no usage)
+    hedge_cancel_loser: bool = False
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Connection errors / timeouts, 429 and 5xx; other 4xx would fail again."""
+    if isinstance(exc, (openai.APIConnectionError, httpx.TransportError, ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+def backoff_s(policy: RetryPolicy, retry: int, exc: Optional[BaseException] = None) -> float:
+    """Sleep before retry number `retry` (1-based); a Retry-After header wins if longer."""
+    cap = min(policy.backoff_max_s, policy.backoff_base_s * (2 ** (retry - 1)))
+    wait = random.uniform(0.0, cap)
+    response = getattr(exc, "response", None)
+    if response is not None:
+        try:
+            wait = max(wait, min(float(response.headers.get("retry-after", 0)), policy.backoff_max_s))
+        except (TypeError, ValueError):
+            pass
+    return wait
+
+
+class LatencyTracker:
+    """Recent call latencies per (provider, model); quantile() is recomputed every `refresh` samples."""
+
+    def __init__(self, window: int = 512, refresh: int = 32):
+        self.window = window
+        self.refresh = refresh
+        self._lock = Lock()
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._seen: Dict[Tuple[str, str], int] = {}
+        self._cached: Dict[Tuple[str, str, float], Tuple[int, float]] = {}
+
+    def observe(self, provider: str, model: str, seconds: float) -> None:
+        key = (provider, model)
+        with self._lock:
+            d = self._samples.get(key)
+            if d is None:
+                d = self._samples[key] = deque(maxlen=self.window)
+            d.append(seconds)
+            self._seen[key] = self._seen.get(key, 0) + 1
+
+    def count(self, provider: str, model: str) -> int:
+        return len(self._samples.get((provider, model), ()))
+
+    def quantile(self, provider: str, model: str, q: float) -> Optional[float]:
+        key = (provider, model)
+        with self._lock:
+            d = self._samples.get(key)
+            if not d:
+                return None
+            seen = self._seen[key]
+            hit = self._cached.get(key + (q,))
+            if hit is not None and seen - hit[0] < self.refresh:
+                return hit[1]
+            ordered = sorted(d)
+            v = ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+            self._cached[key + (q,)] = (seen, v)
+            return v
+
+    def hedge_delay_s(self, policy: RetryPolicy, provider: str, model: str) -> Optional[float]:
+        if self.count(provider, model) < policy.hedge_min_samples:
+            return policy.hedge_after_s
+        return max(policy.hedge_min_delay_s, self.quantile(provider, model, policy.hedge_quantile) or 0.0)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+import atexit
+import json
+import logging
+import os
+from bisect import bisect_left
+from threading import Event, Lock, Thread
+from typing import Any, Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms, inclusive) of the latency histogram; the last bucket is everything above.
+# Must match the lat_le_* / lat_inf columns in ingest/03_create_rollup_table.sql.
+LATENCY_BOUNDS_MS: Tuple[int, ...] = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+ROLLUP_KEY_FIELDS = ("tenant_id", "feature", "model", "provider", "region", "status")
+_SUM_FIELDS = ("calls", "prompt_tokens", "completion_tokens", "total_tokens", "computed_cost",
+               "cache_hits", "retries", "latency_ms_sum")
+
+
+def _bucket_names(bounds: Sequence[int]) -> List[str]:
+    return [f"lat_le_{b}" for b in bounds] + ["lat_inf"]
+
+
+class RollupEmitter:
+    """
+    Aggregating sink with the same emit() interface as JsonlEmitter.
+    Keeps running sums per (minute, tenant_id, feature, model, provider, region, status)
+    and every interval_s appends one compact row per key to `path`
+    (load into analytics.llm_usage_rollup_1m, a SummingMergeTree, so partial
+    rows for the same minute written by different flushes/processes are summed there).
+    """
+
+    def __init__(self, path: str, interval_s: float = 10.0, latency_bounds_ms: Sequence[int] = LATENCY_BOUNDS_MS):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.interval_s = interval_s
+        self.latency_bounds_ms = tuple(latency_bounds_ms)
+        self._bucket_names = _bucket_names(self.latency_bounds_ms)
+        self._n_sums = len(_SUM_FIELDS)
+
+        self._lock = Lock()
+        self._acc: Dict[Tuple[str, ...], List[float]] = {}
+        self.rows_written = 0
+        self.events_seen = 0
+
+        self._closed = False
+        self._stop = Event()
+        self._flusher = Thread(target=self._run, name="rollup-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        # "YYYY-MM-DD HH:MM:SS.fff" -> minute bucket without datetime parsing
+        minute = event["timestamp"][:16] + ":00"
+        key = (minute,) + tuple(event.get(f, "") for f in ROLLUP_KEY_FIELDS)
+        latency = int(event.get("latency_ms", 0) or 0)
+        bucket = self._n_sums + bisect_left(self.latency_bounds_ms, latency)
+
+        with self._lock:
+            self.events_seen += 1
+            acc = self._acc.get(key)
+            if acc is None:
+                acc = self._acc[key] = [0] * (self._n_sums + len(self._bucket_names))
+            acc[0] += 1
+            acc[1] += event.get("prompt_tokens", 0)
+            acc[2] += event.get("completion_tokens", 0)
+            acc[3] += event.get("total_tokens", 0)
+            acc[4] += event.get("computed_cost", 0.0)
+            acc[5] += 1 if event.get("cache_hit") else 0
+            acc[6] += event.get("retry_count", 0)
+            acc[7] += latency
+            acc[bucket] += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.flush()
+            except Exception:
+                # keep aggregating; the rows are retried on the next flush
+                logger.exception("rollup flush to %s failed", self.path)
+
+    def flush(self) -> None:
+        """Write out everything aggregated so far (swapping the table under the lock)."""
+        with self._lock:
+            acc, self._acc = self._acc, {}
+        if not acc:
+            return
+        lines = []
+        for key, vals in acc.items():
+            row: Dict[str, Any] = {"minute": key[0]}
+            row.update(zip(ROLLUP_KEY_FIELDS, key[1:]))
+            row.update(zip(_SUM_FIELDS, vals[:self._n_sums]))
+            row.update(zip(self._bucket_names, vals[self._n_sums:]))
+            lines.append(json.dumps(row, ensure_ascii=False) + "\n")
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+        except Exception:
+            self._merge_back(acc)
+            raise
+        self.rows_written += len(lines)
+
+    def _merge_back(self, acc: Dict[Tuple[str, ...], List[float]]) -> None:
+        with self._lock:
+            for key, vals in acc.items():
+                cur = self._acc.get(key)
+                if cur is None:
+                    self._acc[key] = vals
+                else:
+                    for i, v in enumerate(vals):
+                        cur[i] += v
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._flusher.join()
+        self.flush()
+        atexit.unregister(self.close)
+
+    def stats(self) -> Dict[str, int]:
+        return {"open_keys": len(self._acc), "events_seen": self.events_seen, "rows_written": self.rows_written}
@@ -0,0 +1,290 @@
+from __future__ import annotations
+import json
+import struct
+from functools import partial
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .event import UsageEvent
+
+# Compact on-disk event format that ClickHouse can ingest natively (FORMAT RowBinary).
+#
+#   file   = MAGIC | u32 header_len | header_json | record*
+#   header = {"columns": [[name, type], ...]}
+#   record = u32 body_len | RowBinary(row)
+#
+# The length prefix is ours (so files can be chunked / tailed without parsing rows);
+# ingest strips it and POSTs the bodies back to back as a plain RowBinary stream with
+# an explicit column list, so columns left out (event_date, ...) get their DEFAULT.
+
+MAGIC = b"LLMRB\x01"
+
+# Same names / order as ingest/02_create_table.sql (LowCardinality(String) is String on the wire)
+EVENT_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("timestamp", "DateTime64(3)"),
+    ("request_id", "String"),
+    ("attempt", "UInt16"),
+    ("tenant_id", "String"),
+    ("user_id", "String"),
+    ("feature", "String"),
+    ("endpoint", "String"),
+    ("prompt_template_id", "String"),
+    ("provider", "String"),
+    ("model", "String"),
+    ("region", "String"),
+    ("prompt_tokens", "UInt32"),
+    ("completion_tokens", "UInt32"),
+    ("total_tokens", "UInt32"),
+    ("latency_ms", "UInt32"),
+    ("ttft_ms", "UInt32"),
+    ("tokens_per_s", "Float32"),
+    ("status", "String"),
+    ("retry_count", "UInt16"),
+    ("cache_hit", "UInt8"),
+    ("price_version", "String"),
+    ("unit_price_prompt", "Float64"),
+    ("unit_price_completion", "Float64"),
+    ("computed_cost", "Float64"),
+    ("prompt_chars", "UInt32"),
+    ("completion_chars", "UInt32"),
+    ("replica", "String"),
+    ("price_tier", "String"),
+    ("token_source", "String"),
+)
+
+# String columns whose table DEFAULT isn't '' (RowBinary has no "use the default" marker)
+_STRING_DEFAULTS = {"price_tier": "standard", "token_source": "provider"}
+
+_FIXED = {
+    "UInt8": struct.Struct("<B"),
+    "UInt16": struct.Struct("<H"),
+    "UInt32": struct.Struct("<I"),
+    "Int64": struct.Struct("<q"),
+    "Float32": struct.Struct("<f"),
+    "Float64": struct.Struct("<d"),
+}
+_U32 = struct.Struct("<I")
+_I64 = _FIXED["Int64"]
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+_last_second: Tuple[str, int] = ("", 0)
+
+
+def _ts_to_ms(ts: str) -> int:
+    # "YYYY-MM-DD HH:MM:SS.fff" (UTC, as written by the gateway); the seconds part is parsed once per second
+    global _last_second
+    if len(ts) == 23 and ts[19] == ".":
+        head, last = ts[:19], _last_second
+        if last[0] != head:
+            last = _last_second = (head, int(datetime.fromisoformat(head).replace(tzinfo=timezone.utc).timestamp()) * 1000)
+        return last[1] + int(ts[20:])
+    return int(datetime.fromisoformat(ts).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def _ms_to_ts(ms: int) -> str:
+    dt = datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc)
+    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")[:23]
+
+
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return n, pos
+        shift += 7
+
+
+# tenant / feature / model / price_version ...: length-prefixed bytes encoded once and reused
+_LOW_CARDINALITY = frozenset((
+    "tenant_id", "feature", "endpoint", "prompt_template_id", "provider", "model", "region",
+    "status", "price_version", "price_tier", "replica", "token_source",
+))
+_ENCODED: Dict[Any, bytes] = {}
+_ENCODED_MAX = 65536
+
+
+def _make_encoder(columns: Sequence[Tuple[str, str]]) -> Callable[[Dict[str, Any]], bytes]:
+    # Build the per-column steps once; encoding a row is then a flat loop.
+    # Steps read fields through get(name, default): dict.get, or getattr for UsageEvent.
+    steps: List[Callable[[Callable[..., Any], bytearray], None]] = []
+    for name, typ in columns:
+        if typ == "String" and name in _LOW_CARDINALITY:
+            def step(get: Callable[..., Any], out: bytearray, name: str = name, default: str = _STRING_DEFAULTS.get(name, "")) -> None:
+                v = get(name, None) or default
+                b = _ENCODED.get(v)
+                if b is None:
+                    if len(_ENCODED) >= _ENCODED_MAX:
+                        _ENCODED.clear()
+                    raw = str(v).encode("utf-8")
+                    b = _ENCODED[v] = _varint(len(raw)) + raw
+                out += b
+        elif typ == "String":
+            def step(get: Callable[..., Any], out: bytearray, name: str = name, default: str = _STRING_DEFAULTS.get(name, "")) -> None:
+                b = str(get(name, None) or default).encode("utf-8")
+                out += _varint(len(b))
+                out += b
+        elif typ == "DateTime64(3)":
+            def step(get: Callable[..., Any], out: bytearray, name: str = name) -> None:
+                out += _I64.pack(_ts_to_ms(get(name, None)))
+        elif typ in _FIXED:
+            packer = _FIXED[typ].pack
+            cast = float if typ.startswith("Float") else int
+
+            def step(get: Callable[..., Any], out: bytearray, name: str = name, packer=packer, cast=cast) -> None:
+                out += packer(cast(get(name, 0) or 0))
+        else:
+            raise ValueError(f"Unsupported RowBinary column type: {typ}")
+        steps.append(step)
+
+    def encode(event: Dict[str, Any]) -> bytes:
+        out = bytearray()
+        get = partial(getattr, event) if type(event) is UsageEvent else event.get
+        for step in steps:
+            step(get, out)
+        return bytes(out)
+
+    return encode
+
+
+def _make_decoder(columns: Sequence[Tuple[str, str]]) -> Callable[[bytes], Dict[str, Any]]:
+    def decode(body: bytes) -> Dict[str, Any]:
+        pos = 0
+        e: Dict[str, Any] = {}
+        for name, typ in columns:
+            if typ == "String":
+                n, pos = _read_varint(body, pos)
+                e[name] = body[pos:pos + n].decode("utf-8")
+                pos += n
+            elif typ == "DateTime64(3)":
+                e[name] = _ms_to_ts(_I64.unpack_from(body, pos)[0])
+                pos += 8
+            else:
+                s = _FIXED[typ]
+                v = s.unpack_from(body, pos)[0]
+                e[name] = round(v, 3) if typ == "Float32" else v
+                pos += s.size
+        return e
+
+    return decode
+
+
+encode_event = _make_encoder(EVENT_COLUMNS)
+
+
+def file_header(columns: Sequence[Tuple[str, str]] = EVENT_COLUMNS) -> bytes:
+    h = json.dumps({"columns": [list(c) for c in columns]}).encode("utf-8")
+    return MAGIC + _U32.pack(len(h)) + h
+
+
+def frame(body: bytes) -> bytes:
+    return _U32.pack(len(body)) + body
+
+
+def encode_record(event: Dict[str, Any]) -> bytes:
+    return frame(encode_event(event))
+
+
+def is_rowbinary_file(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_header(f: BinaryIO) -> List[Tuple[str, str]]:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not an event RowBinary file (bad magic)")
+    (n,) = _U32.unpack(f.read(4))
+    return [tuple(c) for c in json.loads(f.read(n))["columns"]]
+
+
+def iter_record_bodies(f: BinaryIO) -> Iterator[bytes]:
+    """Yield RowBinary row bodies; stops at EOF or at a torn (partially written) last record."""
+    while True:
+        head = f.read(4)
+        if len(head) < 4:
+            return
+        (n,) = _U32.unpack(head)
+        body = f.read(n)
+        if len(body) < n:
+            return
+        yield body
+
+
+def iter_rowbinary_chunks(f: BinaryIO, chunk_bytes: int) -> Iterator[Tuple[bytes, int]]:
+    """
+    Group record bodies into RowBinary chunks of roughly chunk_bytes (prefixes stripped).
+    Yields (body, rows). Call read_header() first.
+    """
+    buf = bytearray()
+    rows = 0
+    for body in iter_record_bodies(f):
+        buf += body
+        rows += 1
+        if len(buf) >= chunk_bytes:
+            yield bytes(buf), rows
+            buf = bytearray()
+            rows = 0
+    if buf:
+        yield bytes(buf), rows
+
+
+def read_events(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        decode = _make_decoder(read_header(f))
+        for body in iter_record_bodies(f):
+            yield decode(body)
+
+
+def jsonl_to_rowbinary(in_path: str, out_path: str) -> int:
+    n = 0
+    with open(in_path, "r", encoding="utf-8") as fin, open(out_path, "wb") as fout:
+        fout.write(file_header())
+        for line in fin:
+            if line.strip():
+                fout.write(encode_record(json.loads(line)))
+                n += 1
+    return n
+
+
+def rowbinary_to_jsonl(in_path: str, out_path: str) -> int:
+    n = 0
+    with open(out_path, "w", encoding="utf-8") as fout:
+        for e in read_events(in_path):
+            fout.write(json.dumps(e, ensure_ascii=False) + "\n")
+            n += 1
+    return n
+
+
+def ensure_header(f: BinaryIO) -> None:
+    """
+    Write the file header if f (opened for append) is empty; otherwise the existing header
+    must list the current EVENT_COLUMNS (records are appended in that layout).
+    """
+    if f.tell() == 0:
+        f.write(file_header())
+        return
+    with open(f.name, "rb") as r:
+        columns = read_header(r)
+    if columns != list(EVENT_COLUMNS):
+        raise ValueError(
+            f"{f.name} was written with other event columns; rotate it (ingest, then move away) before appending"
+        )
+
+
+def columns_sql(columns: Optional[Sequence[Tuple[str, str]]] = None) -> str:
+    return ", ".join(name for name, _ in (columns or EVENT_COLUMNS))
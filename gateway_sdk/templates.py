@@ -0,0 +1,212 @@
+from __future__ import annotations
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Drain-style prompt template mining for prompt_template_id.
+#
+# Each message is reduced to a short token sequence (its head: numbers / ids masked, long
+# tails collapsed into one "<*>"), then clustered Drain-style: clusters are bucketed by
+# (role, token count, first tokens), and a message joins the most similar cluster in its
+# bucket if at least sim_threshold of the positions match, turning the differing positions
+# into "<*>" slots. prompt_template_id = hash of the per-message cluster templates, so
+# prompts that only differ in user-supplied values share one id.
+#
+# A message id is template_digest(role, template): a hash of the role and the cluster's
+# template text after this message was merged in, nothing else (no cluster / bucket identity,
+# no arrival counter). Merging only turns differing positions into "<*>", which doesn't depend
+# on the order the members arrived in, and ties between equally similar clusters are broken
+# by template text, so replicas and restarts that have seen the same kinds of prompts reach
+# the same templates and emit the same ids. Only the first max_tokens (64) whitespace tokens
+# of the first head_chars of a message are used; the rest is one "<*>".
+#
+# Cost per call is bounded by head_chars, not by prompt size. Message heads seen more
+# than once (system prompts, few-shot blocks) are memoized, so they are only looked up.
+
+PARAM = "<*>"
+_DIGITS = frozenset("0123456789")  # tokens with a digit (numbers, ids, dates, hashes) become slots
+
+
+def _digest(s: str) -> str:
+    return hashlib.blake2b(s.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def mask_tokens(head: str, head_chars: int = 1024, max_tokens: int = 64) -> List[str]:
+    """
+    Token sequence a message is mined on: the first max_tokens tokens of head[:head_chars],
+    tokens with a digit and any remainder masked to "<*>". head = content[:head_chars + 1],
+    enough to tell whether there is a tail.
+    """
+    tokens = head[:head_chars].split(None, max_tokens)
+    if len(head) > head_chars or len(tokens) > max_tokens:
+        # drop the token cut at head_chars / the unsplit remainder; the tail is one slot
+        tokens = tokens[:-1][:max_tokens - 1]
+        tokens.append(PARAM)
+    return [t if _DIGITS.isdisjoint(t) else PARAM for t in tokens]
+
+
+def template_digest(role: str, tokens: Sequence[str]) -> str:
+    """Per-message template id: depends on the role and the template text only."""
+    return _digest(role + "\x1f" + " ".join(tokens))
+
+
+class _Cluster:
+    __slots__ = ("key", "tokens", "template_id", "size")
+
+    def __init__(self, key: Tuple[Any, ...], tokens: List[str]):
+        self.key = key
+        self.tokens = tokens
+        self.template_id = template_digest(key[0], tokens)
+        self.size = 1
+
+    def template(self) -> str:
+        return " ".join(self.tokens)
+
+
+class TemplateMiner:
+    """
+    Bounded-memory streaming template miner.
+
+    sim_threshold: min share of matching (non-slot) positions to join a cluster
+    prefix_depth:  leading tokens used to bucket clusters (besides role / length)
+    head_chars / max_tokens: how much of each message is looked at
+    max_clusters:  LRU bound on clusters
+    max_bucket_clusters: clusters compared per (role, length, prefix) bucket
+    max_memo:      bound on memoized message contents (only admitted on the second sighting)
+    """
+
+    def __init__(
+        self,
+        sim_threshold: float = 0.4,
+        prefix_depth: int = 2,
+        head_chars: int = 1024,
+        max_tokens: int = 64,
+        max_clusters: int = 10_000,
+        max_bucket_clusters: int = 64,
+        max_memo: int = 4096,
+    ):
+        self.sim_threshold = sim_threshold
+        self.prefix_depth = prefix_depth
+        self.head_chars = head_chars
+        self.max_tokens = max_tokens
+        self.max_clusters = max_clusters
+        self.max_bucket_clusters = max_bucket_clusters
+        self.max_memo = max_memo
+
+        self._lock = Lock()
+        self._buckets: Dict[Tuple[Any, ...], List[_Cluster]] = {}
+        self._clusters: "OrderedDict[int, _Cluster]" = OrderedDict()  # id(cluster) -> cluster, LRU order
+        self._memo: Dict[Tuple[str, str], _Cluster] = {}  # (role, head) -> cluster
+        self._seen_once: "OrderedDict[int, None]" = OrderedDict()  # hash((role, head)) of memo candidates
+
+        self.calls = 0
+        self.memo_hits = 0
+
+    def _mine(self, role: str, head: str) -> _Cluster:
+        # caller holds self._lock
+        tokens = mask_tokens(head, self.head_chars, self.max_tokens)
+        key = (role, len(tokens)) + tuple(tokens[:self.prefix_depth])
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = []
+
+        best: Optional[_Cluster] = None
+        best_sim = -1.0
+        n = len(tokens) or 1
+        for c in bucket:
+            # slots match anything (Drain's include_params); masked tokens are slots too
+            same = 0
+            for a, b in zip(c.tokens, tokens):
+                if a == b or a == PARAM:
+                    same += 1
+            sim = same / n
+            # equal similarity: lowest template text, not whichever cluster was created first
+            if sim > best_sim or (sim == best_sim and best is not None and c.tokens < best.tokens):
+                best, best_sim = c, sim
+
+        if best is not None and best_sim >= self.sim_threshold:
+            best.size += 1
+            if best_sim < 1.0:
+                merged = [a if a == b else PARAM for a, b in zip(best.tokens, tokens)]
+                if merged != best.tokens:
+                    best.tokens = merged
+                    best.template_id = template_digest(role, merged)
+            self._clusters.move_to_end(id(best))
+            return best
+
+        c = _Cluster(key, tokens)
+        if len(bucket) >= self.max_bucket_clusters:
+            # bounded fan-out per bucket (keeps the scan above short): drop the least used
+            self._evict(min(bucket, key=lambda x: x.size))
+            bucket = self._buckets.setdefault(key, [])
+        bucket.append(c)
+        self._clusters[id(c)] = c
+        if len(self._clusters) > self.max_clusters:
+            self._evict(next(iter(self._clusters.values())))
+        return c
+
+    def _evict(self, c: _Cluster) -> None:
+        self._clusters.pop(id(c), None)
+        b = self._buckets.get(c.key)
+        if b is not None:
+            b.remove(c)
+            if not b:
+                del self._buckets[c.key]
+
+    def _message_cluster(self, role: str, content: str) -> _Cluster:
+        # mining only reads the head, so memoize on it: hashing a 40KB system prompt per call
+        # would cost more than everything else here
+        head = content[:self.head_chars + 1]
+        mk = (role, head)
+        c = self._memo.get(mk)
+        if c is not None:
+            self.memo_hits += 1
+            return c
+        with self._lock:
+            c = self._mine(role, head)
+            h = hash(mk)
+            if h in self._seen_once:
+                # second sighting: a repeated prefix (system prompt, few-shot block), remember it
+                del self._seen_once[h]
+                if len(self._memo) >= self.max_memo:
+                    del self._memo[next(iter(self._memo))]
+                self._memo[mk] = c
+            else:
+                self._seen_once[h] = None
+                if len(self._seen_once) > self.max_memo * 4:
+                    self._seen_once.popitem(last=False)
+        return c
+
+    def template_id(self, messages: Sequence[Dict[str, Any]]) -> str:
+        """
+        prompt_template_id for chat messages (16 hex chars, like stable_template_id):
+        hash of the per-message template ids, in message order.
+        """
+        self.calls += 1
+        parts = []
+        for m in messages:
+            role = m.get("role", "user")
+            content = m.get("content", "")
+            if not isinstance(content, str):
+                content = str(content)
+            parts.append(self._message_cluster(role, content).template_id)
+        return _digest("\x1e".join(parts))
+
+    def template_id_text(self, prompt: str) -> str:
+        """prompt_template_id for a single prompt string (treated as one user message)."""
+        return self.template_id(({"role": "user", "content": prompt},))
+
+    def templates(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Largest clusters first: {"template_id", "template", "size"} (for inspection / docs)."""
+        with self._lock:
+            clusters = sorted(self._clusters.values(), key=lambda c: c.size, reverse=True)[:limit]
+            return [{"role": c.key[0], "template_id": c.template_id, "template": c.template(), "size": c.size} for c in clusters]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "memo_hits": self.memo_hits,
+            "memo_entries": len(self._memo),
+            "clusters": len(self._clusters),
+        }
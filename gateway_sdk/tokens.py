@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from fnmatch import fnmatchcase
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Local token counts, for events whose provider reported no usage (streams without a usage
+# chunk, cancelled / failed streams, Gemini responses without usage_metadata) and for sizing
+# a request before it is sent (chat_batch rate limits, LLMGateway.count_tokens).
+#
+# Encoders are picked per model by spec and loaded lazily, once per spec, shared by all
+# threads:
+#   "tiktoken[:<encoding>]"  tiktoken (optional); no encoding = tiktoken.encoding_for_model()
+#   "hf:<tokenizer.json>"    a local Hugging Face tokenizer file (optional `tokenizers`)
+#   "heuristic"              regex word-piece estimate, no dependency
+# Models without a rule use "heuristic": tiktoken is opt-in (not in requirements.txt, and its
+# first load downloads the BPE file, which would block a chat call on an offline host).
+# tiktoken fetches its BPE file once into TIKTOKEN_CACHE_DIR; for offline hosts copy that
+# directory over. A spec that can't be loaded (package missing, no file, offline) falls back to
+# "heuristic" once and stays there, so counting never fails or retries the load per call.
+#
+# Message contents of at least memo_min_chars (system prompts, few-shot blocks) are memoized
+# per encoder, so a growing conversation only tokenizes the messages it hasn't seen. The memo
+# is keyed on a digest of the content, so max_memo entries never pin the prompts themselves.
+
+HEURISTIC = "heuristic"
+
+# per message: <|start|>role ... <|end|> framing (OpenAI chat format); per call: reply priming
+_TOKENS_PER_MESSAGE = 3
+_TOKENS_PER_NAME = 1
+_TOKENS_PER_REPLY = 3
+
+# ascii letter runs, digit runs, other word characters (CJK, accented ...) one by one, punctuation
+_PIECES = re.compile(r"[A-Za-z]+|[0-9]+|[^\W\dA-Za-z_]|[^\w\s]|_+")
+
+
+def heuristic_count(text: str) -> int:
+    """~BPE token count without a vocabulary: ascii words ~5 chars/token, digits ~3, CJK ~1 per char."""
+    n = 0
+    for p in _PIECES.findall(text):
+        c = p[0]
+        if c.isascii() and c.isalpha():
+            n += (len(p) + 4) // 5
+        elif c.isdigit():
+            n += (len(p) + 2) // 3
+        else:
+            n += 1
+    return n
+
+
+def _tiktoken_encoding(model: str) -> str:
+    try:
+        import tiktoken
+
+        return tiktoken.encoding_for_model(model).name
+    except Exception:  # not installed / unknown model
+        return "o200k_base"
+
+
+def _load_tiktoken(encoding: str) -> Callable[[str], int]:
+    import tiktoken
+
+    enc = tiktoken.get_encoding(encoding)
+    encode = enc.encode_ordinary
+    return lambda text: len(encode(text))
+
+
+def _load_hf(path: str) -> Callable[[str], int]:
+    from tokenizers import Tokenizer
+
+    tok = Tokenizer.from_file(path)
+    return lambda text: len(tok.encode(text, add_special_tokens=False).ids)
+
+
+class TokenCounter:
+    """
+    tokenizers: ordered {model glob: spec}, first match wins, e.g.
+      {"gpt-4o*": "tiktoken:o200k_base", "meta-llama/*": "hf:/models/llama3/tokenizer.json"}
+    Unmatched models: "heuristic" (opt into tiktoken with e.g. {"gpt-*": "tiktoken"}).
+    """
+
+    def __init__(
+        self,
+        tokenizers: Optional[Dict[str, str]] = None,
+        *,
+        memo_min_chars: int = 128,
+        max_memo: int = 4096,
+    ):
+        self.rules: List[Tuple[str, str]] = list((tokenizers or {}).items())
+        self.memo_min_chars = memo_min_chars
+        self.max_memo = max_memo
+        self._lock = Lock()
+        self._by_model: Dict[Tuple[str, str], Tuple[str, Callable[[str], int]]] = {}
+        self._by_spec: Dict[str, Callable[[str], int]] = {}
+        self._failed: Dict[str, str] = {}  # spec -> why it fell back to heuristic
+        self._memo: Dict[Tuple[str, bytes], int] = {}  # (spec, digest of content) -> tokens
+
+    def spec_for(self, provider: str, model: str) -> str:
+        for pattern, spec in self.rules:
+            if fnmatchcase(model, pattern):
+                return spec
+        return HEURISTIC
+
+    def encoder(self, provider: str, model: str) -> Tuple[str, Callable[[str], int]]:
+        """(spec actually used, count function); loaded on first use."""
+        key = (provider, model)
+        hit = self._by_model.get(key)
+        if hit is not None:
+            return hit
+        spec = self.spec_for(provider, model)
+        if spec == "tiktoken":
+            spec = "tiktoken:" + _tiktoken_encoding(model)
+        with self._lock:
+            fn = self._by_spec.get(spec)
+            if fn is None:
+                fn = self._by_spec[spec] = self._load(spec)
+            if spec in self._failed:
+                spec = HEURISTIC
+            hit = self._by_model[key] = (spec, fn)
+        return hit
+
+    def _load(self, spec: str) -> Callable[[str], int]:
+        kind, _, arg = spec.partition(":")
+        try:
+            if kind == "tiktoken":
+                return _load_tiktoken(arg)
+            if kind == "hf":
+                return _load_hf(arg)
+            if kind != HEURISTIC:
+                raise ValueError(f"Unknown tokenizer spec: {spec}")
+        except Exception as e:  # missing package / files, offline
+            self._failed[spec] = f"{type(e).__name__}: {e}"
+        return heuristic_count
+
+    def count_text(self, provider: str, model: str, text: str) -> int:
+        if not text:
+            return 0
+        spec, fn = self.encoder(provider, model)
+        return self._count(spec, fn, text)
+
+    def _count(self, spec: str, fn: Callable[[str], int], text: str) -> int:
+        if len(text) < self.memo_min_chars:
+            return fn(text)
+        mk = (spec, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+        n = self._memo.get(mk)
+        if n is None:
+            n = fn(text)
+            with self._lock:
+                if len(self._memo) >= self.max_memo:
+                    del self._memo[next(iter(self._memo))]
+                self._memo[mk] = n
+        return n
+
+    def count_messages(self, provider: str, model: str, messages: Sequence[Dict[str, Any]]) -> int:
+        """Prompt tokens of a chat request, chat-format framing included."""
+        spec, fn = self.encoder(provider, model)
+        n = _TOKENS_PER_REPLY
+        for m in messages:
+            n += _TOKENS_PER_MESSAGE + 1  # + role
+            content = m.get("content")
+            if isinstance(content, str):
+                n += self._count(spec, fn, content)
+            elif isinstance(content, list):  # content parts: only text is counted
+                for part in content:
+                    if isinstance(part, dict) and isinstance(part.get("text"), str):
+                        n += self._count(spec, fn, part["text"])
+            if m.get("name"):
+                n += _TOKENS_PER_NAME + fn(str(m["name"]))
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "encoders": {f"{p}/{m}": spec for (p, m), (spec, _) in self._by_model.items()},
+            "fallbacks": dict(self._failed),
+            "memo_entries": len(self._memo),
+        }
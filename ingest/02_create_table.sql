@@ -21,6 +21,8 @@ CREATE TABLE IF NOT EXISTS analytics.llm_usage_events
   total_tokens UInt32,
 
   latency_ms UInt32,
+  ttft_ms UInt32 DEFAULT latency_ms,
+  tokens_per_s Float32 DEFAULT 0,
   status LowCardinality(String),
   retry_count UInt16,
   cache_hit UInt8,
@@ -32,9 +34,20 @@ CREATE TABLE IF NOT EXISTS analytics.llm_usage_events
 
   -- 方便分析但不觸碰 PII
   prompt_chars UInt32 DEFAULT 0,
-  completion_chars UInt32 DEFAULT 0
+  completion_chars UInt32 DEFAULT 0,
+
+  -- 實際服務的 replica（vLLM 多 endpoint），其他 provider 為空字串
+  replica LowCardinality(String) DEFAULT '',
+
+  -- standard / batch（provider batch endpoint 的折扣價）
+  price_tier LowCardinality(String) DEFAULT 'standard',
+
+  -- provider（回應帶 usage）/ estimated（本機 tokenizer 估算）/ none（沒有 token 數，例如失敗的呼叫）
+  token_source LowCardinality(String) DEFAULT 'provider'
 )
 ENGINE = MergeTree
 PARTITION BY toYYYYMM(event_date)
 ORDER BY (event_date, tenant_id, feature, model, endpoint, request_id, attempt)
-SETTINGS index_granularity = 8192;
\ No newline at end of file
+SETTINGS index_granularity = 8192,
+         -- 讓 ingest --follow 帶的 insert_deduplication_token 在非 Replicated 表上也生效
+         non_replicated_deduplication_window = 1000;
\ No newline at end of file
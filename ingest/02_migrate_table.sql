@@ -0,0 +1,15 @@
+-- 既有 analytics.llm_usage_events 升級到 02_create_table.sql 的欄位與設定（可重複執行）。
+-- CREATE TABLE IF NOT EXISTS 對已存在的表不做任何事；新欄位不補上的話，
+-- RowBinary ingest（INSERT ... (EVENT_COLUMNS) FORMAT RowBinary）會因欄位不存在而失敗，
+-- JSONEachRow 則會默默丟掉這些欄位（input_format_skip_unknown_fields=1）。
+-- 舊資料的新欄位取 DEFAULT（ttft_ms = latency_ms、price_tier = 'standard'、token_source = 'provider'）。
+
+ALTER TABLE analytics.llm_usage_events
+  ADD COLUMN IF NOT EXISTS ttft_ms UInt32 DEFAULT latency_ms AFTER latency_ms,
+  ADD COLUMN IF NOT EXISTS tokens_per_s Float32 DEFAULT 0 AFTER ttft_ms,
+  ADD COLUMN IF NOT EXISTS replica LowCardinality(String) DEFAULT '' AFTER completion_chars,
+  ADD COLUMN IF NOT EXISTS price_tier LowCardinality(String) DEFAULT 'standard' AFTER replica,
+  ADD COLUMN IF NOT EXISTS token_source LowCardinality(String) DEFAULT 'provider' AFTER price_tier;
+
+-- ingest 帶的 insert_deduplication_token 在非 Replicated 表上需要這個設定才生效
+ALTER TABLE analytics.llm_usage_events MODIFY SETTING non_replicated_deduplication_window = 1000;
@@ -0,0 +1,36 @@
+CREATE TABLE IF NOT EXISTS analytics.llm_usage_rollup_1m
+(
+  minute DateTime('UTC'),
+
+  tenant_id String,
+  feature LowCardinality(String),
+  model LowCardinality(String),
+  provider LowCardinality(String),
+  region LowCardinality(String),
+  status LowCardinality(String),
+
+  calls UInt64,
+  prompt_tokens UInt64,
+  completion_tokens UInt64,
+  total_tokens UInt64,
+  computed_cost Float64,
+  cache_hits UInt64,
+  retries UInt64,
+  latency_ms_sum UInt64,
+
+  -- latency histogram（非累積；bucket 上界與 gateway_sdk/rollup.py LATENCY_BOUNDS_MS 一致）
+  lat_le_50 UInt64,
+  lat_le_100 UInt64,
+  lat_le_250 UInt64,
+  lat_le_500 UInt64,
+  lat_le_1000 UInt64,
+  lat_le_2500 UInt64,
+  lat_le_5000 UInt64,
+  lat_le_10000 UInt64,
+  lat_le_30000 UInt64,
+  lat_inf UInt64
+)
+ENGINE = SummingMergeTree
+PARTITION BY toYYYYMM(minute)
+ORDER BY (minute, tenant_id, feature, model, provider, region, status)
+SETTINGS index_granularity = 8192;
@@ -0,0 +1,138 @@
+-- Dashboard rollups maintained by ClickHouse itself (run after 02_create_table.sql).
+-- 每次 INSERT 進 llm_usage_events 時，materialized view 會把該批資料預聚合寫進下面兩張表；
+-- dashboard 讀這兩張表（幾千～幾萬列），不再掃 raw events。
+--
+-- sums 用 SimpleAggregateFunction(sum, ...)，查詢時直接 sum()；
+-- latency / ttft 用 quantilesTDigest 的 state，查詢時 quantilesTDigestMerge(0.5, 0.9, 0.95, 0.99)(latency_q)。
+-- 注意：若 gateway 開了 raw_sample_rates，raw events 是抽樣後的，成本請改查 llm_usage_rollup_1m。
+
+CREATE TABLE IF NOT EXISTS analytics.llm_usage_daily
+(
+  day Date,
+
+  tenant_id String,
+  feature LowCardinality(String),
+  model LowCardinality(String),
+  provider LowCardinality(String),
+  status LowCardinality(String),
+
+  calls SimpleAggregateFunction(sum, UInt64),
+  prompt_tokens SimpleAggregateFunction(sum, UInt64),
+  completion_tokens SimpleAggregateFunction(sum, UInt64),
+  total_tokens SimpleAggregateFunction(sum, UInt64),
+  computed_cost SimpleAggregateFunction(sum, Float64),
+  retries SimpleAggregateFunction(sum, UInt64),
+  cache_hits SimpleAggregateFunction(sum, UInt64),
+  latency_ms_sum SimpleAggregateFunction(sum, UInt64),
+
+  latency_q AggregateFunction(quantilesTDigest(0.5, 0.9, 0.95, 0.99), UInt32),
+  ttft_q AggregateFunction(quantilesTDigest(0.5, 0.9, 0.95, 0.99), UInt32)
+)
+ENGINE = AggregatingMergeTree
+PARTITION BY toYYYYMM(day)
+ORDER BY (day, tenant_id, feature, model, provider, status);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.llm_usage_daily_mv
+TO analytics.llm_usage_daily
+AS
+SELECT
+  toDate(timestamp) AS day,
+  tenant_id,
+  feature,
+  model,
+  provider,
+  status,
+  count() AS calls,
+  sum(prompt_tokens) AS prompt_tokens,
+  sum(completion_tokens) AS completion_tokens,
+  sum(total_tokens) AS total_tokens,
+  sum(computed_cost) AS computed_cost,
+  sum(retry_count) AS retries,
+  sum(cache_hit) AS cache_hits,
+  sum(latency_ms) AS latency_ms_sum,
+  quantilesTDigestState(0.5, 0.9, 0.95, 0.99)(latency_ms) AS latency_q,
+  quantilesTDigestState(0.5, 0.9, 0.95, 0.99)(ttft_ms) AS ttft_q
+FROM analytics.llm_usage_events
+GROUP BY day, tenant_id, feature, model, provider, status;
+
+
+-- 小時粒度（token trend、近 72 小時的 latency），只留 90 天
+CREATE TABLE IF NOT EXISTS analytics.llm_usage_hourly
+(
+  hour DateTime('UTC'),
+
+  tenant_id String,
+  feature LowCardinality(String),
+  model LowCardinality(String),
+  provider LowCardinality(String),
+  status LowCardinality(String),
+
+  calls SimpleAggregateFunction(sum, UInt64),
+  prompt_tokens SimpleAggregateFunction(sum, UInt64),
+  completion_tokens SimpleAggregateFunction(sum, UInt64),
+  total_tokens SimpleAggregateFunction(sum, UInt64),
+  computed_cost SimpleAggregateFunction(sum, Float64),
+  retries SimpleAggregateFunction(sum, UInt64),
+  cache_hits SimpleAggregateFunction(sum, UInt64),
+  latency_ms_sum SimpleAggregateFunction(sum, UInt64),
+
+  latency_q AggregateFunction(quantilesTDigest(0.5, 0.9, 0.95, 0.99), UInt32),
+  ttft_q AggregateFunction(quantilesTDigest(0.5, 0.9, 0.95, 0.99), UInt32)
+)
+ENGINE = AggregatingMergeTree
+PARTITION BY toYYYYMM(hour)
+ORDER BY (hour, tenant_id, feature, model, provider, status)
+TTL hour + INTERVAL 90 DAY;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS analytics.llm_usage_hourly_mv
+TO analytics.llm_usage_hourly
+AS
+SELECT
+  toStartOfHour(timestamp) AS hour,
+  tenant_id,
+  feature,
+  model,
+  provider,
+  status,
+  count() AS calls,
+  sum(prompt_tokens) AS prompt_tokens,
+  sum(completion_tokens) AS completion_tokens,
+  sum(total_tokens) AS total_tokens,
+  sum(computed_cost) AS computed_cost,
+  sum(retry_count) AS retries,
+  sum(cache_hit) AS cache_hits,
+  sum(latency_ms) AS latency_ms_sum,
+  quantilesTDigestState(0.5, 0.9, 0.95, 0.99)(latency_ms) AS latency_q,
+  quantilesTDigestState(0.5, 0.9, 0.95, 0.99)(ttft_ms) AS ttft_q
+FROM analytics.llm_usage_events
+GROUP BY hour, tenant_id, feature, model, provider, status;
+
+
+-- Drill-down（Requests by Feature / Request Detail）仍查 raw 表：
+-- ORDER BY 以 event_date 開頭，用 skip index 讓 request_id / feature 的篩選不必掃整個 partition
+ALTER TABLE analytics.llm_usage_events
+  ADD INDEX IF NOT EXISTS idx_request_id request_id TYPE bloom_filter(0.01) GRANULARITY 4;
+ALTER TABLE analytics.llm_usage_events
+  ADD INDEX IF NOT EXISTS idx_feature feature TYPE set(256) GRANULARITY 4;
+ALTER TABLE analytics.llm_usage_events MATERIALIZE INDEX idx_request_id;
+ALTER TABLE analytics.llm_usage_events MATERIALIZE INDEX idx_feature;
+
+
+-- Backfill：MV 只處理建立之後的 INSERT。既有資料用同一個 SELECT 補進去一次，
+-- 上界設成 MV 建立的時間，避免與 MV 重複計算：
+--
+-- INSERT INTO analytics.llm_usage_daily
+-- SELECT toDate(timestamp) AS day, tenant_id, feature, model, provider, status,
+--   count(), sum(prompt_tokens), sum(completion_tokens), sum(total_tokens), sum(computed_cost),
+--   sum(retry_count), sum(cache_hit), sum(latency_ms),
+--   quantilesTDigestState(0.5, 0.9, 0.95, 0.99)(latency_ms),
+--   quantilesTDigestState(0.5, 0.9, 0.95, 0.99)(ttft_ms)
+-- FROM analytics.llm_usage_events
+-- WHERE timestamp < toDateTime64('2026-01-01 00:00:00', 3, 'UTC')   -- MV 建立時間
+-- GROUP BY day, tenant_id, feature, model, provider, status;
+--
+-- （llm_usage_hourly 同理，把 toDate(timestamp) 換成 toStartOfHour(timestamp)）
+--
+-- Re-pricing（python -m ingest.reprice clickhouse）以 ALTER UPDATE 改 raw 表，MV 不會跟著更新；
+-- 改完價格後對受影響的日期重建 rollup：
+--   ALTER TABLE analytics.llm_usage_daily DELETE WHERE day >= '...';  再跑上面的 backfill（同樣的日期範圍）
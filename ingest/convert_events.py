@@ -0,0 +1,29 @@
+import argparse
+import os
+import time
+
+from gateway_sdk.rowbinary import is_rowbinary_file, jsonl_to_rowbinary, rowbinary_to_jsonl
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert event files between JSONL and length-prefixed RowBinary.")
+    ap.add_argument("in_path")
+    ap.add_argument("out_path")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    if is_rowbinary_file(args.in_path):
+        n = rowbinary_to_jsonl(args.in_path, args.out_path)
+        direction = "rowbinary -> jsonl"
+    else:
+        n = jsonl_to_rowbinary(args.in_path, args.out_path)
+        direction = "jsonl -> rowbinary"
+    dt = time.perf_counter() - t0
+    print(
+        f"{direction}: {n} events in {dt:.1f}s, "
+        f"{os.path.getsize(args.in_path) / 1e6:.1f}MB -> {os.path.getsize(args.out_path) / 1e6:.1f}MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
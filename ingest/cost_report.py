@@ -0,0 +1,91 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from gateway_sdk.event_report import DEFAULT_CHUNK_BYTES, GROUP_FIELDS, ReportQuery, cost_report
+
+
+def _print_table(rows, columns) -> None:
+    cells = [[_fmt(r.get(c, "")) for c in columns] for r in rows]
+    widths = [max([len(c)] + [len(row[i]) for row in cells]) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in cells:
+        print("  ".join(v.rjust(w) if _is_num(v) else v.ljust(w) for v, w in zip(row, widths)))
+
+
+def _fmt(v) -> str:
+    if isinstance(v, float):
+        return f"{v:,.4f}" if abs(v) < 1000 else f"{v:,.2f}"
+    if isinstance(v, int):
+        return f"{v:,}"
+    return str(v)
+
+
+def _is_num(s: str) -> bool:
+    return bool(s) and s.replace(",", "").replace(".", "", 1).lstrip("-").isdigit()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Cost / token / latency report from event files (no ClickHouse).")
+    ap.add_argument("--path", action="append", default=None,
+                    help="event JSONL / RowBinary file or segment directory (repeatable; default data/events.jsonl)")
+    ap.add_argument("--group-by", default="tenant_id", help=f"comma-separated, from: {', '.join(GROUP_FIELDS)}")
+    ap.add_argument("--since", default=None, help='UTC, e.g. "2025-12-01 08:00"')
+    ap.add_argument("--until", default=None, help="UTC, exclusive")
+    ap.add_argument("--last-hours", type=float, default=None, help="shortcut for --since now - N hours")
+    ap.add_argument("--where", action="append", default=[], help="field=value filter (repeatable)")
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: CPU count; 1 = no pool)")
+    ap.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_BYTES / 1024 / 1024)
+    ap.add_argument("--order-slack-s", type=float, default=3600.0,
+                    help="how far out of time order lines may be; used to skip file regions outside --since/--until")
+    ap.add_argument("--full-scan", action="store_true", help="don't skip file regions by time (files not time-ordered)")
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--format", choices=("table", "json", "csv"), default="table")
+    args = ap.parse_args()
+
+    since = args.since
+    if args.last_hours is not None:
+        since = (datetime.now(timezone.utc) - timedelta(hours=args.last_hours)).strftime("%Y-%m-%d %H:%M:%S")
+    where = []
+    for w in args.where:
+        k, sep, v = w.partition("=")
+        if not sep:
+            ap.error(f"--where expects field=value, got {w!r}")
+        where.append((k.strip(), v.strip()))
+    query = ReportQuery(
+        group_by=tuple(g.strip() for g in args.group_by.split(",") if g.strip()),
+        since=since,
+        until=args.until,
+        where=tuple(where),
+    )
+    paths = args.path or [os.getenv("EVENTS_JSONL_PATH", "data/events.jsonl")]
+    try:
+        report = cost_report(
+            paths, query,
+            workers=args.workers,
+            chunk_bytes=int(args.chunk_mb * 1024 * 1024),
+            order_slack_s=None if args.full_scan else args.order_slack_s,
+        )
+    except ValueError as e:
+        ap.error(str(e))
+
+    rows = report["rows"][:args.limit]
+    if args.format == "json":
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    columns = list(rows[0].keys()) if rows else list(query.group_by)
+    if args.format == "csv":
+        w = csv.DictWriter(sys.stdout, fieldnames=columns)
+        w.writeheader()
+        w.writerows(rows)
+    else:
+        _print_table(rows, columns)
+    print(json.dumps(report["stats"]), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,21 @@
+import argparse
+import gzip
+import hashlib
+import io
+import json
 import os
+import signal
+import threading
+import time
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+
+from gateway_sdk import rowbinary
+from gateway_sdk.rowbinary import is_rowbinary_file
+
 load_dotenv()
 
 CLICKHOUSE_URL = os.getenv("CLICKHOUSE_URL", "http://localhost:8123")
@@ -10,28 +25,553 @@ CLICKHOUSE_TABLE = os.getenv("CLICKHOUSE_TABLE", "llm_usage_events")
 CLICKHOUSE_USER = os.getenv("CLICKHOUSE_USER")
 CLICKHOUSE_PASSWORD = os.getenv("CLICKHOUSE_PASSWORD")
 
-def main():
-    if not CLICKHOUSE_USER or not CLICKHOUSE_PASSWORD:
-        raise RuntimeError("CLICKHOUSE_USER / CLICKHOUSE_PASSWORD not set")
+EVENTS_JSONL_PATH = os.getenv("EVENTS_JSONL_PATH", "data/events.jsonl")
+CHUNK_BYTES = int(os.getenv("INGEST_CHUNK_BYTES", str(16 * 1024 * 1024)))
+MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "5"))
+CHECKPOINT_PATH = os.getenv("INGEST_CHECKPOINT_PATH", "data/ingest.checkpoint.json")
+HEAD_BYTES = 4096
 
-    query = f"""
-    INSERT INTO {CLICKHOUSE_DB}.{CLICKHOUSE_TABLE}
+def insert_query(table: str = CLICKHOUSE_TABLE) -> str:
+    return f"""
+    INSERT INTO {CLICKHOUSE_DB}.{table}
     SETTINGS input_format_skip_unknown_fields=1
     FORMAT JSONEachRow
     """
 
-    with open("data/events.jsonl", "r", encoding="utf-8") as f:
-        data = f.read()
 
-    r = requests.post(
-        CLICKHOUSE_URL,
-        params={"query": query},
-        data=data.encode("utf-8"),
-        auth=(CLICKHOUSE_USER, CLICKHOUSE_PASSWORD),
-        timeout=30,
+INSERT_QUERY = insert_query()
+
+
+def make_session(pool_size: int = 4) -> requests.Session:
+    # 一個 Session 重用 TCP/keep-alive 連線；retry 自己做（要配合 backoff + 重送同一個 chunk）
+    s = requests.Session()
+    s.mount("http://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0))
+    s.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0))
+    if CLICKHOUSE_USER and CLICKHOUSE_PASSWORD:
+        s.auth = (CLICKHOUSE_USER, CLICKHOUSE_PASSWORD)
+    return s
+
+
+def iter_line_chunks(f: BinaryIO, chunk_bytes: int = CHUNK_BYTES, partial_tail: bool = True) -> Iterator[bytes]:
+    """
+    Yield chunks of roughly chunk_bytes that always end on a line boundary.
+    Memory stays O(chunk_bytes) regardless of file size.
+    A single line longer than chunk_bytes is yielded on its own.
+    partial_tail=False leaves an unterminated last line (still being written) unread.
+    """
+    carry = b""
+    while True:
+        block = f.read(chunk_bytes)
+        if not block:
+            break
+        buf = carry + block
+        cut = buf.rfind(b"\n")
+        if cut < 0:
+            carry = buf
+            continue
+        carry = buf[cut + 1:]
+        yield buf[:cut + 1]
+    if partial_tail and carry.strip():
+        yield carry if carry.endswith(b"\n") else carry + b"\n"
+
+
+def insert_chunk(
+    session: requests.Session,
+    body: bytes,
+    *,
+    query: str = INSERT_QUERY,
+    params: Optional[Dict[str, str]] = None,
+    max_retries: int = MAX_RETRIES,
+    timeout: float = 60,
+) -> int:
+    """
+    gzip + POST one chunk; retry with exponential backoff on network errors, 5xx and 429.
+    Returns the compressed size sent.
+    """
+    payload = gzip.compress(body, compresslevel=1)
+    query_params = {"query": query}
+    if params:
+        query_params.update(params)
+    delay = 0.5
+    for attempt in range(max_retries + 1):
+        try:
+            r = session.post(
+                CLICKHOUSE_URL,
+                params=query_params,
+                data=payload,
+                headers={"Content-Encoding": "gzip"},
+                timeout=timeout,
+            )
+            if r.status_code < 500 and r.status_code != 429:
+                r.raise_for_status()
+                return len(payload)
+            err: Exception = requests.HTTPError(f"{r.status_code}: {r.text[:200]}", response=r)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            err = e
+        if attempt == max_retries:
+            raise err
+        print(f"chunk insert failed (attempt {attempt + 1}/{max_retries + 1}): {err}; retry in {delay:.1f}s")
+        time.sleep(delay)
+        delay = min(delay * 2, 30)
+    raise AssertionError("unreachable")
+
+
+def _chunk_params(dedup_prefix: Optional[str], start: int, end: int) -> Optional[Dict[str, str]]:
+    # only for immutable files (sealed segments): same file + same chunk_bytes -> same byte ranges
+    if not dedup_prefix:
+        return None
+    return {"insert_deduplication_token": f"{dedup_prefix}:{start}-{end}"}
+
+
+def _print_progress(rows: int, raw_bytes: int, sent_bytes: int, t0: float) -> None:
+    dt = max(time.perf_counter() - t0, 1e-9)
+    print(
+        f"rows={rows} raw={raw_bytes / 1e6:.1f}MB sent={sent_bytes / 1e6:.1f}MB "
+        f"{rows / dt:,.0f} rows/s {raw_bytes / 1e6 / dt:.1f} MB/s"
     )
-    r.raise_for_status()
-    print("Inserted events into ClickHouse.")
+
+
+def _jsonl_body(raw: bytes) -> Tuple[bytes, int]:
+    return raw, raw.count(b"\n")
+
+
+def _rowbinary_body(raw: bytes) -> Tuple[bytes, int]:
+    # length-prefixed records as stored -> plain RowBinary stream
+    bodies = list(rowbinary.iter_record_bodies(io.BytesIO(raw)))
+    return b"".join(bodies), len(bodies)
+
+
+def ingest_file(
+    session: requests.Session,
+    path: str,
+    chunk_bytes: int = CHUNK_BYTES,
+    query: str = INSERT_QUERY,
+    dedup_prefix: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+) -> Tuple[int, int]:
+    """
+    checkpoint_path: start from (and advance) the same checkpoint as follow mode, so a re-run only
+    sends complete lines past the last confirmed insert, also on a file the emitter kept appending to.
+    dedup_prefix: without a checkpoint, insert_deduplication_token prefix for an immutable file.
+    """
+    rows = raw_bytes = sent_bytes = 0
+    t0 = time.perf_counter()
+    with open(path, "rb") as f:
+        cp = FileCheckpoint(checkpoint_path, path, f) if checkpoint_path else None
+        if cp is not None:
+            rows += cp.resume(session, query=query, body_of=_jsonl_body)
+        offset = cp.offset if cp is not None else 0
+        f.seek(offset)
+        for chunk in iter_line_chunks(f, chunk_bytes, partial_tail=cp is None):
+            end = offset + len(chunk)
+            if cp is not None:
+                sent_bytes += cp.insert(session, chunk, end, query=query)
+            else:
+                sent_bytes += insert_chunk(session, chunk, query=query, params=_chunk_params(dedup_prefix, offset, end))
+            offset = end
+            rows += chunk.count(b"\n")
+            raw_bytes += len(chunk)
+            _print_progress(rows, raw_bytes, sent_bytes, t0)
+    return rows, raw_bytes
+
+
+def ingest_rowbinary_file(
+    session: requests.Session,
+    path: str,
+    chunk_bytes: int = CHUNK_BYTES,
+    table: str = CLICKHOUSE_TABLE,
+    dedup_prefix: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+) -> Tuple[int, int]:
+    """Same as ingest_file() for files written with events_format="rowbinary" (offsets are file offsets)."""
+    rows = raw_bytes = sent_bytes = 0
+    t0 = time.perf_counter()
+    with open(path, "rb") as f:
+        columns = rowbinary.read_header(f)
+        query = f"INSERT INTO {CLICKHOUSE_DB}.{table} ({rowbinary.columns_sql(columns)}) FORMAT RowBinary"
+        cp = FileCheckpoint(checkpoint_path, path, f, base=f.tell()) if checkpoint_path else None
+        if cp is not None:
+            rows += cp.resume(session, query=query, body_of=_rowbinary_body)
+        offset = cp.offset if cp is not None else f.tell()
+        f.seek(offset)
+        # a torn last record stops the iteration; it is picked up by the next run
+        for body, n in rowbinary.iter_rowbinary_chunks(f, chunk_bytes):
+            end = offset + len(body) + 4 * n
+            if cp is not None:
+                sent_bytes += cp.insert(session, body, end, query=query)
+            else:
+                sent_bytes += insert_chunk(session, body, query=query, params=_chunk_params(dedup_prefix, offset, end))
+            offset = end
+            rows += n
+            raw_bytes += len(body)
+            _print_progress(rows, raw_bytes, sent_bytes, t0)
+    return rows, raw_bytes
+
+
+# ---------------------------------------------------------------------------
+# Segment mode: directory written by ShardedEmitter (emitter_mode="sharded").
+# Only sealed segments (no ".open" suffix) are read; each one is inserted with
+# per-chunk dedup tokens and then moved to <dir>/ingested/ (or deleted).
+# ---------------------------------------------------------------------------
+
+SEGMENT_EXTS = (".jsonl", ".rowbinary")
+
+
+def sealed_segments(directory: str) -> list:
+    # file names start with the segment's open time, so this is roughly oldest first
+    return sorted(
+        e.path for e in os.scandir(directory)
+        if e.is_file() and e.name.endswith(SEGMENT_EXTS)
+    )
+
+
+def ingest_segments(
+    session: requests.Session,
+    directory: str,
+    *,
+    chunk_bytes: int = CHUNK_BYTES,
+    table: str = CLICKHOUSE_TABLE,
+    done_dir: Optional[str] = None,
+    delete: bool = False,
+) -> Tuple[int, int]:
+    """Insert every sealed segment in `directory` once; returns (segments, rows)."""
+    done_dir = done_dir or os.path.join(directory, "ingested")
+    if not delete:
+        os.makedirs(done_dir, exist_ok=True)
+    segments = rows = 0
+    for path in sealed_segments(directory):
+        name = os.path.basename(path)
+        if path.endswith(".rowbinary"):
+            n, _ = ingest_rowbinary_file(session, path, chunk_bytes, table=table, dedup_prefix=name)
+        else:
+            n, _ = ingest_file(session, path, chunk_bytes, query=insert_query(table), dedup_prefix=name)
+        if delete:
+            os.remove(path)
+        else:
+            os.replace(path, os.path.join(done_dir, name))
+        segments += 1
+        rows += n
+    return segments, rows
+
+
+# ---------------------------------------------------------------------------
+# Checkpointed ingest (follow mode and one-shot runs on the live events file).
+#
+# Checkpoint = {"path", "inode", "head", "head_len", "offset", "pending": [start, end] | null}
+# Before an insert we persist pending=[start, end]; after it succeeds we persist
+# offset=end, pending=null. A restart with pending set re-sends exactly that byte
+# range with the same insert_deduplication_token, so ClickHouse drops the copy if
+# the first insert had landed (needs non_replicated_deduplication_window on the table).
+#
+# head = sha1 of the file's first head_len (<= HEAD_BYTES) bytes, taken at the first
+# insert. A truncated / rewritten file keeps its inode but gets a new head, so its
+# offsets (which restart at 0) never reuse a token of the previous contents, and a
+# stale checkpoint is detected even if the file has grown past the old offset again.
+# ---------------------------------------------------------------------------
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_checkpoint(path: str, ckpt: Dict[str, Any]) -> None:
+    # write-temp + fsync + rename：任何時間點 crash，都只會看到舊的或新的 checkpoint
+    d = os.path.dirname(path) or "."
+    os.makedirs(d, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(ckpt, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    dir_fd = os.open(d, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def default_checkpoint_path(path: str) -> str:
+    # one checkpoint per input file: the events file uses INGEST_CHECKPOINT_PATH, others a sibling file
+    if os.path.abspath(path) == os.path.abspath(EVENTS_JSONL_PATH):
+        return CHECKPOINT_PATH
+    return path + ".ingest.checkpoint.json"
+
+
+def dedup_token(path: str, inode: int, head: str, start: int, end: int) -> str:
+    return f"{os.path.basename(path)}:{inode}:{head}:{start}-{end}"
+
+
+class FileCheckpoint:
+    """Confirmed read position of one events file, persisted around every insert."""
+
+    def __init__(self, checkpoint_path: str, path: str, f: BinaryIO, base: int = 0) -> None:
+        self.checkpoint_path = checkpoint_path
+        self.path = path
+        self.base = base
+        self.reset(f)
+
+    def reset(self, f: BinaryIO) -> None:
+        """Start over at `base` of f: a rotated-in file, or the same file after truncation."""
+        self.f = f
+        self.inode = os.fstat(f.fileno()).st_ino
+        self.offset = self.base
+        self.head: Optional[str] = None
+        self.head_len = 0
+
+    def save(self, pending: Optional[list] = None) -> None:
+        save_checkpoint(self.checkpoint_path, {
+            "path": self.path, "inode": self.inode, "head": self.head, "head_len": self.head_len,
+            "offset": self.offset, "pending": pending,
+        })
+
+    def set_head(self, first: bytes) -> None:
+        """first = the file's leading bytes (at least up to the first insert's end)."""
+        self.head_len = min(HEAD_BYTES, len(first))
+        self.head = hashlib.sha1(first[:self.head_len]).hexdigest()[:16]
+
+    def rewritten(self) -> bool:
+        """True if the first head_len bytes no longer match (truncated, possibly regrown since)."""
+        return self.head is not None and self._digest(self.head_len) != self.head
+
+    def _read_head(self, n: int) -> bytes:
+        pos = self.f.tell()
+        self.f.seek(0)
+        data = self.f.read(n)
+        self.f.seek(pos)
+        return data
+
+    def _digest(self, n: int) -> str:
+        return hashlib.sha1(self._read_head(n)).hexdigest()[:16]
+
+    def resume(
+        self,
+        session: requests.Session,
+        *,
+        query: str,
+        body_of: Callable[[bytes], Tuple[bytes, int]],
+    ) -> int:
+        """
+        Adopt the saved checkpoint if it still describes this file, then re-send its unconfirmed
+        range (body_of turns the stored bytes into the insert body). Returns the rows re-sent.
+        """
+        ckpt = load_checkpoint(self.checkpoint_path)
+        if ckpt.get("inode") != self.inode or not ckpt.get("head"):
+            return 0
+        pending = ckpt.get("pending")
+        offset = int(ckpt["offset"])
+        size = os.fstat(self.f.fileno()).st_size
+        if size < (pending[1] if pending else offset) or self._digest(int(ckpt["head_len"])) != ckpt["head"]:
+            print(f"{self.path} was truncated or rewritten since the checkpoint; starting at offset {self.base}")
+            return 0
+        self.offset, self.head, self.head_len = offset, ckpt["head"], int(ckpt["head_len"])
+        if not pending:
+            return 0
+        start, end = pending
+        self.f.seek(start)
+        body, rows = body_of(self.f.read(end - start))
+        print(f"replaying unconfirmed batch {start}-{end}")
+        self.insert(session, body, end, query=query)
+        return rows
+
+    def insert(self, session: requests.Session, body: bytes, end: int, *, query: str) -> int:
+        """Insert body = file bytes [offset, end) exactly once and advance offset; returns the compressed size sent."""
+        start = self.offset
+        if self.head is None:
+            # from offset 0 the head is in body already (the file may have been truncated since it was read)
+            self.set_head(body if start == 0 else self._read_head(min(HEAD_BYTES, end)))
+        self.save(pending=[start, end])
+        token = dedup_token(self.path, self.inode, self.head, start, end)
+        sent = insert_chunk(session, body, query=query, params={"insert_deduplication_token": token})
+        self.offset = end
+        self.save()
+        return sent
+
+
+# ---------------------------------------------------------------------------
+# Follow mode: tail the emitter output, inserting through a FileCheckpoint.
+# ---------------------------------------------------------------------------
+
+def follow(
+    session: requests.Session,
+    path: str,
+    checkpoint_path: str = CHECKPOINT_PATH,
+    *,
+    batch_rows: int = 10000,
+    batch_age_s: float = 5.0,
+    max_batch_bytes: int = CHUNK_BYTES,
+    poll_s: float = 0.5,
+    stop: Optional[threading.Event] = None,
+    query: str = INSERT_QUERY,
+) -> None:
+    """
+    Tail `path` until `stop` is set, inserting complete lines in batches
+    of batch_rows / max_batch_bytes, or whatever has waited batch_age_s.
+    Handles truncation and rotation (inode change) of the events file.
+    """
+    stop = stop or threading.Event()
+
+    while not os.path.exists(path):
+        if stop.is_set():
+            return
+        time.sleep(poll_s)
+
+    f = open(path, "rb")
+    cp = FileCheckpoint(checkpoint_path, path, f)
+    cp.resume(session, query=query, body_of=_jsonl_body)
+    f.seek(cp.offset)
+
+    pending = bytearray()   # complete lines starting at cp.offset, not inserted yet
+    pending_rows = 0
+    partial = b""           # trailing bytes without "\n" yet
+    first_seen = 0.0
+    total_rows = 0
+    t0 = time.perf_counter()
+
+    def flush_pending() -> None:
+        nonlocal pending, pending_rows, total_rows
+        cp.insert(session, bytes(pending), cp.offset + len(pending), query=query)
+        total_rows += pending_rows
+        pending = bytearray()
+        pending_rows = 0
+        dt = max(time.perf_counter() - t0, 1e-9)
+        print(f"offset={cp.offset} rows={total_rows} ({total_rows / dt:,.1f} rows/s)")
+
+    try:
+        while True:
+            data = f.read(max_batch_bytes)
+            if data:
+                data = partial + data
+                cut = data.rfind(b"\n")
+                if cut >= 0:
+                    if not pending:
+                        first_seen = time.monotonic()
+                    pending += data[:cut + 1]
+                    if cp.head is None:
+                        # fix the head as soon as the first lines are read, so a rewrite is noticed before the first insert
+                        cp.set_head(bytes(pending))
+                    pending_rows += data.count(b"\n", 0, cut + 1)
+                    partial = data[cut + 1:]
+                else:
+                    partial = data
+
+            if pending and (
+                pending_rows >= batch_rows
+                or len(pending) >= max_batch_bytes
+                or time.monotonic() - first_seen >= batch_age_s
+                or stop.is_set()
+            ):
+                flush_pending()
+
+            if stop.is_set():
+                return
+            if data:
+                continue
+
+            # EOF：檢查 rotation / truncation
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                st = None
+            read_pos = cp.offset + len(pending) + len(partial)
+            if st is not None and st.st_ino != cp.inode:
+                # old file is fully drained at this point (we just hit EOF on it)
+                if pending:
+                    flush_pending()
+                if partial:
+                    print(f"dropping {len(partial)} bytes of incomplete trailing line from rotated file")
+                f.close()
+                f = open(path, "rb")
+                cp.reset(f)
+                partial = b""
+                cp.save()
+                continue
+            if st is not None and (st.st_size < read_pos or cp.rewritten()):
+                # lines already read are complete events of the old contents: insert them first
+                if pending:
+                    flush_pending()
+                if partial:
+                    print(f"dropping {len(partial)} bytes of incomplete trailing line from truncated file")
+                print(f"{path} truncated (size {st.st_size}, read up to {read_pos}); restarting at offset 0")
+                cp.reset(f)
+                partial = b""
+                f.seek(0)
+                cp.save()
+                continue
+            stop.wait(poll_s)
+    finally:
+        f.close()
+
+
+def main():
+    if not CLICKHOUSE_USER or not CLICKHOUSE_PASSWORD:
+        raise RuntimeError("CLICKHOUSE_USER / CLICKHOUSE_PASSWORD not set")
+
+    ap = argparse.ArgumentParser(description="Stream a JSONL event file into ClickHouse in gzip chunks.")
+    ap.add_argument("--path", default=EVENTS_JSONL_PATH)
+    ap.add_argument("--table", default=CLICKHOUSE_TABLE, help="e.g. llm_usage_rollup_1m for data/rollups.jsonl")
+    ap.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES / (1024 * 1024))
+    ap.add_argument("--follow", action="store_true", help="keep tailing the file and insert new lines (checkpointed)")
+    ap.add_argument(
+        "--checkpoint", default=None,
+        help=f"default: {CHECKPOINT_PATH} for {EVENTS_JSONL_PATH}, <path>.ingest.checkpoint.json otherwise",
+    )
+    ap.add_argument("--batch-rows", type=int, default=10000)
+    ap.add_argument("--batch-age-s", type=float, default=5.0)
+    ap.add_argument("--poll-s", type=float, default=0.5)
+    ap.add_argument("--segments", default=None, help="segment directory of emitter_mode=sharded (sealed segments only)")
+    ap.add_argument("--watch", action="store_true", help="with --segments: keep polling for newly sealed segments")
+    ap.add_argument("--delete-ingested", action="store_true", help="with --segments: delete instead of moving to <dir>/ingested")
+    args = ap.parse_args()
+
+    session = make_session()
+    checkpoint_path = args.checkpoint or default_checkpoint_path(args.path)
+    if args.segments:
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+        chunk_bytes = int(args.chunk_mb * 1024 * 1024)
+        while True:
+            n_seg, rows = ingest_segments(
+                session, args.segments, chunk_bytes=chunk_bytes, table=args.table, delete=args.delete_ingested,
+            )
+            if n_seg:
+                print(f"Inserted {rows} events from {n_seg} segments.")
+            if not args.watch or stop.wait(args.poll_s):
+                return
+
+    if args.follow:
+        if os.path.exists(args.path) and is_rowbinary_file(args.path):
+            raise SystemExit("--follow only supports JSONL event files")
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+        follow(
+            session,
+            args.path,
+            checkpoint_path,
+            batch_rows=args.batch_rows,
+            batch_age_s=args.batch_age_s,
+            max_batch_bytes=int(args.chunk_mb * 1024 * 1024),
+            poll_s=args.poll_s,
+            stop=stop,
+            query=insert_query(args.table),
+        )
+        return
+
+    t0 = time.perf_counter()
+    chunk_bytes = int(args.chunk_mb * 1024 * 1024)
+    if is_rowbinary_file(args.path):
+        rows, raw_bytes = ingest_rowbinary_file(session, args.path, chunk_bytes, table=args.table, checkpoint_path=checkpoint_path)
+    else:
+        rows, raw_bytes = ingest_file(
+            session, args.path, chunk_bytes, query=insert_query(args.table), checkpoint_path=checkpoint_path,
+        )
+    dt = max(time.perf_counter() - t0, 1e-9)
+    print(f"Inserted {rows} events into ClickHouse in {dt:.1f}s ({rows / dt:,.0f} rows/s, {raw_bytes / 1e6 / dt:.1f} MB/s).")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
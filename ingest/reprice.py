@@ -0,0 +1,61 @@
+import argparse
+import json
+import logging
+
+from gateway_sdk.pricing import PriceBook
+from gateway_sdk.repricing import clickhouse_mutations, reprice_jsonl, select_keys, stored_prices_query
+
+from ingest.ingest_jsonl import CLICKHOUSE_DB, CLICKHOUSE_TABLE, CLICKHOUSE_URL, make_session
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Re-price historical events with the current price book.")
+    ap.add_argument("--price-book", default="pricing/price_book.yaml")
+    sub = ap.add_subparsers(dest="mode", required=True)
+
+    j = sub.add_parser("jsonl", help="stream a JSONL file and write corrected events")
+    j.add_argument("--in", dest="in_path", default="data/events.jsonl")
+    j.add_argument("--out", dest="out_path", default="data/events.repriced.jsonl")
+    j.add_argument("--batch-size", type=int, default=200_000)
+
+    c = sub.add_parser("clickhouse", help="rewrite prices in place with one mutation per stale price segment")
+    c.add_argument("--since", default=None, help='only rows with timestamp >= "YYYY-MM-DD HH:MM:SS"')
+    c.add_argument("--provider", action="append", help="only these providers (repeatable)")
+    c.add_argument("--model", action="append", help="only these models (repeatable)")
+    c.add_argument(
+        "--all-windows", action="store_true",
+        help="skip the stored-price check and emit every window (no ClickHouse query before printing)",
+    )
+    c.add_argument("--execute", action="store_true", help="send the mutations (default: print them)")
+
+    args = ap.parse_args()
+    # reprice_jsonl reports progress through logging
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    pb = PriceBook.load(args.price_book)
+
+    if args.mode == "jsonl":
+        stats = reprice_jsonl(pb, args.in_path, args.out_path, batch_size=args.batch_size)
+        print(json.dumps(stats.as_dict()))
+        return
+
+    table = f"{CLICKHOUSE_DB}.{CLICKHOUSE_TABLE}"
+    keys = select_keys(pb, args.provider, args.model)
+    session = make_session()
+    stored = None
+    if not args.all_windows:
+        r = session.post(CLICKHOUSE_URL, params={"query": stored_prices_query(table, args.since, keys)}, timeout=600)
+        r.raise_for_status()
+        stored = [json.loads(line) for line in r.text.splitlines() if line.strip()]
+    stmts = clickhouse_mutations(pb, table, since=args.since, keys=keys, stored=stored)
+    if not args.execute:
+        for s in stmts:
+            print(s + ";")
+        return
+    for s in stmts:
+        r = session.post(CLICKHOUSE_URL, params={"query": s}, timeout=60)
+        r.raise_for_status()
+    print(f"Submitted {len(stmts)} mutations (check system.mutations for progress).")
+
+
+if __name__ == "__main__":
+    main()
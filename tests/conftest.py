@@ -0,0 +1,53 @@
+import gzip
+import os
+import sys
+from typing import Dict, List, Optional
+
+import pytest
+
+# gateway_sdk / benchmarks are imported from the repo root (no installed package)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+class Killed(Exception):
+    """Simulated process death (not a network error, so insert_chunk does not retry it)."""
+
+
+class _Response:
+    status_code = 200
+    text = "Ok."
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+class FakeClickHouse:
+    """
+    requests.Session stand-in for ingest: keeps every inserted body and, like a table with
+    non_replicated_deduplication_window, drops an insert whose insert_deduplication_token was seen.
+    kill_after_insert=n: the next n inserts land, then raise Killed before the caller sees the response.
+    """
+
+    def __init__(self) -> None:
+        self.bodies: List[bytes] = []
+        self.tokens: List[Optional[str]] = []
+        self.kill_after_insert = 0
+
+    def post(self, url: str, params: Dict[str, str], data: bytes, headers=None, timeout=None) -> _Response:
+        token = params.get("insert_deduplication_token")
+        if token is None or token not in self.tokens:
+            self.bodies.append(gzip.decompress(data))
+        self.tokens.append(token)
+        if self.kill_after_insert:
+            self.kill_after_insert -= 1
+            raise Killed(token)
+        return _Response()
+
+    @property
+    def lines(self) -> List[bytes]:
+        return [line for body in self.bodies for line in body.splitlines()]
+
+
+@pytest.fixture
+def clickhouse() -> FakeClickHouse:
+    return FakeClickHouse()
@@ -0,0 +1,84 @@
+import os
+from typing import Any, Dict, List
+
+import pytest
+
+from benchmarks.stubs import StubAdapter
+from gateway_sdk.budget import Budget, BudgetExceeded
+from gateway_sdk.gateway import GatewayConfig, LLMGateway
+
+PRICE_BOOK = os.path.join(os.path.dirname(__file__), "..", "pricing", "price_book.yaml")
+MESSAGES = [{"role": "user", "content": "Summarize this ticket for the on-call engineer. " * 20}]
+CALL = dict(
+    provider="openai", model="gpt-4o-mini", messages=MESSAGES,
+    tenant_id="tenant_a", user_id="u1", feature="chat", endpoint="/v1/chat",
+)
+
+
+class ListEmitter:
+    def __init__(self) -> None:
+        self.events: List[Dict[str, Any]] = []
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        self.events.append(dict(event))
+
+    def close(self) -> None:
+        pass
+
+
+def _gateway(tmp_path, budget: Budget) -> LLMGateway:
+    gw = LLMGateway(GatewayConfig(
+        price_book_path=PRICE_BOOK,
+        events_jsonl_path=str(tmp_path / "events.jsonl"),
+        budgets=[budget],
+    ))
+    gw.emitter = ListEmitter()
+    gw._openai = StubAdapter(prompt_tokens=200, completion_tokens=50)
+    gw._vllm = StubAdapter(prompt_tokens=200, completion_tokens=50)
+    return gw
+
+
+def test_downgrade_to_another_provider_uses_a_priced_region(tmp_path):
+    # region_default "us" has no vllm price; the downgrade must land on "onprem"
+    gw = _gateway(tmp_path, Budget(
+        limit_usd=0.05, action="downgrade", downgrade_provider="vllm", downgrade_model="gpt-oss-20b-local",
+    ))
+    first = gw.chat(**CALL)
+    assert "downgraded_from" not in first
+    second = gw.chat(**CALL)
+    assert second["downgraded_from"] == "gpt-4o-mini"
+
+    events = gw.emitter.events
+    assert len(events) == 2
+    assert (events[1]["provider"], events[1]["model"], events[1]["region"]) == ("vllm", "gpt-oss-20b-local", "onprem")
+    assert events[1]["status"] == "ok"
+
+
+def test_downgrade_region_is_used_when_set(tmp_path):
+    gw = _gateway(tmp_path, Budget(
+        limit_usd=0.05, action="downgrade", downgrade_provider="vllm",
+        downgrade_model="gpt-oss-20b-local", downgrade_region="onprem",
+    ))
+    gw.chat(**CALL)
+    gw.chat(**CALL)
+    assert gw.emitter.events[-1]["region"] == "onprem"
+
+
+def test_unpriced_downgrade_target_is_rejected_at_startup(tmp_path):
+    with pytest.raises(ValueError, match="not in the price book"):
+        _gateway(tmp_path, Budget(
+            limit_usd=0.1, action="downgrade", downgrade_provider="vllm",
+            downgrade_model="gpt-oss-20b-local", downgrade_region="us",
+        ))
+
+
+def test_downgrade_target_without_a_current_price_raises_budget_error(tmp_path):
+    gw = _gateway(tmp_path, Budget(
+        limit_usd=0.05, action="downgrade", downgrade_provider="vllm", downgrade_model="gpt-oss-20b-local",
+    ))
+    gw.chat(**CALL)
+    # e.g. a reloaded price book that dropped the row
+    gw.price_book._index.pop(("vllm", "gpt-oss-20b-local", "onprem"))
+    with pytest.raises(BudgetExceeded, match="has no price"):
+        gw.chat(**CALL)
+    assert len(gw.emitter.events) == 1
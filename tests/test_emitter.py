@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from gateway_sdk.emitter import AsyncJsonlEmitter, SampledEmitter, ShardedEmitter, seal_orphan_segments
+from gateway_sdk.rollup import RollupEmitter
+from ingest.ingest_jsonl import ingest_segments
+
+
+class _GatedFile:
+    """Events file wrapper that holds the writer thread inside write() until released."""
+
+    def __init__(self, f) -> None:
+        self.f = f
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, data: bytes) -> int:
+        self.entered.set()
+        self.release.wait(5)
+        return self.f.write(data)
+
+    def flush(self) -> None:
+        self.f.flush()
+
+    def close(self) -> None:
+        self.f.close()
+
+
+def _stalled_emitter(tmp_path, overflow: str, max_queue: int = 2) -> AsyncJsonlEmitter:
+    # the writer takes event 0 and blocks writing it; the queue then holds max_queue more
+    em = AsyncJsonlEmitter(str(tmp_path / "events.jsonl"), max_queue=max_queue, batch_size=1, overflow=overflow)
+    em._f = _GatedFile(em._f)
+    em.emit({"i": 0})
+    assert em._f.entered.wait(5)
+    return em
+
+
+def _ids(path) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line)["i"] for line in f]
+
+
+def test_block_waits_for_room(tmp_path):
+    em = _stalled_emitter(tmp_path, "block")
+    em.emit({"i": 1})
+    em.emit({"i": 2})
+    t = threading.Thread(target=em.emit, args=({"i": 3},), daemon=True)
+    t.start()
+    t.join(0.2)
+    assert t.is_alive()
+
+    em._f.release.set()
+    t.join(5)
+    em.close()
+    assert _ids(em.path) == [0, 1, 2, 3]
+    assert em.stats()["dropped"] == 0
+
+
+def test_drop_oldest_discards_the_oldest_queued_event(tmp_path):
+    em = _stalled_emitter(tmp_path, "drop_oldest")
+    for i in (1, 2, 3):
+        em.emit({"i": i})
+    em._f.release.set()
+    em.close()
+    assert _ids(em.path) == [0, 2, 3]
+    assert em.dropped == 1
+
+
+def test_drop_oldest_never_drops_the_close_sentinel(tmp_path):
+    em = _stalled_emitter(tmp_path, "drop_oldest", max_queue=1)
+    closer = threading.Thread(target=em.close, daemon=True)
+    closer.start()
+    while em._q.qsize() == 0:   # close() has queued its sentinel; the queue is full
+        pass
+    # an emit that passed the closed check just before close() ran
+    em._drop_oldest_and_put({"i": 1})
+    em._f.release.set()
+    closer.join(5)
+    assert not closer.is_alive()
+    assert _ids(em.path) == [0]
+    assert em.dropped == 1
+
+
+def test_spill_writes_overflow_to_the_spill_file(tmp_path):
+    em = _stalled_emitter(tmp_path, "spill")
+    for i in (1, 2, 3):
+        em.emit({"i": i})
+    em._f.release.set()
+    em.close()
+    assert _ids(em.path) == [0, 1, 2]
+    assert _ids(em.spill_path) == [3]
+    assert em.spilled == 1
+
+
+def _segments(directory) -> list:
+    return sorted(p.name for p in directory.iterdir() if p.is_file())
+
+
+def test_sharded_emitter_rotates_and_seals_by_rename(tmp_path):
+    seg_dir = tmp_path / "segments"
+    em = ShardedEmitter(str(seg_dir), max_bytes=100, max_age_s=3600)
+    for i in range(6):
+        em.emit({"i": i, "pad": "x" * 20})
+    names = _segments(seg_dir)
+    assert [n.endswith(".jsonl.open") for n in names].count(True) == 1
+    assert all(n.endswith(".jsonl") for n in names if not n.endswith(".open"))
+    assert em.sealed == len(names) - 1 >= 1
+
+    em.close()
+    names = _segments(seg_dir)
+    assert not any(n.endswith(".open") for n in names)
+    assert [i for n in names for i in _ids(seg_dir / n)] == list(range(6))
+
+
+def test_orphan_segment_of_a_killed_process_is_sealed_and_ingested(tmp_path, clickhouse):
+    seg_dir = tmp_path / "segments"
+    repo = os.path.join(os.path.dirname(__file__), "..")
+    # emit, then die without close() (no atexit, no seal)
+    subprocess.run([sys.executable, "-c", (
+        "import os, sys; sys.path.insert(0, sys.argv[1])\n"
+        "from gateway_sdk.emitter import ShardedEmitter\n"
+        "em = ShardedEmitter(sys.argv[2], max_age_s=3600)\n"
+        "for i in range(3): em.emit({'i': i})\n"
+        "os._exit(0)\n"
+    ), repo, str(seg_dir)], check=True)
+    (open_name,) = _segments(seg_dir)
+    assert open_name.endswith(".jsonl.open")
+    with open(seg_dir / open_name, "ab") as f:
+        f.write(b'{"i": 3, "torn')   # the write the process died in
+
+    # a live writer's segment in the same directory is left alone
+    live = ShardedEmitter(str(seg_dir), max_age_s=3600)
+    live.emit({"i": 9})
+    names = _segments(seg_dir)
+    assert open_name[:-len(".open")] in names
+    assert sum(n.endswith(".open") for n in names) == 1
+    assert _ids(seg_dir / open_name[:-len(".open")]) == [0, 1, 2]
+    assert seal_orphan_segments(str(seg_dir)) == []
+
+    segments, rows = ingest_segments(clickhouse, str(seg_dir))
+    assert (segments, rows) == (1, 3)
+    live.close()
+    assert ingest_segments(clickhouse, str(seg_dir)) == (1, 1)
+    assert [json.loads(line)["i"] for line in clickhouse.lines] == [0, 1, 2, 9]
+
+
+def test_sampled_out_counts_every_event_across_threads():
+    inner = []
+
+    class _Inner:
+        def emit(self, event):
+            inner.append(event)
+
+    em = SampledEmitter(_Inner(), {"chat": 0.0})
+    threads = [
+        threading.Thread(target=lambda: [em.emit({"feature": "chat", "request_id": str(i)}) for i in range(2000)])
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert em.sampled_out == 16000 and inner == []
+
+
+def test_failed_rollup_flush_is_logged_and_retried(tmp_path, caplog):
+    em = RollupEmitter(str(tmp_path / "rollups.jsonl"), interval_s=0.01)
+    os.mkdir(em.path)   # appending to a directory fails
+    em.emit({"timestamp": "2025-12-01 00:00:01.000", "tenant_id": "t", "prompt_tokens": 3, "latency_ms": 10})
+    with caplog.at_level(logging.ERROR, logger="gateway_sdk.rollup"):
+        deadline = time.monotonic() + 5
+        while "rollup flush" not in caplog.text and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert "rollup flush to" in caplog.text and "Traceback" in caplog.text
+
+    os.rmdir(em.path)
+    em.close()
+    (row,) = [json.loads(line) for line in open(em.path, encoding="utf-8")]
+    assert (row["calls"], row["prompt_tokens"]) == (1, 3)
@@ -0,0 +1,58 @@
+import json
+import math
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from gateway_sdk import rowbinary
+from gateway_sdk.event import build_event
+from gateway_sdk.pricing import PriceBook
+
+PRICE_BOOK = PriceBook.load(os.path.join(os.path.dirname(__file__), "..", "pricing", "price_book.yaml"))
+RESULT = {"text": "x" * 200, "prompt_tokens": 120, "completion_tokens": 48, "total_tokens": 168}
+
+
+def _ctx(**over):
+    ctx = {
+        "provider": "openai", "model": "gpt-4o-mini", "region": "us",
+        "ts": datetime(2025, 12, 2, 8, 30, 15, 123456, tzinfo=timezone.utc),
+        "request_id": "5f0c6a52-8f0e-4a8c-9d43-2b1e0f6c7a11", "attempt": 1, "retry_count": 0, "cache_hit": False,
+        "tenant_id": "t1", "user_id": "u42", "feature": "chat", "endpoint": "/v1/chat",
+        "template_id": "9b2d5c", "prompt_chars": 480,
+    }
+    ctx.update(over)
+    return ctx
+
+
+def _dumps(event) -> bytes:
+    return (json.dumps(event.as_dict(), ensure_ascii=False) + "\n").encode("utf-8")
+
+
+@pytest.mark.parametrize("over", [
+    {},
+    {"tenant_id": "客戶-α", "feature": "搜尋", "endpoint": "/v1/チャット", "user_id": "Zoë 🚀"},
+    {"request_id": 'say "hi"\\\n\t\x01', "user_id": "  "},
+    {"request_id": 12345, "tenant_id": 7, "user_id": 42, "feature": 3, "endpoint": 0},
+], ids=["ascii", "non_ascii", "escapes", "int_ids"])
+def test_to_jsonl_matches_json_dumps(over):
+    event = build_event(PRICE_BOOK, _ctx(**over), RESULT, "ok", 840)
+    assert event.to_jsonl() == _dumps(event)
+    decoded = json.loads(event.to_jsonl())
+    for f in ("request_id", "tenant_id", "user_id", "feature", "endpoint"):
+        want = over.get(f, _ctx()[f])
+        assert decoded[f] == str(want)
+    # ints were coerced to str, so the RowBinary encoder takes them as well
+    assert rowbinary.encode_record(event)
+
+
+@pytest.mark.parametrize("field", ["tokens_per_s", "unit_price_prompt", "unit_price_completion", "computed_cost"])
+@pytest.mark.parametrize("value", [math.inf, -math.inf, math.nan])
+def test_to_jsonl_keeps_non_finite_floats_encodable(field, value):
+    event = build_event(PRICE_BOOK, _ctx(), RESULT, "ok", 840)
+    setattr(event, field, value)
+    line = event.to_jsonl()
+    assert line == _dumps(event)
+    assert not any(bad in line for bad in (b": inf", b": -inf", b": nan"))   # what %r would write
+    decoded = json.loads(line)
+    assert math.isnan(decoded[field]) if math.isnan(value) else decoded[field] == value
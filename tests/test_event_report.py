@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from benchmarks.synth_events import SynthConfig, write_events
+from gateway_sdk.event_report import ReportQuery, cost_report
+
+PRICE_BOOK = os.path.join(os.path.dirname(__file__), "..", "pricing", "price_book.yaml")
+
+
+def test_segment_directory_reports_rowbinary_segments_too(tmp_path):
+    seg_dir = tmp_path / "segments"
+    cfg = SynthConfig(days=1, tenants=5)
+    for name, fmt in (("events-1.jsonl", "jsonl"), ("events-2.rowbinary", "rowbinary")):
+        write_events(str(seg_dir / name), 2000, cfg, price_book_path=PRICE_BOOK, fmt=fmt)
+    (seg_dir / "events-3.jsonl.open").write_text("")   # still being written: not read
+
+    query = ReportQuery(group_by=("feature", "model"), since="2025-12-01 06:00", until="2025-12-01 18:00")
+    jsonl_only = cost_report([str(seg_dir / "events-1.jsonl")], query, workers=1)
+    both = cost_report([str(seg_dir)], query, workers=1)
+
+    assert both["stats"]["files"] == 2
+    assert both["stats"]["bad"] == 0
+    expected = {(r["feature"], r["model"]): r for r in jsonl_only["rows"]}
+    assert len(both["rows"]) == len(expected) > 0
+    for r in both["rows"]:
+        e = expected[(r["feature"], r["model"])]
+        assert (r["calls"], r["errors"], r["prompt_tokens"]) == (2 * e["calls"], 2 * e["errors"], 2 * e["prompt_tokens"])
+        assert r["cost"] == pytest.approx(2 * e["cost"])
+        assert r["latency_ms_p50"] == e["latency_ms_p50"]
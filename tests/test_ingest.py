@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+
+import pytest
+
+from conftest import Killed
+from gateway_sdk import rowbinary
+from ingest import ingest_jsonl
+
+
+def _lines(n: int, tag: str = "a", start: int = 0) -> bytes:
+    return b"".join(b'{"request_id":"%s-%04d"}\n' % (tag.encode(), i) for i in range(start, start + n))
+
+
+def _append(path, data: bytes) -> None:
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+def test_one_shot_rerun_on_a_grown_file_sends_only_new_lines(tmp_path, clickhouse):
+    path, ckpt = tmp_path / "events.jsonl", str(tmp_path / "ckpt.json")
+    path.write_bytes(_lines(10))
+    rows, _ = ingest_jsonl.ingest_file(clickhouse, str(path), chunk_bytes=64, checkpoint_path=ckpt)
+    assert rows == 10
+
+    _append(path, _lines(2, start=10) + b'{"request_id":"half')   # emitter mid-write
+    rows, _ = ingest_jsonl.ingest_file(clickhouse, str(path), chunk_bytes=1 << 20, checkpoint_path=ckpt)
+    assert rows == 2
+    _append(path, b'-written"}\n')
+    rows, _ = ingest_jsonl.ingest_file(clickhouse, str(path), chunk_bytes=7, checkpoint_path=ckpt)
+    assert rows == 1
+
+    assert clickhouse.lines == _lines(12).splitlines() + [b'{"request_id":"half-written"}']
+    assert len(set(clickhouse.tokens)) == len(clickhouse.tokens)
+
+
+def test_one_shot_replays_an_unconfirmed_chunk_with_the_same_token(tmp_path, clickhouse):
+    path, ckpt = tmp_path / "events.jsonl", str(tmp_path / "ckpt.json")
+    path.write_bytes(_lines(10))
+    clickhouse.kill_after_insert = 1
+    with pytest.raises(Killed):
+        ingest_jsonl.ingest_file(clickhouse, str(path), chunk_bytes=64, checkpoint_path=ckpt)
+    assert ingest_jsonl.load_checkpoint(ckpt)["pending"] is not None
+
+    _append(path, _lines(3, start=10))
+    ingest_jsonl.ingest_file(clickhouse, str(path), chunk_bytes=1 << 20, checkpoint_path=ckpt)
+    assert clickhouse.tokens[0] == clickhouse.tokens[1]
+    assert clickhouse.lines == _lines(13).splitlines()
+
+
+def test_one_shot_starts_over_on_a_rewritten_file(tmp_path, clickhouse):
+    path, ckpt = tmp_path / "events.jsonl", str(tmp_path / "ckpt.json")
+    path.write_bytes(_lines(5))
+    ingest_jsonl.ingest_file(clickhouse, str(path), checkpoint_path=ckpt)
+    # truncated in place and regrown past the old offset: same inode, same byte ranges
+    with open(path, "r+b") as f:
+        f.truncate(0)
+        f.write(_lines(6, tag="b"))
+    ingest_jsonl.ingest_file(clickhouse, str(path), checkpoint_path=ckpt)
+    assert clickhouse.lines == _lines(5).splitlines() + _lines(6, tag="b").splitlines()
+
+
+def test_rowbinary_rerun_on_a_grown_file(tmp_path, clickhouse):
+    path, ckpt = tmp_path / "events.rb", str(tmp_path / "ckpt.json")
+    ts = "2025-12-01 00:00:00.000"
+    with open(path, "wb") as f:
+        f.write(rowbinary.file_header())
+        for i in range(10):
+            f.write(rowbinary.encode_record({"timestamp": ts, "request_id": f"r{i}"}))
+    assert ingest_jsonl.ingest_rowbinary_file(clickhouse, str(path), chunk_bytes=100, checkpoint_path=ckpt)[0] == 10
+
+    torn = rowbinary.encode_record({"timestamp": ts, "request_id": "r12"})
+    _append(path, b"".join(rowbinary.encode_record({"timestamp": ts, "request_id": f"r{i}"}) for i in (10, 11)) + torn[:5])
+    assert ingest_jsonl.ingest_rowbinary_file(clickhouse, str(path), checkpoint_path=ckpt)[0] == 2
+    _append(path, torn[5:])
+    assert ingest_jsonl.ingest_rowbinary_file(clickhouse, str(path), chunk_bytes=7, checkpoint_path=ckpt)[0] == 1
+    assert len(set(clickhouse.tokens)) == len(clickhouse.tokens)
+
+
+def _start_follow(clickhouse, path, ckpt):
+    stop = threading.Event()
+    t = threading.Thread(target=ingest_jsonl.follow, args=(clickhouse, str(path), ckpt), kwargs=dict(
+        batch_rows=1000, batch_age_s=1000, poll_s=0.01, stop=stop,
+    ))
+    t.start()
+    time.sleep(0.2)   # read what is there and sit at EOF with it pending
+    return t, stop
+
+
+def _stop(t, stop) -> None:
+    time.sleep(0.2)
+    stop.set()
+    t.join(5)
+    assert not t.is_alive()
+
+
+def test_follow_replays_pending_after_a_crash_and_continues(tmp_path, clickhouse):
+    path, ckpt = tmp_path / "events.jsonl", str(tmp_path / "ckpt.json")
+    path.write_bytes(_lines(4))
+    clickhouse.kill_after_insert = 1
+    with pytest.raises(Killed):
+        ingest_jsonl.follow(clickhouse, str(path), ckpt, stop=threading.Event(), batch_rows=1)
+
+    _append(path, _lines(2, start=4))
+    stopped = threading.Event()
+    stopped.set()   # drain once and return
+    ingest_jsonl.follow(clickhouse, str(path), ckpt, stop=stopped)
+    assert clickhouse.lines == _lines(6).splitlines()
+
+
+def test_follow_inserts_pending_lines_before_a_truncation(tmp_path, clickhouse):
+    path, ckpt = tmp_path / "events.jsonl", str(tmp_path / "ckpt.json")
+    path.write_bytes(_lines(5))
+    t, stop = _start_follow(clickhouse, path, ckpt)
+    # same size as before, so only the head digest shows the rewrite; byte ranges repeat
+    with open(path, "r+b") as f:
+        f.truncate(0)
+        f.write(_lines(5, tag="b"))
+    _stop(t, stop)
+    assert clickhouse.lines == _lines(5).splitlines() + _lines(5, tag="b").splitlines()
+    assert clickhouse.tokens[0] != clickhouse.tokens[1]
+
+
+def test_follow_drains_a_rotated_file(tmp_path, clickhouse):
+    path, ckpt = tmp_path / "events.jsonl", str(tmp_path / "ckpt.json")
+    path.write_bytes(_lines(3))
+    t, stop = _start_follow(clickhouse, path, ckpt)
+    os.replace(path, tmp_path / "events.jsonl.1")
+    path.write_bytes(_lines(2, tag="b"))
+    _stop(t, stop)
+    assert clickhouse.lines == _lines(3).splitlines() + _lines(2, tag="b").splitlines()
@@ -0,0 +1,31 @@
+import logging
+
+from gateway_sdk.pricing import WatchedPriceBook
+
+BOOK = """version: "{version}"
+prices:
+  - provider: "openai"
+    model: "gpt-4o-mini"
+    region: "us"
+    effective_from: "2025-12-01T00:00:00Z"
+    price_per_1k_prompt: {prompt}
+    price_per_1k_completion: 0.60
+"""
+
+
+def test_rejected_reload_keeps_the_book_and_logs_a_warning(tmp_path, caplog):
+    path = tmp_path / "price_book.yaml"
+    path.write_text(BOOK.format(version="v1", prompt=0.15))
+    wpb = WatchedPriceBook(str(path), poll_s=0)
+    try:
+        path.write_text(BOOK.format(version="v2", prompt=-1))
+        with caplog.at_level(logging.WARNING, logger="gateway_sdk.pricing"):
+            assert wpb.reload() is False
+        assert wpb.version == "v1" and wpb.reload_errors == 1
+        assert "price book reload rejected" in caplog.text and "keeping version v1" in caplog.text
+
+        path.write_text(BOOK.format(version="v2", prompt=0.2))
+        assert wpb.reload() is True
+        assert wpb.version == "v2" and wpb.last_error is None
+    finally:
+        wpb.close()
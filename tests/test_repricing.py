@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from gateway_sdk.pricing import PriceBook
+from gateway_sdk.repricing import PriceArrays, clickhouse_mutations, select_keys
+
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+T1 = datetime(2025, 6, 1, tzinfo=timezone.utc)
+T2 = datetime(2025, 12, 1, tzinfo=timezone.utc)
+TABLE = "analytics.llm_usage_events"
+
+
+def _row(provider, model, region, eff, up, uc, **extra):
+    return dict(provider=provider, model=model, region=region, effective_from=eff.isoformat(),
+                price_per_1k_prompt=up, price_per_1k_completion=uc, **extra)
+
+
+@pytest.fixture
+def book() -> PriceBook:
+    return PriceBook.parse({"version": "v2", "prices": [
+        _row("openai", "gpt-4o-mini", "us", T0, 0.10, 0.40),
+        _row("openai", "gpt-4o-mini", "us", T1, 0.15, 0.60, batch_price_per_1k_prompt=0.075, batch_price_per_1k_completion=0.30),
+        _row("openai", "gpt-4o-mini", "us", T2, 0.20, 0.80),
+        _row("openai", "gpt-4o-mini", "us", T2, 0.25, 0.90),   # same effective_from: the later row wins
+        _row("openai", "gpt-4o", "us", T1, 2.50, 10.0),
+        _row("vllm", "gpt-oss-20b-local", "onprem", T0, 0.0, 0.0),
+    ]})
+
+
+def test_price_arrays_resolve_matches_price_book_row_by_row(book):
+    pa = PriceArrays(book)
+    ms = timedelta(milliseconds=1)
+    stamps = [T0 - ms, T0, T0 + ms, T1 - ms, T1, T2 - ms, T2, T2 + timedelta(days=3650)]
+    keys = book.keys() + [("openai", "gpt-4o-mini", "eu"), ("nope", "x", "y")]
+    rows = [(k, ts) for k in keys for ts in stamps]
+
+    idx = pa.resolve(
+        np.array([pa.key_id(*k) for k, _ in rows], dtype=np.int64),
+        np.array([int(ts.timestamp() * 1000) for _, ts in rows], dtype=np.int64),
+    )
+    for (key, ts), i in zip(rows, idx.tolist()):
+        try:
+            p = book.resolve(*key, ts)
+        except KeyError:
+            assert i == -1, (key, ts)
+            continue
+        assert (pa.unit_p[i], pa.unit_c[i], pa.versions[i]) == (
+            p.price_per_1k_prompt, p.price_per_1k_completion, p.price_version,
+        ), (key, ts)
+
+
+def test_reprice_uses_the_batch_tier_only_where_the_row_has_one(book):
+    pa = PriceArrays(book)
+    kid = pa.key_id("openai", "gpt-4o-mini", "us")
+    ts = [int(t.timestamp() * 1000) for t in (T0, T1, T2)]
+    idx, up, uc, cost, _ = pa.reprice([kid] * 3, ts, [1000] * 3, [1000] * 3, [0] * 3, batch=[True] * 3)
+    assert up.tolist() == [0.10, 0.075, 0.25]
+    assert uc.tolist() == [0.40, 0.30, 0.90]
+    assert cost.tolist() == pytest.approx([0.50, 0.375, 1.15])
+
+
+def _stored(key, version, up, uc, lo, hi, tier="standard"):
+    provider, model, region = key
+    return dict(provider=provider, model=model, region=region, price_version=version, price_tier=tier,
+                unit_price_prompt=up, unit_price_completion=uc,
+                lo=lo.strftime("%Y-%m-%d %H:%M:%S.000"), hi=hi.strftime("%Y-%m-%d %H:%M:%S.000"))
+
+
+MINI = ("openai", "gpt-4o-mini", "us")
+
+
+def test_mutations_only_for_stale_windows(book):
+    day = timedelta(days=1)
+    current = [
+        _stored(MINI, "v2", 0.10, 0.40, T0, T1 - day),
+        _stored(MINI, "v2", 0.15, 0.60, T1, T2 - day),
+        _stored(MINI, "v2", 0.075, 0.30, T1, T2 - day, tier="batch"),
+        _stored(MINI, "v2", 0.25, 0.90, T2, T2 + day),
+    ]
+    assert clickhouse_mutations(book, TABLE, stored=current) == []
+
+    # standard rows of the [T1, T2) window still carry the old version
+    stale = current + [_stored(MINI, "v1", 0.15, 0.60, T1 + day, T1 + 2 * day)]
+    (stmt,) = clickhouse_mutations(book, TABLE, stored=stale)
+    assert "timestamp >= toDateTime64('2025-06-01 00:00:00.000', 3, 'UTC')" in stmt
+    assert "timestamp < toDateTime64('2025-12-01 00:00:00.000', 3, 'UTC')" in stmt
+    assert "price_tier != 'batch'" in stmt
+    assert "unit_price_prompt = 0.15," in stmt
+    assert "price_version != 'v2'" in stmt
+
+    # a wrong batch price only rewrites the batch rows of that window
+    wrong_batch = current[:2] + [_stored(MINI, "v2", 0.15, 0.60, T1, T2 - day, tier="batch")] + current[3:]
+    (stmt,) = clickhouse_mutations(book, TABLE, stored=wrong_batch)
+    assert "price_tier = 'batch'" in stmt and "unit_price_prompt = 0.075," in stmt
+
+
+def test_mutations_respect_keys_and_since(book):
+    keys = select_keys(book, providers=["openai"], models=["gpt-4o"])
+    assert keys == [("openai", "gpt-4o", "us")]
+    stmts = clickhouse_mutations(book, TABLE, keys=keys)
+    assert len(stmts) == 1 and "model = 'gpt-4o'" in stmts[0]
+
+    assert set(select_keys(book, providers=["openai"])) == {MINI, ("openai", "gpt-4o", "us")}
+    assert select_keys(book) == book.keys()
+
+    # every window of gpt-4o-mini without stored rows to check: T0-T1, T1-T2 (standard + batch), T2-
+    assert len(clickhouse_mutations(book, TABLE, keys=[MINI])) == 4
+    # windows ending before `since` are left alone
+    stmts = clickhouse_mutations(book, TABLE, since="2025-07-01 00:00:00", keys=[MINI])
+    assert len(stmts) == 3
+    assert all("timestamp >= toDateTime64('2025-07-01 00:00:00', 3, 'UTC')" in s for s in stmts)
+    # keys without stored rows get nothing
+    assert clickhouse_mutations(book, TABLE, keys=[MINI], stored=[]) == []
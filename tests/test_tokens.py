@@ -0,0 +1,28 @@
+from gateway_sdk.tokens import HEURISTIC, TokenCounter, heuristic_count
+
+SYSTEM = "You are a support assistant for the billing team. " * 800   # ~40 KB system prompt
+
+
+def test_tiktoken_is_opt_in():
+    tc = TokenCounter()
+    assert tc.spec_for("openai", "gpt-4o-mini") == HEURISTIC
+    assert tc.encoder("openai", "gpt-4o-mini")[0] == HEURISTIC
+    assert TokenCounter({"gpt-*": "tiktoken"}).spec_for("openai", "gpt-4o-mini") == "tiktoken"
+
+
+def test_unloadable_spec_falls_back_to_heuristic_once():
+    tc = TokenCounter({"gpt-*": "hf:/nonexistent/tokenizer.json"})
+    assert tc.count_text("openai", "gpt-4o", "hello world") == heuristic_count("hello world")
+    assert tc.encoder("openai", "gpt-4o-mini")[0] == HEURISTIC
+    assert list(tc.stats()["fallbacks"]) == ["hf:/nonexistent/tokenizer.json"]
+
+
+def test_memo_does_not_keep_prompt_text():
+    tc = TokenCounter(max_memo=2)
+    msgs = [{"role": "system", "content": SYSTEM}, {"role": "user", "content": "hi"}]
+    n = tc.count_messages("openai", "gpt-4o", msgs)
+    assert tc.count_messages("openai", "gpt-4o", msgs) == n
+    assert all(len(digest) == 16 for _, digest in tc._memo)
+    for i in range(5):
+        tc.count_text("vllm", "m", f"{i} " + SYSTEM)
+    assert len(tc._memo) == 2
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+import pytest
+
+from benchmarks.mock_openai import MockConfig, MockOpenAIServer
+from gateway_sdk.providers.vllm_adapter import VLLMAdapter, VLLMAdapterConfig
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+
+@pytest.fixture
+def server():
+    srv = MockOpenAIServer(MockConfig(ttft_ms=1, tokens_per_s=0, completion_tokens=4)).start()
+    yield srv
+    srv.stop()
+
+
+def test_achat_works_from_several_event_loops(server):
+    adapter = VLLMAdapter(VLLMAdapterConfig(base_urls=(server.base_url, server.base_url + "/")))
+
+    async def two_calls():
+        return await asyncio.gather(*(adapter.achat(model="mock-model", messages=MESSAGES) for _ in range(2)))
+
+    # a second asyncio.run() used to reuse the first loop's httpx.AsyncClient
+    for _ in range(2):
+        assert all(r["completion_tokens"] > 0 for r in asyncio.run(two_calls()))
+
+    # and from another thread's loop
+    results = []
+    t = threading.Thread(target=lambda: results.extend(asyncio.run(two_calls())))
+    t.start()
+    t.join(10)
+    assert len(results) == 2
+    assert server.requests == 6